@@ -2,23 +2,34 @@
 # app.py (Version avec sauvegarde permanente)
 from flask import Flask, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
+from werkzeug.utils import safe_join
 import os
-import json
-from werkzeug.utils import secure_filename
+import mimetypes
 from models.yolo_model_cls_db import MaizeDiseaseClassifier
-from utils.image_processing import process_image
 import uuid
 import logging
 from datetime import datetime, timedelta
-import shutil
 from models.database_manager import UserService
+from models.prediction_store import PredictionLogStore
+from models.prediction_stats import PredictionStatsAggregator
+from models.persistence_queue import PersistenceQueue
+from models.near_duplicate_index import NearDuplicateIndex
+from models.image_blob_store import ImageBlobStore
+from models.derivative_cache import ImageDerivativeCache
+from models.disease_search_index import DiseaseSearchIndex
+from utils.cache import MaterializedJSON, TTLCache
+from utils.password_hasher import PasswordHasher, PasswordHasherBusy
+from utils.serialization import FastJSONProvider
+from utils.image_processing import hamming_distance
 import jwt
-import bcrypt
 import secrets
 import re
+import atexit
 from functools import wraps
 
 app = Flask(__name__)
+# Sérialisation JSON rapide (orjson si installé), datetime et ObjectId gérés nativement
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # Configuration du logging
@@ -28,6 +39,7 @@ logger = logging.getLogger(__name__)
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 PERMANENT_STORAGE = 'storage/images'
+DERIVATIVE_CACHE = 'storage/derivatives'
 PREDICTIONS_LOG = 'storage/predictions'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
@@ -43,55 +55,124 @@ app.config['FRONTEND_DIST_DIR'] = FRONTEND_DIST_DIR
 MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017/')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'agriguard_db')
 
+# Configuration de l'inférence (micro-batching, moteur, prétraitement)
+INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', 8))
+INFERENCE_BATCH_WAIT_MS = float(os.getenv('INFERENCE_BATCH_WAIT_MS', 10))
+# onnxruntime et openvino: dépendances optionnelles de requirements-inference.txt
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch')  # torch, onnxruntime, openvino
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0))  # par worker si INFERENCE_WORKERS > 1
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 1))
+INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'fp32')  # fp32, int8 (onnxruntime)
+PREPROCESS_CLAHE = os.getenv('PREPROCESS_CLAHE', 'true').lower() in ('1', 'true', 'yes')
+
+# Configuration du cache des résultats de classification (images identiques)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 3600))
+
+# Configuration de la détection des quasi-doublons (empreinte perceptuelle par utilisateur)
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', 8))
+NEAR_DUPLICATE_WINDOW = float(os.getenv('NEAR_DUPLICATE_WINDOW', 600))
+
+# Configuration du stockage des images adressé par contenu
+STORAGE_GC_INTERVAL = float(os.getenv('STORAGE_GC_INTERVAL', 6 * 3600))  # 0 = désactivé
+STORAGE_GC_GRACE = float(os.getenv('STORAGE_GC_GRACE', 3600))
+
+# Configuration du cache HTTP et de la délégation de l'envoi des images
+IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', 24 * 3600))  # anciens chemins non adressés par contenu
+IMAGE_SENDFILE_MODE = os.getenv('IMAGE_SENDFILE_MODE', 'none').lower()  # none, x-sendfile, x-accel-redirect
+IMAGE_ACCEL_PREFIX = os.getenv('IMAGE_ACCEL_PREFIX', '/protected-storage/')  # location internal nginx -> storage/
+STORAGE_ROOT = os.path.dirname(PERMANENT_STORAGE)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# X-Sendfile (Apache mod_xsendfile, lighttpd) est géré par send_file
+app.config['USE_X_SENDFILE'] = IMAGE_SENDFILE_MODE == 'x-sendfile'
+
+# Configuration de la persistance asynchrone des prédictions
+PERSISTENCE_QUEUE_SIZE = int(os.getenv('PERSISTENCE_QUEUE_SIZE', 1000))
+PERSISTENCE_BATCH_SIZE = int(os.getenv('PERSISTENCE_BATCH_SIZE', 50))
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', 0.5))
 
 # Configuration JWT (à ajouter dans votre configuration)
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', secrets.token_urlsafe(32))
 JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
 JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
 
+# Cache des utilisateurs authentifiés (évite une lecture MongoDB par requête)
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+
+# Configuration du hachage des mots de passe (bcrypt, pool dédié)
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 64))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+PASSWORD_HASH_RESULT_TIMEOUT = float(os.getenv('PASSWORD_HASH_RESULT_TIMEOUT', 30))
+
 # Créer les dossiers nécessaires
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PERMANENT_STORAGE, exist_ok=True)
 os.makedirs(PREDICTIONS_LOG, exist_ok=True)
-os.makedirs(f"{PREDICTIONS_LOG}/daily", exist_ok=True)
+
+# Journal append-only des prédictions
+prediction_store = PredictionLogStore(PREDICTIONS_LOG)
+atexit.register(prediction_store.close)
+
+# Stockage des images adressé par contenu (références comptées depuis le journal)
+image_store = ImageBlobStore(PERMANENT_STORAGE, gc_grace_seconds=STORAGE_GC_GRACE,
+                             snapshot_path=os.path.join(PREDICTIONS_LOG, "blob_refcounts.json"))
+image_store.attach(prediction_store)
+atexit.register(image_store.save_snapshot)
 
 # Initialiser le classificateur
 classifier = MaizeDiseaseClassifier(
     model_path='weights/best.pt',
     json_fallback_path='data/diseases_database.json',
     mongodb_url=MONGODB_URL,
-    database_name=DATABASE_NAME
+    database_name=DATABASE_NAME,
+    batch_max_size=INFERENCE_BATCH_SIZE,
+    batch_max_wait_ms=INFERENCE_BATCH_WAIT_MS,
+    enhance_contrast=PREPROCESS_CLAHE,
+    backend=INFERENCE_BACKEND,
+    num_threads=INFERENCE_THREADS,
+    precision=INFERENCE_PRECISION,
+    num_workers=INFERENCE_WORKERS
 )
 
+# Cache des résultats: empreinte SHA-256 de l'image + version du modèle
+classification_cache = TTLCache(max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Quasi-doublons récents par utilisateur (arbre BK sur le dHash)
+near_duplicate_index = NearDuplicateIndex(
+    max_distance=NEAR_DUPLICATE_MAX_DISTANCE,
+    window_seconds=NEAR_DUPLICATE_WINDOW
+)
+
+# Index de recherche plein texte des maladies, synchronisé sur la version des connaissances
+disease_search_index = DiseaseSearchIndex()
+
+# Utilisateurs authentifiés par user_id, invalidés à chaque modification du compte
+principal_cache = TTLCache(max_entries=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Hachages bcrypt hors des threads de requête, en nombre borné
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_QUEUE,
+    queue_timeout=PASSWORD_HASH_TIMEOUT,
+    result_timeout=PASSWORD_HASH_RESULT_TIMEOUT
+)
+atexit.register(password_hasher.shutdown)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-def calculate_relevance_score(query, disease_info):
-    """Calculer un score de pertinence pour la recherche"""
-    score = 0
-    query_lower = query.lower()
-
-    # Score basé sur le nom
-    name = disease_info.get('name', '').lower()
-    if query_lower in name:
-        score += 10
-
-    # Score basé sur la description
-    description = disease_info.get('description', '').lower()
-    if query_lower in description:
-        score += 5
-
-    # Score basé sur les symptômes
-    symptoms = str(disease_info.get('symptoms', [])).lower()
-    if query_lower in symptoms:
-        score += 3
-
-    return score
-def generate_timestamped_filename(original_filename):
-    """Générer un nom de fichier avec timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # microseconds to milliseconds
-    name, ext = os.path.splitext(original_filename)
-    safe_name = secure_filename(name)
-    return f"{timestamp}_{safe_name}{ext}"
+def get_search_index():
+    """Index de recherche à jour avec la base des maladies"""
+    version, diseases = classifier.db_manager.get_disease_snapshot()
+    disease_search_index.sync(version, diseases)
+    return disease_search_index
+
+SEVERITY_LEVELS = ("very_high", "high", "medium", "low", "very_low")
+
 def get_severity_level(confidence):
     """Déterminer le niveau de sévérité basé sur la confiance"""
     if confidence >= 0.9:
@@ -104,111 +185,171 @@ def get_severity_level(confidence):
         return "low"
     else:
         return "very_low"
-def save_image_permanently(temp_filepath, original_filename):
-    """Sauvegarder une image de manière permanente"""
-    try:
-        # Générer le nom de fichier avec timestamp
-        permanent_filename = generate_timestamped_filename(original_filename)
 
-        # Créer le dossier par date
-        date_folder = datetime.now().strftime("%Y-%m-%d")
-        daily_folder = os.path.join(PERMANENT_STORAGE, date_folder)
-        os.makedirs(daily_folder, exist_ok=True)
+def canonical_classification(classification):
+    """Classification du classifieur (déjà arrondie) complétée par le niveau de sévérité"""
+    return dict(classification, severity=get_severity_level(classification["confidence"]))
 
-        # Chemin complet du fichier permanent
-        permanent_filepath = os.path.join(daily_folder, permanent_filename)
 
-        # Copier le fichier
-        shutil.copy2(temp_filepath, permanent_filepath)
+# Statistiques des prédictions mises à jour à chaque ajout dans le journal
+prediction_stats = PredictionStatsAggregator(
+    os.path.join(PREDICTIONS_LOG, "stats_snapshot.json"),
+    bucket_fn=get_severity_level,
+    buckets=SEVERITY_LEVELS
+)
+prediction_stats.attach(prediction_store)
+atexit.register(prediction_stats.save_snapshot)
+
+
+# File de persistance asynchrone: images, journal et MongoDB écrits hors requête
+persistence_queue = PersistenceQueue(
+    prediction_store,
+    classifier.db_manager,
+    max_queue_size=PERSISTENCE_QUEUE_SIZE,
+    max_batch_size=PERSISTENCE_BATCH_SIZE,
+    flush_interval=PERSISTENCE_FLUSH_INTERVAL,
+    image_store=image_store
+)
+atexit.register(persistence_queue.shutdown)
+
+# Versions réduites des images (miniature, taille moyenne, WebP) mises en cache sur disque
+derivative_cache = ImageDerivativeCache(PERMANENT_STORAGE, DERIVATIVE_CACHE)
+
+# Maintenance du stockage (déduplication des anciens dossiers, ramasse-miettes)
+image_store.start_maintenance(STORAGE_GC_INTERVAL)
+atexit.register(image_store.stop_maintenance)
+
+
+def plan_permanent_image(original_filename, content_hash):
+    """Calculer l'emplacement permanent (blob adressé par contenu) d'une image sans l'écrire"""
+    return image_store.plan(content_hash, original_filename)
+
+def queue_prediction_persistence(prediction_record, image_bytes, image_plan):
+    """
+    Confier l'image uploadée et l'enregistrement à la file de persistance.
+    L'image est toujours transmise: le stockage ignore un contenu déjà écrit, et
+    metadata.image_saved est renseigné par la file une fois l'écriture faite.
+    """
+    # Blob adressé par contenu déjà présent: aucune nouvelle écriture
+    deduplicated = os.path.exists(image_plan["absolute_path"])
+    queued = persistence_queue.submit(
+        prediction_record,
+        image_data=image_bytes,
+        image_target=image_plan["absolute_path"]
+    )
+    return {
+        "persistence": "queued" if queued else "synchronous",
+        "image_deduplicated": deduplicated
+    }
 
-        # Retourner le chemin relatif pour la base de données
-        relative_path = os.path.join(date_folder, permanent_filename)
 
-        return {
-            "success": True,
-            "permanent_filename": permanent_filename,
-            "relative_path": relative_path,
-            "absolute_path": permanent_filepath,
-            "date_folder": date_folder
-        }
+def classification_cache_key(content_hash):
+    """Clé du cache des résultats: empreinte du contenu de l'image et version du modèle"""
+    return f"{content_hash}:{classifier.model_version}"
 
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde permanente: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
-def save_prediction_record(prediction_data):
-    """Sauvegarder un enregistrement de prédiction"""
-    try:
-        # Fichier de log quotidien
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(PREDICTIONS_LOG, "daily", f"predictions_{date_str}.json")
-
-        # Charger les prédictions existantes
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8') as f:
-                predictions = json.load(f)
-        else:
-            predictions = {"date": date_str, "predictions": []}
 
-        # Ajouter la nouvelle prédiction
-        predictions["predictions"].append(prediction_data)
+def build_reused_result(classification):
+    """Construire un résultat de classification à partir d'une classification réutilisée"""
+    return {
+        "success": True,
+        "timestamp": datetime.now().isoformat(),
+        "classification": classification,
+        # Informations maladie relues pour refléter la base de connaissances actuelle
+        "disease_info": classifier.get_disease_info(classification["predicted_class"])
+    }
 
-        # Sauvegarder
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(predictions, f, indent=2, ensure_ascii=False)
 
-        # Aussi sauvegarder dans un fichier global
-        global_log = os.path.join(PREDICTIONS_LOG, "all_predictions.json")
+def get_cached_classification(cache_key):
+    """
+    Reconstruire un résultat de classification depuis le cache.
+    Retourne (résultat, emplacement de l'image déjà stockée) ou (None, None).
+    """
+    entry = classification_cache.get(cache_key)
+    if entry is None:
+        return None, None
 
-        if os.path.exists(global_log):
-            with open(global_log, 'r', encoding='utf-8') as f:
-                all_predictions = json.load(f)
-        else:
-            all_predictions = {"total_predictions": 0, "predictions": []}
+    return build_reused_result(entry["classification"]), entry["image_plan"]
 
-        all_predictions["predictions"].append(prediction_data)
-        all_predictions["total_predictions"] = len(all_predictions["predictions"])
 
-        # Limiter à 1000 prédictions dans le fichier global
-        if len(all_predictions["predictions"]) > 1000:
-            all_predictions["predictions"] = all_predictions["predictions"][-1000:]
+def is_identified_user(user_id):
+    """Les quasi-doublons ne sont recherchés que parmi les images d'un même utilisateur connu"""
+    return bool(user_id) and user_id not in ('unknown', 'unknow', 'null', 'undefined')
 
-        with open(global_log, 'w', encoding='utf-8') as f:
-            json.dump(all_predictions, f, indent=2, ensure_ascii=False)
 
-        return {"success": True, "log_file": log_file}
+def find_near_duplicate(user_id, image_hash):
+    """Chercher une image quasi identique classifiée récemment par le même utilisateur"""
+    if image_hash is None or not is_identified_user(user_id):
+        return None
+    return near_duplicate_index.find(user_id, image_hash)
 
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde de prédiction: {e}")
-        return {"success": False, "error": str(e)}
-def save_to_database_if_available(prediction_record):
-    """Sauvegarder dans MongoDB si disponible"""
-    try:
-        if classifier.db_manager.use_mongodb:
-            # Sauvegarder dans la collection predictions
-            collection = classifier.db_manager.db.predictions
-            result = collection.insert_one(prediction_record)
-            return {"success": True, "inserted_id": str(result.inserted_id)}
-        else:
-            return {"success": False, "reason": "MongoDB not available"}
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde MongoDB: {e}")
-        return {"success": False, "error": str(e)}
+
+def register_near_duplicate(user_id, image_hash, prediction_id, result, near_duplicate, metadata):
+    """Indexer l'image classifiée et annoter l'enregistrement avec son cluster de doublons"""
+    if image_hash is None:
+        return
+
+    metadata["perceptual_hash"] = f"{image_hash:016x}"
+    if not is_identified_user(user_id):
+        return
+
+    cluster_id = near_duplicate["cluster_id"] if near_duplicate else None
+    near_duplicate_index.add(user_id, image_hash, prediction_id, result["classification"], cluster_id)
+
+    metadata["duplicate_cluster"] = cluster_id or prediction_id
+    if near_duplicate:
+        metadata["near_duplicate_of"] = near_duplicate["prediction_id"]
+        metadata["near_duplicate_distance"] = near_duplicate["distance"]
+
+
+def cache_classification(cache_key, result, image_plan):
+    """Mémoriser une classification réussie et l'emplacement de son image"""
+    classification_cache.set(cache_key, {
+        "classification": result["classification"],
+        "image_plan": image_plan
+    })
 
 
 
 # Utilitaires d'authentification
 def hash_password(password: str) -> str:
-    """Hasher un mot de passe"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Hasher un mot de passe (pool bcrypt, facteur BCRYPT_ROUNDS)"""
+    return password_hasher.hash(password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Vérifier un mot de passe"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    """Vérifier un mot de passe (pool bcrypt)"""
+    return password_hasher.verify(password, hashed)
+
+
+def rehash_password_if_needed(user_id: str, password: str, hashed: str):
+    """Remplacer en arrière-plan un hachage dont le facteur de coût a changé"""
+    def store(new_hash):
+        classifier.db_manager.db.users.update_one(
+            {'user_id': user_id, 'password_hash': hashed},
+            {'$set': {'password_hash': new_hash}}
+        )
+        invalidate_principal(user_id)
+
+    password_hasher.rehash_if_needed(password, hashed, store)
+
+
+def password_hasher_busy_response():
+    return jsonify({'error': 'Trop de demandes d\'authentification, réessayez dans un instant'}), 503
+
+
+def get_principal(user_id: str):
+    """Utilisateur actif correspondant à user_id, depuis le cache ou MongoDB"""
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = UserService(classifier.db_manager).get_user(user_id)
+        if user:
+            principal_cache.set(user_id, user)
+    return user
+
+
+def invalidate_principal(user_id: str):
+    """Retirer un utilisateur du cache après modification de son compte"""
+    principal_cache.pop(user_id)
 
 
 def generate_tokens(user_id: str) -> dict:
@@ -289,14 +430,13 @@ def token_required(f):
 
             # Récupérer l'utilisateur
             user_id = payload['user_id']
-            user_service = UserService(classifier.db_manager)
-            current_user = user_service.get_user(user_id)
+            current_user = get_principal(user_id)
 
             if not current_user:
                 return jsonify({'error': 'Utilisateur non trouvé'}), 401
 
-            # Ajouter l'utilisateur à la requête
-            request.current_user = current_user
+            # Ajouter l'utilisateur à la requête (copie: l'entrée du cache est partagée)
+            request.current_user = dict(current_user)
 
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token expiré'}), 401
@@ -414,6 +554,8 @@ def register():
             'tokens': tokens
         }), 201
 
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Erreur lors de l'inscription: {e}")
         return jsonify({'error': 'Erreur lors de l\'inscription'}), 500
@@ -445,6 +587,9 @@ def login():
         if not verify_password(data['password'], user['password_hash']):
             return jsonify({'error': 'Mot de passe incorrect'}), 401
 
+        # Facteur de coût obsolète: nouveau hachage sans ralentir la connexion
+        rehash_password_if_needed(user['user_id'], data['password'], user['password_hash'])
+
         # Mettre à jour la dernière activité
         classifier.db_manager.db.users.update_one(
             {'user_id': user['user_id']},
@@ -467,6 +612,8 @@ def login():
             'tokens': tokens
         })
 
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Erreur lors de la connexion: {e}")
         return jsonify({'error': 'Erreur lors de la connexion'}), 500
@@ -493,8 +640,7 @@ def refresh_token():
             user_id = payload['user_id']
 
             # Vérifier que l'utilisateur existe
-            user_service = UserService(classifier.db_manager)
-            user = user_service.get_user(user_id)
+            user = get_principal(user_id)
 
             if not user:
                 return jsonify({'error': 'Utilisateur non trouvé'}), 401
@@ -524,6 +670,7 @@ def logout():
     try:
         # Dans une implémentation complète, vous pourriez ajouter
         # les tokens à une blacklist stockée en base
+        invalidate_principal(request.current_user['user_id'])
 
         return jsonify({
             'success': True,
@@ -597,6 +744,7 @@ def update_profile():
                 {'user_id': user['user_id']},
                 {'$set': update_data}
             )
+            invalidate_principal(user['user_id'])
 
             if result.modified_count > 0:
                 # Récupérer l'utilisateur mis à jour
@@ -662,6 +810,7 @@ def change_password():
                     'updated_at': datetime.now()
                 }}
             )
+            invalidate_principal(user['user_id'])
 
             if result.modified_count > 0:
                 return jsonify({
@@ -673,6 +822,8 @@ def change_password():
         else:
             return jsonify({'error': 'MongoDB requis pour cette opération'}), 503
 
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Erreur lors du changement de mot de passe: {e}")
         return jsonify({'error': 'Erreur lors du changement de mot de passe'}), 500
@@ -703,6 +854,7 @@ def delete_account():
                     'updated_at': datetime.now()
                 }}
             )
+            invalidate_principal(user['user_id'])
 
             if result.modified_count > 0:
                 return jsonify({
@@ -714,6 +866,8 @@ def delete_account():
         else:
             return jsonify({'error': 'MongoDB requis pour cette opération'}), 503
 
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Erreur lors de la suppression du compte: {e}")
         return jsonify({'error': 'Erreur lors de la suppression du compte'}), 500
@@ -750,7 +904,10 @@ def health_check():
         "classes_supported": model_info['classes_supported'],
         "diseases_in_db": model_info['diseases_in_db'],
         "database_source": model_info['database_source'],
-        "mongodb_available": model_info['database_source'] == 'mongodb'
+        "mongodb_available": model_info['database_source'] == 'mongodb',
+        "persistence_queue_depth": persistence_queue.get_metrics()["queue_depth"],
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": password_hasher.get_stats()
     })
 
 
@@ -776,124 +933,118 @@ def classify_disease():
             # Générer un ID unique pour cette prédiction
             prediction_id = str(uuid.uuid4())
 
-            # Sauvegarder l'image temporairement
-            temp_filename = secure_filename(f"temp_{prediction_id}_{file.filename}")
-            temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-            file.save(temp_filepath)
-
-            try:
-                # Traiter l'image
-                processed_img = process_image(temp_filepath)
-
-                # Classifier l'image
-                result = classifier.classify(processed_img)
+            # Lire l'image en mémoire: décodage sans fichier temporaire
+            image_bytes = file.read()
+
+            # Image déjà classifiée: résultat et image stockée réutilisés
+            content_hash = image_store.digest(image_bytes)
+            cache_key = classification_cache_key(content_hash)
+            result, image_plan = get_cached_classification(cache_key)
+            cache_hit = result is not None
+            image_hash = None
+            near_duplicate = None
+
+            if not cache_hit:
+                # Prétraiter l'image à la taille d'entrée du modèle (un seul passage)
+                processed_img, image_hash = classifier.preprocess(image_bytes, with_hash=True)
+                if processed_img is None:
+                    return jsonify({"error": "Invalid image"}), 400
+
+                # Quasi-doublon récent du même utilisateur: pas de nouvelle inférence
+                near_duplicate = find_near_duplicate(user_id, image_hash)
+                if near_duplicate:
+                    result = build_reused_result(near_duplicate["classification"])
+                else:
+                    # Classifier l'image
+                    result = classifier.classify(processed_img)
 
                 if not result["success"]:
-                    # Supprimer le fichier temporaire en cas d'erreur
-                    if os.path.exists(temp_filepath):
-                        os.remove(temp_filepath)
                     return jsonify({"error": result.get("error", "Classification failed")}), 500
 
-                # Sauvegarder l'image de manière permanente
-                save_result = save_image_permanently(temp_filepath, file.filename)
-
-                if not save_result["success"]:
-                    logger.warning(f"Échec de la sauvegarde permanente: {save_result.get('error')}")
-
-                # Préparer les données de la prédiction
-                classification = result["classification"]
-                disease_info = result.get("disease_info", {})
-
-                # Créer l'enregistrement de prédiction avec user_id
-                prediction_record = {
-                    "prediction_id": prediction_id,
-                    "user_id": user_id,  # Ajout du user_id
-                    "timestamp": result["timestamp"],
-                    "original_filename": file.filename,
-                    "processed_filename": save_result.get("permanent_filename"),
-                    "image_path": save_result.get("relative_path"),
-                    "file_size": os.path.getsize(temp_filepath),
-                    "classification": {
-                        "predicted_class": classification["predicted_class"],
-                        "class_id": classification["class_id"],
-                        "confidence": float(f"{float(str(classification['confidence'])):.2f}"),
-                        "confidence_percentage": float(f"{float(str(classification['confidence_percentage'])):.2f}"),
-                        "severity": get_severity_level(classification["confidence"]),
-                        "top5_predictions": classification.get("top5_predictions", [])
-                    },
-                    "disease_info": disease_info,
-                    "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
-                    "metadata": {
-                        "user_agent": request.headers.get('User-Agent'),
-                        "client_ip": request.remote_addr,
-                        "image_saved": save_result["success"],
-                        "authenticated": user_id not in 'unknow'
-                    }
+                # Emplacement permanent de l'image (écrite par la file de persistance)
+                image_plan = plan_permanent_image(file.filename, content_hash)
+                if not near_duplicate:
+                    # Résultat approché d'un quasi-doublon: propre à cet utilisateur, jamais
+                    # mémorisé comme résultat exact de ces octets
+                    cache_classification(cache_key, result, image_plan)
+
+            # Préparer les données de la prédiction: une seule structure pour le journal et la réponse
+            classification = canonical_classification(result["classification"])
+            disease_info = result.get("disease_info", {})
+
+            # Créer l'enregistrement de prédiction avec user_id
+            prediction_record = {
+                "prediction_id": prediction_id,
+                "user_id": user_id,  # Ajout du user_id
+                "timestamp": result["timestamp"],
+                "original_filename": file.filename,
+                "processed_filename": image_plan["permanent_filename"],
+                "image_path": image_plan["relative_path"],
+                "file_size": len(image_bytes),
+                "classification": classification,
+                "disease_info": disease_info,
+                "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
+                "metadata": {
+                    "user_agent": request.headers.get('User-Agent'),
+                    "client_ip": request.remote_addr,
+                    "image_saved": False,
+                    "cache_hit": cache_hit,
+                    "authenticated": user_id not in 'unknow'
                 }
+            }
+            register_near_duplicate(user_id, image_hash, prediction_id, result,
+                                    near_duplicate, prediction_record["metadata"])
 
-                # Sauvegarder l'enregistrement de prédiction
-                json_save_result = save_prediction_record(prediction_record)
-                mongodb_save_result = save_to_database_if_available(prediction_record)
-
-                # Formater la réponse finale
-                response = {
-                    "success": True,
-                    "prediction_id": prediction_id,
-                    "timestamp": result["timestamp"],
-                    "classification": {
-                        "predicted_class": classification["predicted_class"],
-                        "class_id": classification["class_id"],
-                        "confidence": float(f"{float(str(classification['confidence'])):.2f}"),
-                        "confidence_percentage": float(f"{float(str(classification['confidence_percentage'])):.2f}"),
-                        "severity": get_severity_level(classification["confidence"]),
-                        "top5_predictions": classification.get("top5_predictions", [])
-                    },
-                    "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
-                    "storage_info": {
-                        "image_saved": save_result["success"],
-                        "prediction_logged": json_save_result["success"],
-                        "mongodb_saved": mongodb_save_result["success"]
-                    }
-                }
+            # Persistance hors requête: une seule écriture de l'image, dans le stockage permanent
+            storage_info = queue_prediction_persistence(
+                prediction_record, image_bytes, image_plan
+            )
 
-                # Ajouter les informations détaillées sur la maladie/état
-                if disease_info:
-                    response["disease_info"] = {
-                        "category": disease_info["category"],
-                        "name": disease_info["name"],
-                        "scientific_name": disease_info.get("scientific_name", ""),
-                        "description": disease_info["description"],
-                        "urgency": disease_info["urgency"],
-                        "symptoms": disease_info["symptoms"],
-                        "crops_affected": disease_info["crops"],
-                        "impact": disease_info.get("impact", ""),
-                        "geographic_distribution": disease_info.get("geographic_distribution", "")
-                    }
+            # Formater la réponse finale
+            response = {
+                "success": True,
+                "prediction_id": prediction_id,
+                "timestamp": result["timestamp"],
+                "classification": classification,
+                "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
+                "cached": cache_hit,
+                "near_duplicate_of": near_duplicate["prediction_id"] if near_duplicate else None,
+                "storage_info": storage_info
+            }
 
-                    # Informations spécifiques aux maladies
-                    if disease_info["category"] == "disease":
-                        response["disease_info"].update({
-                            "pathogens": disease_info.get("pathogens", []),
-                            "vectors": disease_info.get("vectors", []),
-                            "prevention_measures": disease_info.get("prevention_measures", [])
-                        })
+            # Ajouter les informations détaillées sur la maladie/état
+            if disease_info:
+                response["disease_info"] = {
+                    "category": disease_info["category"],
+                    "name": disease_info["name"],
+                    "scientific_name": disease_info.get("scientific_name", ""),
+                    "description": disease_info["description"],
+                    "urgency": disease_info["urgency"],
+                    "symptoms": disease_info["symptoms"],
+                    "crops_affected": disease_info["crops"],
+                    "impact": disease_info.get("impact", ""),
+                    "geographic_distribution": disease_info.get("geographic_distribution", "")
+                }
 
-                        # Obtenir les traitements recommandés
-                        treatments = classifier.get_treatment_recommendations(
-                            classification["predicted_class"]
-                        )
-                        response["disease_info"]["treatment_recommendations"] = treatments
+                # Informations spécifiques aux maladies
+                if disease_info["category"] == "disease":
+                    response["disease_info"].update({
+                        "pathogens": disease_info.get("pathogens", []),
+                        "vectors": disease_info.get("vectors", []),
+                        "prevention_measures": disease_info.get("prevention_measures", [])
+                    })
 
-                    # Informations pour état sain
-                    elif disease_info["category"] == "healthy_state":
-                        response["disease_info"]["recommendations"] = disease_info.get("recommendations", [])
+                    # Obtenir les traitements recommandés
+                    treatments = classifier.get_treatment_recommendations(
+                        classification["predicted_class"]
+                    )
+                    response["disease_info"]["treatment_recommendations"] = treatments
 
-                return jsonify(response)
+                # Informations pour état sain
+                elif disease_info["category"] == "healthy_state":
+                    response["disease_info"]["recommendations"] = disease_info.get("recommendations", [])
 
-            finally:
-                # Supprimer le fichier temporaire
-                if os.path.exists(temp_filepath):
-                    os.remove(temp_filepath)
+            return jsonify(response)
 
         else:
             return jsonify({"error": "Invalid file type"}), 400
@@ -925,113 +1076,165 @@ def classify_batch():
 
         batch_id = str(uuid.uuid4())
         results = []
-        temp_filepaths = []
 
-        try:
-            # Sauvegarder toutes les images temporairement
-            for i, file in enumerate(files):
-                if file and allowed_file(file.filename):
-                    temp_filename = secure_filename(f"batch_{batch_id}_{i}_{file.filename}")
-                    temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
-                    file.save(temp_filepath)
-                    temp_filepaths.append(temp_filepath)
-
-            # Traiter et classifier toutes les images
-            for i, (temp_filepath, file) in enumerate(zip(temp_filepaths, files)):
-                prediction_id = f"{batch_id}_{i}"
-
-                try:
-                    # Traiter l'image
-                    processed_img = process_image(temp_filepath)
-
-                    # Classifier
-                    classification = classifier.classify(processed_img)
-
-                    if classification["success"]:
-                        # Sauvegarder l'image de manière permanente
-                        save_result = save_image_permanently(temp_filepath, file.filename)
-
-                        # Créer l'enregistrement de prédiction avec user_id
-                        prediction_record = {
-                            "prediction_id": prediction_id,
-                            "user_id": user_id,  # Ajout du user_id
-                            "batch_id": batch_id,
-                            "image_index": i,
-                            "timestamp": classification["timestamp"],
-                            "original_filename": file.filename,
-                            "processed_filename": save_result.get("permanent_filename"),
-                            "image_path": save_result.get("relative_path"),
-                            "file_size": os.path.getsize(temp_filepath),
-                            "classification": classification["classification"],
-                            "disease_info": classification.get("disease_info", {}),
-                            "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
-                            "metadata": {
-                                "user_agent": request.headers.get('User-Agent'),
-                                "client_ip": request.remote_addr,
-                                "image_saved": save_result["success"],
-                                "batch_processing": True,
-                                "authenticated": user_id not in 'unknown'
-                            }
-                        }
+        # Lire toutes les images en mémoire (pas de fichiers temporaires)
+        uploads = [(i, file, file.read()) for i, file in enumerate(files)
+                   if file and allowed_file(file.filename)]
+
+        # Résultats déjà en cache (images identiques déjà classifiées)
+        content_hashes = [image_store.digest(image_bytes) for _, _, image_bytes in uploads]
+        cache_keys = [classification_cache_key(content_hash) for content_hash in content_hashes]
+        classifications = {}
+        cached_plans = {}
+        for j, cache_key in enumerate(cache_keys):
+            cached_result, cached_plan = get_cached_classification(cache_key)
+            if cached_result is not None:
+                classifications[j] = cached_result
+                cached_plans[j] = cached_plan
+
+        # Traiter les autres images; quasi-doublons récents réutilisés sans inférence
+        processed_images = {}
+        image_hashes = {}
+        near_duplicates = {}
+        batch_duplicates = {}
+        duplicate_images = {}
+        for j, (i, file, image_bytes) in enumerate(uploads):
+            if j in classifications:
+                continue
+            try:
+                processed_images[j], image_hashes[j] = classifier.preprocess(image_bytes, with_hash=True)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de {file.filename}: {e}")
+                continue
+
+            near_duplicate = find_near_duplicate(user_id, image_hashes[j])
+            if near_duplicate:
+                near_duplicates[j] = near_duplicate
+                classifications[j] = build_reused_result(near_duplicate["classification"])
+                del processed_images[j]
+                continue
+
+            # Quasi-doublon d'une image précédente du même lot (rafale)
+            if image_hashes[j] is not None and is_identified_user(user_id):
+                for k, img in processed_images.items():
+                    if (k != j and img is not None and
+                            hamming_distance(image_hashes[k], image_hashes[j]) <= near_duplicate_index.max_distance):
+                        batch_duplicates[j] = k
+                        duplicate_images[j] = processed_images.pop(j)
+                        break
+
+        # Classifier toutes les images valides en un seul passage du modèle
+        valid_indices = [j for j, img in processed_images.items() if img is not None]
+        batch_results = classifier.classify_batch([processed_images[j] for j in valid_indices])
+        classifications.update(zip(valid_indices, batch_results))
+
+        for j, k in list(batch_duplicates.items()):
+            if classifications.get(k, {}).get("success"):
+                classifications[j] = build_reused_result(classifications[k]["classification"])
+            else:
+                # Image de référence non classifiée: l'image est classifiée elle-même
+                del batch_duplicates[j]
 
-                        # Sauvegarder l'enregistrement
-                        json_save_result = save_prediction_record(prediction_record)
-                        mongodb_save_result = save_to_database_if_available(prediction_record)
-
-                        result = {
-                            "image_index": i,
-                            "prediction_id": prediction_id,
-                            "filename": file.filename,
-                            "success": True,
-                            "classification": {
-                                "predicted_class": classification["classification"]["predicted_class"],
-                                "class_id": classification["classification"]["class_id"],
-                                "confidence": float(f"{float(str(classification['classification']['confidence'])):.2f}"),
-                                "confidence_percentage": float(f"{float(str(classification['classification']['confidence_percentage'])):.2f}"),
-                                "severity": get_severity_level(classification["classification"]["confidence"])
-                            },
-                            "disease_info": classification.get("disease_info", {}),
-                            "storage_info": {
-                                "image_saved": save_result["success"],
-                                "prediction_logged": json_save_result["success"],
-                                "mongodb_saved": mongodb_save_result["success"]
-                            }
-                        }
-                    else:
-                        result = {
-                            "image_index": i,
-                            "prediction_id": prediction_id,
-                            "filename": file.filename,
-                            "success": False,
-                            "error": classification.get("error", "Classification failed")
-                        }
+        fallback_indices = [j for j in duplicate_images if j not in batch_duplicates]
+        if fallback_indices:
+            fallback_results = classifier.classify_batch([duplicate_images[j] for j in fallback_indices])
+            classifications.update(zip(fallback_indices, fallback_results))
+
+        for j, (i, file, image_bytes) in enumerate(uploads):
+            prediction_id = f"{batch_id}_{i}"
 
-                    results.append(result)
+            try:
+                classification = classifications.get(j, {
+                    "success": False,
+                    "error": "Impossible de traiter l'image"
+                })
 
-                except Exception as e:
-                    results.append({
+                if classification["success"]:
+                    canonical = canonical_classification(classification["classification"])
+                    cache_hit = j in cached_plans
+                    if cache_hit:
+                        image_plan = cached_plans[j]
+                    else:
+                        # Emplacement permanent de l'image (écrite par la file de persistance)
+                        image_plan = plan_permanent_image(file.filename, content_hashes[j])
+                        if j not in near_duplicates and j not in batch_duplicates:
+                            # Seuls les résultats d'inférence valent pour ces octets exacts
+                            cache_classification(cache_keys[j], classification, image_plan)
+
+                    # Créer l'enregistrement de prédiction avec user_id
+                    prediction_record = {
+                        "prediction_id": prediction_id,
+                        "user_id": user_id,  # Ajout du user_id
+                        "batch_id": batch_id,
+                        "image_index": i,
+                        "timestamp": classification["timestamp"],
+                        "original_filename": file.filename,
+                        "processed_filename": image_plan["permanent_filename"],
+                        "image_path": image_plan["relative_path"],
+                        "file_size": len(image_bytes),
+                        "classification": canonical,
+                        "disease_info": classification.get("disease_info", {}),
+                        "database_source": classifier.db_manager.use_mongodb and "mongodb" or "json",
+                        "metadata": {
+                            "user_agent": request.headers.get('User-Agent'),
+                            "client_ip": request.remote_addr,
+                            "image_saved": False,
+                            "cache_hit": cache_hit,
+                            "batch_processing": True,
+                            "authenticated": user_id not in 'unknown'
+                        }
+                    }
+                    if j in batch_duplicates:
+                        # L'image de référence du lot vient d'être indexée
+                        near_duplicates[j] = find_near_duplicate(user_id, image_hashes[j])
+                    register_near_duplicate(user_id, image_hashes.get(j), prediction_id, classification,
+                                            near_duplicates.get(j), prediction_record["metadata"])
+
+                    # Persistance hors requête: une seule écriture de l'image, dans le stockage permanent
+                    storage_info = queue_prediction_persistence(
+                        prediction_record, image_bytes, image_plan
+                    )
+
+                    result = {
+                        "image_index": i,
+                        "prediction_id": prediction_id,
+                        "filename": file.filename,
+                        "success": True,
+                        "classification": canonical,
+                        "disease_info": classification.get("disease_info", {}),
+                        "cached": cache_hit,
+                        "near_duplicate_of": near_duplicates[j]["prediction_id"] if near_duplicates.get(j) else None,
+                        "storage_info": storage_info
+                    }
+                else:
+                    result = {
                         "image_index": i,
                         "prediction_id": prediction_id,
                         "filename": file.filename,
                         "success": False,
-                        "error": str(e)
-                    })
+                        "error": classification.get("error", "Classification failed")
+                    }
 
-            return jsonify({
-                "success": True,
-                "batch_id": batch_id,
-                "total_images": len(files),
-                "processed_images": len(results),
-                "successful_predictions": len([r for r in results if r["success"]]),
-                "results": results,
-                "timestamp": datetime.now().isoformat()
-            })
+                results.append(result)
 
-        finally:
-            # Nettoyer tous les fichiers temporaires
-            for temp_filepath in temp_filepaths:
-                if os.path.exists(temp_filepath):
-                    os.remove(temp_filepath)
+            except Exception as e:
+                results.append({
+                    "image_index": i,
+                    "prediction_id": prediction_id,
+                    "filename": file.filename,
+                    "success": False,
+                    "error": str(e)
+                })
+
+        return jsonify({
+            "success": True,
+            "batch_id": batch_id,
+            "total_images": len(files),
+            "processed_images": len(results),
+            "successful_predictions": len([r for r in results if r["success"]]),
+            "results": results,
+            "timestamp": datetime.now().isoformat()
+        })
 
     except Exception as e:
         logger.error(f"Erreur lors de la classification batch: {e}")
@@ -1040,12 +1243,26 @@ def classify_batch():
 # ENDPOINTS POUR LA BASE DE DONNÉES
 # ========================================
 
+def materialized_response(view):
+    """
+    Servir une réponse matérialisée pour la version courante des connaissances,
+    avec ETag et 304 si le client l'a déjà
+    """
+    version, _ = classifier.db_manager.get_disease_snapshot()
+    body, etag = view.get(version)
+
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # toujours revalider, 304 si inchangé
+    return response.make_conditional(request)
+
+diseases_response = MaterializedJSON(lambda: classifier.get_diseases_database())
+
 @app.route('/api/diseases', methods=['GET'])
 def get_all_diseases():
     """Obtenir la liste de toutes les maladies"""
     try:
-        diseases = classifier.get_diseases_database()
-        return jsonify(diseases)
+        return materialized_response(diseases_response)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des maladies: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1131,6 +1348,8 @@ def get_model_stats():
                 "database_source": model_info['database_source'],
                 "mongodb_available": model_info['database_source'] == 'mongodb'
             },
+            "inference": classifier.get_inference_info(),
+            "result_cache": classification_cache.stats(),
             "metadata": model_info.get('metadata', {}),
             "timestamp": datetime.now().isoformat()
         })
@@ -1139,56 +1358,105 @@ def get_model_stats():
         logger.error(f"Erreur lors de la récupération des stats du modèle: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/stats/database', methods=['GET'])
-def get_database_stats():
-    """Obtenir les statistiques de la base de données"""
+@app.route('/api/stats/duplicates', methods=['GET'])
+def get_duplicate_stats():
+    """Obtenir les statistiques des quasi-doublons (clusters d'images quasi identiques)"""
     try:
-        diseases_db = classifier.get_diseases_database()
-
-        # Analyser les données
-        stats = {
-            "total_entries": diseases_db.get('total', 0),
-            "database_source": diseases_db.get('source', 'unknown'),
-            "categories": {},
-            "urgency_levels": {},
-            "crops_affected": {}
-        }
-
-        # Analyser les maladies
-        diseases_data = diseases_db.get('diseases', {})
-
-        # Pour MongoDB, les données sont déjà formatées
-        if diseases_db.get('source') == 'mongodb':
-            for disease_class, disease_info in diseases_data.items():
-                category = disease_info.get('category', 'unknown')
-                urgency = disease_info.get('urgency', 'unknown')
-                crops = disease_info.get('crops', [])
-
-                # Compter les catégories
-                stats['categories'][category] = stats['categories'].get(category, 0) + 1
-
-                # Compter les niveaux d'urgence
-                stats['urgency_levels'][urgency] = stats['urgency_levels'].get(urgency, 0) + 1
+        return jsonify({
+            "success": True,
+            "duplicate_stats": near_duplicate_index.get_stats(),
+            "timestamp": datetime.now().isoformat()
+        })
 
-                # Compter les cultures affectées
-                for crop in crops:
-                    stats['crops_affected'][crop] = stats['crops_affected'].get(crop, 0) + 1
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des statistiques de doublons: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # Pour JSON, analyser la structure
-        elif diseases_db.get('source') == 'json':
-            raw_data = diseases_data
+@app.route('/api/stats/storage', methods=['GET'])
+def get_storage_stats():
+    """Obtenir les statistiques du stockage des images (déduplication, ramasse-miettes)"""
+    try:
+        return jsonify({
+            "success": True,
+            "storage_stats": image_store.get_stats(),
+            "derivative_stats": derivative_cache.get_stats(),
+            "timestamp": datetime.now().isoformat()
+        })
 
-            # Analyser les différentes sections
-            for section_name, section_data in raw_data.items():
-                if isinstance(section_data, dict):
-                    stats['categories'][section_name] = len(section_data)
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des statistiques de stockage: {e}")
+        return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stats/persistence', methods=['GET'])
+def get_persistence_stats():
+    """Obtenir les métriques de la file de persistance"""
+    try:
         return jsonify({
             "success": True,
-            "database_stats": stats,
+            "persistence_stats": persistence_queue.get_metrics(),
             "timestamp": datetime.now().isoformat()
         })
 
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des métriques de persistance: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def build_database_stats():
+    """Statistiques de la base de connaissances (recalculées à chaque nouvelle version)"""
+    diseases_db = classifier.get_diseases_database()
+
+    # Analyser les données
+    stats = {
+        "total_entries": diseases_db.get('total', 0),
+        "database_source": diseases_db.get('source', 'unknown'),
+        "categories": {},
+        "urgency_levels": {},
+        "crops_affected": {}
+    }
+
+    # Analyser les maladies
+    diseases_data = diseases_db.get('diseases', {})
+
+    # Pour MongoDB, les données sont déjà formatées
+    if diseases_db.get('source') == 'mongodb':
+        for disease_class, disease_info in diseases_data.items():
+            category = disease_info.get('category', 'unknown')
+            urgency = disease_info.get('urgency', 'unknown')
+            crops = disease_info.get('crops', [])
+
+            # Compter les catégories
+            stats['categories'][category] = stats['categories'].get(category, 0) + 1
+
+            # Compter les niveaux d'urgence
+            stats['urgency_levels'][urgency] = stats['urgency_levels'].get(urgency, 0) + 1
+
+            # Compter les cultures affectées
+            for crop in crops:
+                stats['crops_affected'][crop] = stats['crops_affected'].get(crop, 0) + 1
+
+    # Pour JSON, analyser la structure
+    elif diseases_db.get('source') == 'json':
+        raw_data = diseases_data
+
+        # Analyser les différentes sections
+        for section_name, section_data in raw_data.items():
+            if isinstance(section_data, dict):
+                stats['categories'][section_name] = len(section_data)
+
+    return {
+        "success": True,
+        "database_stats": stats,
+        "generated_at": datetime.now().isoformat()
+    }
+
+database_stats_response = MaterializedJSON(build_database_stats, volatile_keys=("generated_at",))
+
+@app.route('/api/stats/database', methods=['GET'])
+def get_database_stats():
+    """Obtenir les statistiques de la base de données (recalculées si la base change)"""
+    try:
+        return materialized_response(database_stats_response)
+
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des stats de la base: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1218,50 +1486,36 @@ def get_supported_classes():
 def search_diseases():
     """Rechercher des maladies par nom ou symptômes"""
     try:
-        query = request.args.get('q', '').lower()
+        query = request.args.get('q', '').strip()
         category = request.args.get('category', None)
 
         if not query:
             return jsonify({"error": "Paramètre de recherche 'q' requis"}), 400
 
-        # Obtenir toutes les maladies
-        diseases_db = classifier.get_diseases_database()
-        diseases_data = diseases_db.get('diseases', {})
+        corrections = {}
+        matches = get_search_index().search(query, category=category, limit=None, corrections=corrections)
 
         results = []
-
-        # Rechercher dans les données
-        for disease_class, disease_info in diseases_data.items():
-            if isinstance(disease_info, dict):
-                # Rechercher dans le nom
-                name = disease_info.get('name', '').lower()
-                description = disease_info.get('description', '').lower()
-                symptoms = str(disease_info.get('symptoms', [])).lower()
-
-                # Vérifier si la requête correspond
-                if (query in name or query in description or query in symptoms):
-                    # Filtrer par catégorie si spécifiée
-                    if category and disease_info.get('category') != category:
-                        continue
-
-                    results.append({
-                        "disease_class": disease_class,
-                        "name": disease_info.get('name', ''),
-                        "category": disease_info.get('category', ''),
-                        "description": disease_info.get('description', '')[:200] + "..." if len(disease_info.get('description', '')) > 200 else disease_info.get('description', ''),
-                        "urgency": disease_info.get('urgency', ''),
-                        "relevance_score": calculate_relevance_score(query, disease_info)
-                    })
-
-        # Trier par score de pertinence
-        results.sort(key=lambda x: x['relevance_score'], reverse=True)
+        for match in matches[:20]:  # Limiter à 20 résultats
+            disease_info = match["disease"]
+            description = disease_info.get('description', '')
+            results.append({
+                "disease_class": match["disease_class"],
+                "name": disease_info.get('name', ''),
+                "category": disease_info.get('category', ''),
+                "description": description[:200] + "..." if len(description) > 200 else description,
+                "urgency": disease_info.get('urgency', ''),
+                "relevance_score": match["score"],
+                "matched_terms": match["matched_terms"]
+            })
 
         return jsonify({
             "success": True,
             "query": query,
             "category_filter": category,
-            "total_results": len(results),
-            "results": results[:20],  # Limiter à 20 résultats
+            "corrections": corrections,
+            "total_results": len(matches),
+            "results": results,
             "timestamp": datetime.now().isoformat()
         })
 
@@ -1270,112 +1524,136 @@ def search_diseases():
         return jsonify({"error": str(e)}), 500
 
 
+DATE_PARAM_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def date_param(name):
+    """Paramètre de date YYYY-MM-DD optionnel; ValueError s'il est mal formé"""
+    value = request.args.get(name)
+    if value and not DATE_PARAM_PATTERN.match(value):
+        raise ValueError(f"Paramètre '{name}' invalide (format attendu: YYYY-MM-DD)")
+    return value
+
 @app.route('/api/predictions/history', methods=['GET'])
 def get_predictions_history():
-    """Obtenir l'historique des prédictions"""
+    """
+    Obtenir l'historique des prédictions
+
+    Pagination par curseur: passer le next_cursor de la réponse précédente dans
+    ?cursor=. Le paramètre offset reste accepté pour les anciens clients.
+    """
     try:
         # Paramètres de requête
-        date = request.args.get('date')  # Format: YYYY-MM-DD
-        limit = int(request.args.get('limit', 50))
-        offset = int(request.args.get('offset', 0))
-
-        if date:
-            # Charger les prédictions d'une date spécifique
-            log_file = os.path.join(PREDICTIONS_LOG, "daily", f"predictions_{date}.json")
-
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                predictions = data.get("predictions", [])
-                total = len(predictions)
-
-                # Appliquer pagination
-                paginated_predictions = predictions[offset:offset + limit]
-
-                return jsonify({
-                    "success": True,
-                    "date": date,
-                    "total_predictions": total,
-                    "returned_predictions": len(paginated_predictions),
-                    "offset": offset,
-                    "limit": limit,
-                    "predictions": paginated_predictions
-                })
-            else:
-                return jsonify({
-                    "success": True,
-                    "date": date,
-                    "total_predictions": 0,
-                    "predictions": []
-                })
-
+        date = date_param('date')  # Format: YYYY-MM-DD
+        user_id = request.args.get('user_id')
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        cursor = request.args.get('cursor')
+
+        # Les prédictions d'une date sont retournées dans l'ordre chronologique,
+        # l'historique global du plus récent au plus ancien
+        newest_first = not date
+
+        if 'offset' in request.args and not cursor:
+            offset = int(request.args.get('offset', 0))
+            total, predictions = prediction_store.query(
+                date=date,
+                offset=offset,
+                limit=limit,
+                newest_first=newest_first,
+                user_id=user_id
+            )
+            response = {
+                "success": True,
+                "total_predictions": total,
+                "returned_predictions": len(predictions),
+                "offset": offset,
+                "limit": limit,
+                "predictions": predictions
+            }
         else:
-            # Charger depuis le fichier global
-            global_log = os.path.join(PREDICTIONS_LOG, "all_predictions.json")
-
-            if os.path.exists(global_log):
-                with open(global_log, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                predictions = data.get("predictions", [])
-                total = len(predictions)
-
-                # Trier par timestamp décroissant
-                predictions.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-
-                # Appliquer pagination
-                paginated_predictions = predictions[offset:offset + limit]
+            predictions, next_cursor = prediction_store.page(
+                cursor=cursor,
+                limit=limit,
+                newest_first=newest_first,
+                date=date,
+                user_id=user_id
+            )
+            response = {
+                "success": True,
+                "total_predictions": prediction_store.count(date, user_id),
+                "returned_predictions": len(predictions),
+                # Première page: même forme que la pagination par offset des anciens clients
+                "offset": None if cursor else 0,
+                "limit": limit,
+                "cursor": cursor,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
+                "predictions": predictions
+            }
+        if date:
+            response["date"] = date
 
-                return jsonify({
-                    "success": True,
-                    "total_predictions": total,
-                    "returned_predictions": len(paginated_predictions),
-                    "offset": offset,
-                    "limit": limit,
-                    "predictions": paginated_predictions
-                })
-            else:
-                return jsonify({
-                    "success": True,
-                    "total_predictions": 0,
-                    "predictions": []
-                })
+        return jsonify(response)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'historique: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/predictions/export', methods=['GET'])
+def export_predictions():
+    """
+    Exporter les prédictions en NDJSON (une prédiction par ligne), en flux continu
+    et dans l'ordre chronologique: ?from=YYYY-MM-DD&to=YYYY-MM-DD&user_id=...
+    """
+    try:
+        date = date_param('date')
+        date_from = date_param('from') or date
+        date_to = date_param('to') or date
+        entries = prediction_store.iter_entries(
+            newest_first=False,
+            cursor=request.args.get('cursor'),
+            date_from=date_from,
+            date_to=date_to,
+            user_id=request.args.get('user_id')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        # Lignes du journal renvoyées telles quelles, un segment en mémoire à la fois
+        for _, _, line, _ in entries:
+            yield line if line.endswith(b"\n") else line + b"\n"
+
+    filename = f"predictions_{date_from or 'debut'}_{date_to or 'fin'}.ndjson"
+    return app.response_class(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/predictions/<prediction_id>', methods=['GET'])
 def get_prediction_details(prediction_id):
     """Obtenir les détails d'une prédiction spécifique"""
     try:
-        # Chercher dans le fichier global
-        global_log = os.path.join(PREDICTIONS_LOG, "all_predictions.json")
-
-        if os.path.exists(global_log):
-            with open(global_log, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            predictions = data.get("predictions", [])
+        if prediction_store.total_records == 0:
+            return jsonify({
+                "success": False,
+                "error": "Aucun historique disponible"
+            }), 404
 
-            # Trouver la prédiction
-            prediction = next((p for p in predictions if p.get("prediction_id") == prediction_id), None)
+        # Trouver la prédiction via l'index des identifiants
+        prediction = prediction_store.get(prediction_id)
 
-            if prediction:
-                return jsonify({
-                    "success": True,
-                    "prediction": prediction
-                })
-            else:
-                return jsonify({
-                    "success": False,
-                    "error": "Prédiction non trouvée"
-                }), 404
+        if prediction:
+            return jsonify({
+                "success": True,
+                "prediction": prediction
+            })
         else:
             return jsonify({
                 "success": False,
-                "error": "Aucun historique disponible"
+                "error": "Prédiction non trouvée"
             }), 404
 
     except Exception as e:
@@ -1386,89 +1664,88 @@ def get_prediction_details(prediction_id):
 def get_predictions_stats():
     """Obtenir les statistiques des prédictions"""
     try:
-        global_log = os.path.join(PREDICTIONS_LOG, "all_predictions.json")
-
-        if os.path.exists(global_log):
-            with open(global_log, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            predictions = data.get("predictions", [])
-
-            # Calculer les statistiques
-            stats = {
-                "total_predictions": len(predictions),
-                "predictions_by_class": {},
-                "predictions_by_date": {},
-                "average_confidence": 0,
-                "confidence_distribution": {
-                    "très_élevé": 0,
-                    "élevé": 0,
-                    "modéré": 0,
-                    "faible": 0
-                }
-            }
-
-            if predictions:
-                confidences = []
-
-                for prediction in predictions:
-                    # Compter par classe
-                    predicted_class = prediction.get("classification", {}).get("predicted_class", "unknown")
-                    stats["predictions_by_class"][predicted_class] = stats["predictions_by_class"].get(predicted_class,
-                                                                                                       0) + 1
-
-                    # Compter par date
-                    date = prediction.get("timestamp", "")[:10]  # YYYY-MM-DD
-                    stats["predictions_by_date"][date] = stats["predictions_by_date"].get(date, 0) + 1
-
-                    # Confiance
-                    confidence = prediction.get("classification", {}).get("confidence", 0)
-                    confidences.append(confidence)
-
-                    # Distribution de confiance
-                    severity = get_severity_level(confidence)
-                    stats["confidence_distribution"][severity] = stats["confidence_distribution"].get(severity, 0) + 1
-
-                # Moyenne de confiance
-                stats["average_confidence"] = sum(confidences) / len(confidences) if confidences else 0
-
-            return jsonify({
-                "success": True,
-                "stats": stats,
-                "timestamp": datetime.now().isoformat()
-            })
-        else:
-            return jsonify({
-                "success": True,
-                "stats": {
-                    "total_predictions": 0,
-                    "predictions_by_class": {},
-                    "predictions_by_date": {},
-                    "average_confidence": 0,
-                    "confidence_distribution": {
-                        "très_élevé": 0,
-                        "élevé": 0,
-                        "modéré": 0,
-                        "faible": 0
-                    }
-                }
-            })
+        return jsonify({
+            "success": True,
+            "stats": prediction_stats.as_dict(),
+            "timestamp": datetime.now().isoformat()
+        })
 
     except Exception as e:
         logger.error(f"Erreur lors du calcul des statistiques: {e}")
         return jsonify({"error": str(e)}), 500
 
+def send_stored_image(file_path, etag, immutable, mimetype=None):
+    """
+    Envoyer un fichier du stockage avec ETag fort, Cache-Control et requêtes
+    conditionnelles (If-None-Match -> 304, Range -> 206)
+
+    Avec IMAGE_SENDFILE_MODE=x-accel-redirect, seuls les en-têtes sont produits
+    ici et nginx envoie le fichier depuis IMAGE_ACCEL_PREFIX.
+    """
+    if IMAGE_SENDFILE_MODE == 'x-accel-redirect':
+        response = app.response_class(mimetype=mimetype or mimetypes.guess_type(file_path)[0])
+        response.set_etag(etag)
+        response.last_modified = os.path.getmtime(file_path)
+        response.make_conditional(request)
+        if response.status_code == 200:
+            internal_path = os.path.relpath(file_path, STORAGE_ROOT).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = IMAGE_ACCEL_PREFIX.rstrip('/') + '/' + internal_path
+    else:
+        response = send_file(file_path, mimetype=mimetype, conditional=True, etag=etag)
+
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={IMAGE_CACHE_MAX_AGE}, must-revalidate'
+    return response
+
 @app.route('/api/images/<path:image_path>', methods=['GET'])
 def serve_saved_image(image_path):
-    """Servir une image sauvegardée"""
+    """
+    Servir une image sauvegardée, ou une version réduite avec
+    ?size=thumbnail|medium et optionnellement &format=jpeg|webp
+    """
     try:
-        full_path = os.path.join(PERMANENT_STORAGE, image_path)
+        full_path = safe_join(PERMANENT_STORAGE, image_path)
 
-        if os.path.exists(full_path):
-            return send_file(full_path)
-        else:
+        if full_path is None or not os.path.isfile(full_path):
             return jsonify({"error": "Image non trouvée"}), 404
 
+        relative_path = os.path.relpath(full_path, PERMANENT_STORAGE)
+        content_hash = image_store.content_hash(relative_path)
+        if content_hash is None:
+            return jsonify({"error": "Image non trouvée"}), 404
+        immutable = image_store.is_content_addressed(relative_path)
+
+        size = request.args.get('size', 'original')
+        if size == 'original':
+            return send_stored_image(full_path, content_hash, immutable)
+
+        if size not in derivative_cache.SIZES:
+            return jsonify({"error": f"Taille inconnue: {size}"}), 400
+
+        # Sans format explicite: WebP si le client l'accepte
+        image_format = request.args.get('format')
+        negotiated = image_format is None
+        if negotiated:
+            image_format = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+        if image_format not in derivative_cache.FORMATS:
+            return jsonify({"error": f"Format inconnu: {image_format}"}), 400
+
+        derivative_path = derivative_cache.get(relative_path, size, image_format)
+        if derivative_path is None:
+            return jsonify({"error": "Impossible de générer l'image"}), 500
+
+        response = send_stored_image(
+            derivative_path,
+            f"{content_hash}-{size}-q{derivative_cache.quality}.{image_format}",
+            immutable,
+            mimetype=derivative_cache.mimetype(image_format)
+        )
+        if negotiated:
+            response.vary.add('Accept')
+        return response
+
     except Exception as e:
         logger.error(f"Erreur lors du service d'image: {e}")
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from models.inference_backends import create_backend, resolve_model_path
+from utils.image_processing import preprocess_for_model
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
+
+
+def export_model(weights: str, backend: str, imgsz: int = None) -> str:
+    """Exporter les poids .pt vers le format du moteur demandé (batch dynamique)"""
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    export_format = {"onnxruntime": "onnx", "openvino": "openvino"}[backend]
+
+    kwargs = {"format": export_format, "dynamic": True}
+    if imgsz:
+        kwargs["imgsz"] = imgsz
+
+    exported = model.export(**kwargs)
+    print(f"✅ Modèle exporté: {exported}")
+    return resolve_model_path(weights, backend)
+
+
+def collect_images(images_dir: str, limit: int):
+    """Lister les images d'un dossier (récursivement)"""
+    paths = []
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)[:limit]
+
+
+def check_parity(weights: str, backend: str, images_dir: str, limit: int = 64,
+                 batch_size: int = 8, enhance: bool = True, atol: float = 1e-3) -> bool:
+    """
+    Comparer le moteur exporté au modèle PyTorch sur les mêmes tenseurs prétraités.
+
+    La parité est atteinte si, pour chaque image, les top 5 (classes et
+    confiances arrondies comme dans classify()) sont identiques et si l'écart
+    absolu maximal des probabilités reste sous atol.
+    """
+    reference = create_backend("torch", weights)
+    candidate = create_backend(backend, weights)
+
+    if reference.class_names != candidate.class_names:
+        print("❌ Les noms de classes diffèrent entre les deux modèles")
+        return False
+
+    input_size = reference.input_size or 224
+    paths = collect_images(images_dir, limit)
+    if not paths:
+        print(f"❌ Aucune image trouvée dans {images_dir}")
+        return False
+
+    mismatches = 0
+    max_diff = 0.0
+
+    for start in range(0, len(paths), batch_size):
+        batch_paths = paths[start:start + batch_size]
+        tensors = [preprocess_for_model(p, input_size, enhance=enhance) for p in batch_paths]
+        kept = [(p, t) for p, t in zip(batch_paths, tensors) if t is not None]
+        if not kept:
+            continue
+        batch = np.stack([t for _, t in kept])
+
+        expected = reference.predict(batch)
+        actual = candidate.predict(batch)
+        max_diff = max(max_diff, float(np.abs(expected - actual).max()))
+
+        for row, (path, _) in enumerate(kept):
+            expected_top = np.argsort(-expected[row])[:5]
+            actual_top = np.argsort(-actual[row])[:5]
+            same_classes = np.array_equal(expected_top, actual_top)
+            same_scores = np.array_equal(np.round(expected[row][expected_top], 2),
+                                         np.round(actual[row][actual_top], 2))
+            if not (same_classes and same_scores):
+                mismatches += 1
+                print(f"⚠️  Écart sur {path}: torch={expected_top.tolist()} {backend}={actual_top.tolist()}")
+
+    print(f"📊 {len(paths)} images, écart absolu max: {max_diff:.6f}, divergences: {mismatches}")
+    ok = mismatches == 0 and max_diff <= atol
+    print("✅ Parité vérifiée" if ok else "❌ Parité non respectée")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export du classificateur pour ONNX Runtime / OpenVINO")
+    parser.add_argument("--weights", type=str, default="weights/best.pt", help="Poids YOLO entraînés (.pt)")
+    parser.add_argument("--backend", type=str, choices=["onnxruntime", "openvino"], default="onnxruntime",
+                        help="Moteur d'inférence cible")
+    parser.add_argument("--imgsz", type=int, default=None, help="Taille d'entrée (défaut: celle de l'entraînement)")
+    parser.add_argument("--skip-export", action="store_true", help="Ne pas réexporter, vérifier seulement")
+    parser.add_argument("--check-parity", type=str, default=None, metavar="IMAGES_DIR",
+                        help="Dossier d'images pour vérifier la parité avec PyTorch")
+    parser.add_argument("--limit", type=int, default=64, help="Nombre maximal d'images pour la parité")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Écart absolu maximal toléré")
+    parser.add_argument("--no-clahe", action="store_true", help="Désactiver le CLAHE du prétraitement")
+
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export_model(args.weights, args.backend, args.imgsz)
+
+    if args.check_parity:
+        ok = check_parity(args.weights, args.backend, args.check_parity,
+                          limit=args.limit, enhance=not args.no_clahe, atol=args.atol)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
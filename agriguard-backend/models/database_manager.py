@@ -1,8 +1,10 @@
 # database_manager.py
 from pymongo import MongoClient
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from bson import ObjectId
 
@@ -12,13 +14,28 @@ class DatabaseManager:
 
     def __init__(self, mongodb_url: str = "mongodb://localhost:27017/",
                  database_name: str = "agriguard_db",
-                 json_fallback_path: str = "data/diseases_database.json"):
+                 json_fallback_path: str = "data/diseases_database.json",
+                 cache_check_interval: float = 60.0):
         self.mongodb_url = mongodb_url
         self.database_name = database_name
         self.json_fallback_path = json_fallback_path
         self.client = None
         self.db = None
         self.use_mongodb = False
+        self.json_data = {}
+
+        # Cache des maladies formatées pour l'API, indexé par disease_id
+        self.cache_check_interval = cache_check_interval
+        self.knowledge_version = None
+        self._disease_cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_lock = threading.Lock()
+        # Vérification et rechargement sérialisés; les lecteurs gardent l'ancien cache pendant ce temps
+        self._reload_lock = threading.RLock()
+        self._cache_generation = 0
+        self._cache_signature = None
+        self._cache_dirty = False
+        self._last_cache_check = 0.0
+        self._change_stream_active = False
 
         # Essayer de se connecter à MongoDB
         self._init_mongodb()
@@ -27,6 +44,11 @@ class DatabaseManager:
         if not self.use_mongodb:
             self._load_json_fallback()
 
+        # Précharger les maladies et surveiller leurs modifications
+        self._reload_disease_cache()
+        if self.use_mongodb:
+            self._start_change_stream()
+
     def _init_mongodb(self):
         """Initialiser la connexion MongoDB"""
         try:
@@ -51,28 +73,125 @@ class DatabaseManager:
             print(f"❌ Erreur lors du chargement JSON: {e}")
             self.json_data = {"diseases": {}, "classes": {}, "legacy_pests": {}}
 
-    def get_disease_info(self, disease_class: str) -> Optional[Dict[str, Any]]:
-        """Obtenir les informations d'une maladie"""
-        if self.use_mongodb:
-            return self._get_disease_from_mongodb(disease_class)
-        else:
-            return self._get_disease_from_json(disease_class)
+    # ------------------------------------------------------------------
+    # Cache des maladies
+    # ------------------------------------------------------------------
 
-    def _get_disease_from_mongodb(self, disease_class: str) -> Optional[Dict[str, Any]]:
-        """Récupérer une maladie depuis MongoDB"""
+    def _json_signature(self) -> Optional[int]:
+        """Signature du fichier JSON (date de modification)"""
         try:
-            disease = self.db.diseases.find_one({
-                "disease_id": disease_class,
-                "is_active": True
-            })
-
-            if disease:
-                return self._format_disease_for_api(disease)
-            return None
-        except Exception as e:
-            print(f"Erreur MongoDB: {e}")
+            return os.stat(self.json_fallback_path).st_mtime_ns
+        except OSError:
             return None
 
+    def _mongodb_signature(self):
+        """Signature de la collection diseases (nombre de documents et dernière mise à jour)"""
+        latest = self.db.diseases.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        return (
+            self.db.diseases.count_documents({"is_active": True}),
+            str(latest.get("updated_at")) if latest else None
+        )
+
+    def _reload_disease_cache(self):
+        """(Re)construire le cache des maladies formatées"""
+        with self._reload_lock:
+            # Effacé avant la lecture de la source: une modification signalée
+            # pendant le rechargement déclenchera le suivant au lieu d'être perdue
+            was_dirty = self._cache_dirty
+            self._cache_dirty = False
+            try:
+                if self.use_mongodb:
+                    signature = self._mongodb_signature()
+                    diseases = self.db.diseases.find({"is_active": True})
+                    cache = {d["disease_id"]: self._format_disease_for_api(d) for d in diseases}
+                else:
+                    signature = self._json_signature()
+                    if self._cache_signature is not None and signature != self._cache_signature:
+                        self._load_json_fallback()
+                    cache = {}
+                    for disease_class in self._get_all_diseases_from_json():
+                        if disease_class not in cache:
+                            cache[disease_class] = self._get_disease_from_json(disease_class)
+            except Exception as e:
+                print(f"❌ Erreur lors du chargement du cache des maladies: {e}")
+                if was_dirty:
+                    self._cache_dirty = True
+                return
+
+            with self._cache_lock:
+                self._disease_cache = cache
+                self._cache_signature = signature
+                self._cache_generation += 1
+                self._last_cache_check = time.monotonic()
+                self.knowledge_version = f"{'mongodb' if self.use_mongodb else 'json'}-{self._cache_generation}"
+
+        print(f"✅ Cache des maladies chargé: {len(cache)} entrées (version {self.knowledge_version})")
+
+    def _start_change_stream(self):
+        """Surveiller la collection diseases via un change stream (replica set requis)"""
+        def watch():
+            try:
+                with self.db.diseases.watch() as stream:
+                    self._change_stream_active = True
+                    for _ in stream:
+                        self._cache_dirty = True
+            except Exception as e:
+                print(f"⚠️  Change stream indisponible, vérification périodique du cache: {e}")
+            finally:
+                self._change_stream_active = False
+
+        threading.Thread(target=watch, name="diseases-change-stream", daemon=True).start()
+
+    def _ensure_cache_fresh(self):
+        """Invalider le cache si les données ont changé"""
+        interval = self.cache_check_interval if self.use_mongodb else min(self.cache_check_interval, 1.0)
+        if not self._cache_dirty and (self._change_stream_active or
+                                      time.monotonic() - self._last_cache_check < interval):
+            return
+
+        # Une seule vérification/rechargement à la fois; les autres requêtes revérifient après
+        with self._reload_lock:
+            if self._cache_dirty:
+                self._reload_disease_cache()
+                return
+
+            # Le change stream prévient des modifications: pas de vérification nécessaire
+            if self._change_stream_active:
+                return
+
+            now = time.monotonic()
+            if now - self._last_cache_check < interval:
+                return
+            self._last_cache_check = now
+
+            try:
+                signature = self._mongodb_signature() if self.use_mongodb else self._json_signature()
+            except Exception as e:
+                print(f"Erreur lors de la vérification du cache: {e}")
+                return
+
+            if signature != self._cache_signature:
+                self._reload_disease_cache()
+
+    def invalidate_disease_cache(self):
+        """Forcer le rechargement du cache au prochain accès"""
+        self._cache_dirty = True
+
+    def _get_cached_disease(self, disease_class: str) -> Optional[Dict[str, Any]]:
+        self._ensure_cache_fresh()
+        return self._disease_cache.get(disease_class)
+
+    def get_disease_snapshot(self) -> Tuple[Optional[str], Dict[str, Dict[str, Any]]]:
+        """Version des connaissances et maladies formatées (à ne pas modifier)"""
+        self._ensure_cache_fresh()
+        with self._cache_lock:
+            return self.knowledge_version, self._disease_cache
+
+    def get_disease_info(self, disease_class: str) -> Optional[Dict[str, Any]]:
+        """Obtenir les informations d'une maladie"""
+        disease = self._get_cached_disease(disease_class)
+        return dict(disease) if disease is not None else None
+
     def _get_disease_from_json(self, disease_class: str) -> Optional[Dict[str, Any]]:
         """Récupérer une maladie depuis JSON"""
         # Chercher dans diseases
@@ -133,97 +252,34 @@ class DatabaseManager:
 
     def get_treatment_recommendations(self, disease_class: str, urgency_filter: str = None) -> List[Dict[str, Any]]:
         """Obtenir les recommandations de traitement"""
-        if self.use_mongodb:
-            return self._get_treatments_from_mongodb(disease_class, urgency_filter)
-        else:
-            return self._get_treatments_from_json(disease_class, urgency_filter)
-
-    def _get_treatments_from_mongodb(self, disease_class: str, urgency_filter: str = None) -> List[Dict[str, Any]]:
-        """Récupérer les traitements depuis MongoDB"""
-        try:
-            disease = self.db.diseases.find_one({
-                "disease_id": disease_class,
-                "is_active": True
-            })
-
-            if disease and "treatment_options" in disease:
-                treatments = disease["treatment_options"]
-
-                # Filtrer par urgence si spécifié
-                if urgency_filter:
-                    treatments = [t for t in treatments if t.get("priority") == urgency_filter]
-
-                return treatments
-
-            return []
-        except Exception as e:
-            print(f"Erreur MongoDB: {e}")
+        disease = self._get_cached_disease(disease_class)
+        if not disease:
             return []
 
-    def _get_treatments_from_json(self, disease_class: str, urgency_filter: str = None) -> List[Dict[str, Any]]:
-        """Récupérer les traitements depuis JSON"""
-        disease_info = self._get_disease_from_json(disease_class)
-        if disease_info:
-            treatments = disease_info.get("treatment_options", [])
+        treatments = disease.get("treatment_options", [])
 
-            # Filtrer par urgence si spécifié
-            if urgency_filter:
-                treatments = [t for t in treatments if t.get("priority") == urgency_filter]
+        # Filtrer par urgence si spécifié
+        if urgency_filter:
+            treatments = [t for t in treatments if t.get("priority") == urgency_filter]
 
-            return treatments
-
-        return []
+        return list(treatments)
 
     def get_vector_info(self, disease_class: str) -> List[Dict[str, Any]]:
         """Obtenir les informations sur les vecteurs"""
-        if self.use_mongodb:
-            return self._get_vectors_from_mongodb(disease_class)
-        else:
-            return self._get_vectors_from_json(disease_class)
-
-    def _get_vectors_from_mongodb(self, disease_class: str) -> List[Dict[str, Any]]:
-        """Récupérer les vecteurs depuis MongoDB"""
-        try:
-            disease = self.db.diseases.find_one({
-                "disease_id": disease_class,
-                "is_active": True
-            })
-
-            if disease:
-                return disease.get("vectors", [])
-
-            return []
-        except Exception as e:
-            print(f"Erreur MongoDB: {e}")
-            return []
-
-    def _get_vectors_from_json(self, disease_class: str) -> List[Dict[str, Any]]:
-        """Récupérer les vecteurs depuis JSON"""
-        disease_info = self._get_disease_from_json(disease_class)
-        if disease_info:
-            return disease_info.get("vectors", [])
+        disease = self._get_cached_disease(disease_class)
+        if disease:
+            return list(disease.get("vectors", []))
 
         return []
 
     def get_all_diseases(self) -> List[str]:
         """Obtenir la liste de toutes les maladies"""
         if self.use_mongodb:
-            return self._get_all_diseases_from_mongodb()
+            self._ensure_cache_fresh()
+            return list(self._disease_cache.keys())
         else:
             return self._get_all_diseases_from_json()
 
-    def _get_all_diseases_from_mongodb(self) -> List[str]:
-        """Récupérer toutes les maladies depuis MongoDB"""
-        try:
-            diseases = self.db.diseases.find(
-                {"is_active": True},
-                {"disease_id": 1}
-            )
-            return [d["disease_id"] for d in diseases]
-        except Exception as e:
-            print(f"Erreur MongoDB: {e}")
-            return []
-
     def _get_all_diseases_from_json(self) -> List[str]:
         """Récupérer toutes les maladies depuis JSON"""
         all_diseases = []
@@ -240,26 +296,19 @@ class DatabaseManager:
             return self._get_database_from_json()
 
     def _get_database_from_mongodb(self) -> Dict[str, Any]:
-        """Récupérer la base complète depuis MongoDB"""
-        try:
-            diseases = list(self.db.diseases.find({"is_active": True}))
+        """Récupérer la base complète depuis le cache des maladies MongoDB"""
+        self._ensure_cache_fresh()
+        formatted_diseases = dict(self._disease_cache)
 
-            # Formater pour l'API
-            formatted_diseases = {}
-            for disease in diseases:
-                formatted_diseases[disease["disease_id"]] = self._format_disease_for_api(disease)
-
-            return {
-                "diseases": formatted_diseases,
-                "source": "mongodb",
-                "total": len(formatted_diseases)
-            }
-        except Exception as e:
-            print(f"Erreur MongoDB: {e}")
-            return {"diseases": {}, "source": "mongodb_error", "total": 0}
+        return {
+            "diseases": formatted_diseases,
+            "source": "mongodb",
+            "total": len(formatted_diseases)
+        }
 
     def _get_database_from_json(self) -> Dict[str, Any]:
         """Récupérer la base complète depuis JSON"""
+        self._ensure_cache_fresh()
         return {
             "diseases": self.json_data,
             "source": "json",
@@ -0,0 +1,123 @@
+# models/derivative_cache.py
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from utils.image_processing import create_derivative
+
+
+class ImageDerivativeCache:
+    """
+    Versions réduites des images (miniature, taille moyenne, JPEG/WebP)
+    générées à la première demande puis conservées sur disque.
+    """
+
+    SIZES: Dict[str, Tuple[int, int]] = {
+        "thumbnail": (200, 200),
+        "medium": (800, 800)
+    }
+
+    FORMATS = {
+        "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+        "webp": ("WEBP", ".webp", "image/webp")
+    }
+
+    def __init__(self, source_root: str, cache_root: str, quality: int = 80):
+        """
+        Initialiser le cache
+
+        Args:
+            source_root: Dossier des images originales (storage/images)
+            cache_root: Dossier des versions générées
+            quality: Qualité de compression des versions générées
+        """
+        self.source_root = source_root
+        self.cache_root = cache_root
+        self.quality = quality
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"generated": 0, "served_from_cache": 0, "failures": 0}
+
+        os.makedirs(cache_root, exist_ok=True)
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def mimetype(self, image_format: str) -> str:
+        return self.FORMATS[image_format][2]
+
+    def get(self, relative_path: str, size: str, image_format: str = "jpeg") -> Optional[str]:
+        """
+        Obtenir le chemin de la version réduite d'une image, générée si nécessaire
+
+        Args:
+            relative_path: Chemin de l'original relatif à source_root (déjà validé)
+            size: Nom de la taille (thumbnail, medium)
+            image_format: jpeg ou webp
+
+        Returns:
+            Chemin absolu du fichier généré, ou None si l'original est introuvable/illisible
+        """
+        if size not in self.SIZES or image_format not in self.FORMATS:
+            raise ValueError(f"Version inconnue: {size}/{image_format}")
+
+        source_path = os.path.join(self.source_root, relative_path)
+        if not os.path.isfile(source_path):
+            return None
+
+        pil_format, extension, _ = self.FORMATS[image_format]
+        target_path = os.path.join(self.cache_root, size, f"{relative_path}{extension}")
+
+        # Les blobs adressés par contenu ne changent jamais
+        immutable = relative_path.replace("\\", "/").startswith("blobs/")
+
+        if self._is_fresh(source_path, target_path, immutable):
+            self._increment("served_from_cache")
+            return target_path
+
+        # Une seule génération par version, même avec des requêtes concurrentes
+        try:
+            with self._lock_for(target_path):
+                if self._is_fresh(source_path, target_path, immutable):
+                    self._increment("served_from_cache")
+                    return target_path
+
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                tmp_path = f"{target_path}.{threading.get_ident()}.tmp"
+                if not create_derivative(source_path, tmp_path, self.SIZES[size],
+                                         image_format=pil_format, quality=self.quality):
+                    self._increment("failures")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    return None
+
+                os.replace(tmp_path, target_path)
+                self._increment("generated")
+                return target_path
+        finally:
+            # Verrou retiré dans tous les cas: un original illisible ne le laisse pas en mémoire
+            with self._locks_guard:
+                self._locks.pop(target_path, None)
+
+    def _increment(self, key: str):
+        with self._metrics_lock:
+            self._metrics[key] += 1
+
+    @staticmethod
+    def _is_fresh(source_path: str, target_path: str, immutable: bool = False) -> bool:
+        """La version générée existe et n'est pas plus ancienne que l'original"""
+        try:
+            target_mtime = os.stat(target_path).st_mtime
+            return immutable or target_mtime >= os.stat(source_path).st_mtime
+        except OSError:
+            return False
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._metrics_lock:
+            return dict(self._metrics)
@@ -0,0 +1,360 @@
+# models/disease_search_index.py
+import bisect
+import hashlib
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.text_processing import edit_distance, edit_distances, flatten_text, tokenize
+
+
+def _trigrams(term: str, closed: bool = True) -> set:
+    """Trigrammes du terme encadré (^terme$); sans la fin pour une recherche par préfixe"""
+    padded = f"^{term}$" if closed else f"^{term}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyTermIndex:
+    """
+    Index de trigrammes sur le vocabulaire pour retrouver les termes proches d'un
+    terme mal orthographié ("feuile" -> "feuille"), vérifiés par distance d'édition bornée
+    """
+
+    MEMO_SIZE = 2048
+
+    def __init__(self):
+        self._grams: Dict[str, List[str]] = {}
+        self._memo: Dict[Tuple[str, bool], List[Tuple[str, int, bool]]] = {}
+        self.size = 0
+
+    def rebuild(self, terms):
+        grams: Dict[str, List[str]] = {}
+        for term in terms:
+            for gram in _trigrams(term):
+                grams.setdefault(gram, []).append(term)
+        self._grams = grams
+        self._memo = {}
+        self.size = len(terms)
+
+    @staticmethod
+    def max_distance(term: str) -> int:
+        """Nombre d'erreurs tolérées selon la longueur du terme"""
+        if len(term) < 4:
+            return 0
+        return 1 if len(term) < 8 else 2
+
+    def lookup(self, token: str, prefix: bool = False) -> List[Tuple[str, int, bool]]:
+        """
+        Termes à distance d'édition bornée du token
+
+        Args:
+            token: Terme normalisé de la requête
+            prefix: Accepter aussi les termes dont un préfixe est proche (autocomplétion)
+
+        Returns:
+            Liste de (terme, distance, correspondance complète), plus proches d'abord
+        """
+        # Les mêmes termes reviennent à chaque frappe de l'autocomplétion
+        memo = self._memo.get((token, prefix))
+        if memo is not None:
+            return memo
+
+        matches = self._lookup(token, prefix)
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[(token, prefix)] = matches
+        return matches
+
+    def _lookup(self, token: str, prefix: bool) -> List[Tuple[str, int, bool]]:
+        max_distance = self.max_distance(token)
+        if max_distance == 0:
+            return []
+
+        # Une erreur d'édition modifie au plus 3 trigrammes (4 pour une transposition)
+        query_grams = _trigrams(token, closed=not prefix)
+        min_shared = max(1, len(query_grams) - 4 * max_distance)
+
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for term in self._grams.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+
+        matches = []
+        for term, count in shared.items():
+            if count < min_shared or term == token:
+                continue
+            gap = len(term) - len(token)
+            if (abs(gap) > max_distance and not (prefix and gap > 0)
+                    and not (term[-1] in "sx" and abs(gap - 1) <= max_distance)):
+                continue
+            distance, prefix_distance = edit_distances(token, term, max_distance)
+            if distance > max_distance and term[-1] in "sx":
+                # Pluriel: "feuile" est aussi proche de "feuilles" que de "feuille"
+                distance = edit_distance(token, term[:-1], max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance, True))
+            elif prefix and prefix_distance <= max_distance:
+                matches.append((term, prefix_distance, False))
+
+        matches.sort(key=lambda m: (m[1], not m[2], m[0]))
+        return matches
+
+
+class DiseaseSearchIndex:
+    """
+    Index inversé BM25 des maladies de la base de connaissances
+
+    Les termes sont normalisés sans accents (français/anglais). Le dernier terme
+    de la requête est aussi cherché comme préfixe (autocomplétion). L'index est
+    synchronisé sur la version des connaissances du DatabaseManager: seules les
+    maladies ajoutées, modifiées ou supprimées sont réindexées.
+
+    Un terme absent de l'index (faute de frappe) est remplacé par les termes
+    proches des noms, symptômes et pathogènes (FuzzyTermIndex).
+    """
+
+    # Poids des champs (BM25F simplifié: fréquences pondérées par champ)
+    FIELD_WEIGHTS = {
+        "disease_class": 3.0,
+        "name": 3.0,
+        "scientific_name": 2.5,
+        "pathogens": 2.0,
+        "symptoms": 1.5,
+        "description": 1.0,
+        "vectors": 1.0
+    }
+
+    # Champs dont le vocabulaire sert à la correction des fautes de frappe
+    FUZZY_FIELDS = ("disease_class", "name", "scientific_name", "symptoms", "pathogens", "vectors")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75,
+                 prefix_weight: float = 0.5, min_prefix_length: int = 2,
+                 fuzzy_weight: float = 0.6):
+        """
+        Initialiser l'index
+
+        Args:
+            k1: Saturation de la fréquence des termes (BM25)
+            b: Normalisation par la longueur du document (BM25)
+            prefix_weight: Poids d'un terme trouvé par préfixe plutôt qu'exactement
+            min_prefix_length: Longueur minimale d'un préfixe recherché
+            fuzzy_weight: Poids d'un terme corrigé, élevé à la puissance de la distance d'édition
+        """
+        self.k1 = k1
+        self.b = b
+        self.prefix_weight = prefix_weight
+        self.min_prefix_length = min_prefix_length
+        self.fuzzy_weight = fuzzy_weight
+
+        self.version = None
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._doc_fingerprints: Dict[str, str] = {}
+        self._doc_fuzzy_terms: Dict[str, set] = {}
+        self._fuzzy = FuzzyTermIndex()
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0.0
+        self._metrics = {"syncs": 0, "documents_indexed": 0, "documents_removed": 0,
+                         "queries": 0, "fuzzy_corrections": 0}
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _field_texts(self, doc_id: str, disease: Dict[str, Any]) -> Dict[str, str]:
+        texts = {field: flatten_text(disease.get(field)) for field in self.FIELD_WEIGHTS}
+        texts["disease_class"] = doc_id.replace("_", " ")
+        return texts
+
+    @staticmethod
+    def _fingerprint(texts: Dict[str, str]) -> str:
+        digest = hashlib.sha1()
+        for field in sorted(texts):
+            digest.update(texts[field].encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def sync(self, version: Optional[str], diseases: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Mettre l'index à jour si la version des connaissances a changé
+
+        Args:
+            version: Version des connaissances (DatabaseManager.knowledge_version)
+            diseases: Maladies formatées pour l'API, indexées par disease_class
+
+        Returns:
+            True si l'index a été modifié
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return False
+
+            changed = False
+            for doc_id in [d for d in self._documents if d not in diseases]:
+                self._remove(doc_id)
+                changed = True
+
+            for doc_id, disease in diseases.items():
+                if not isinstance(disease, dict):
+                    continue
+                texts = self._field_texts(doc_id, disease)
+                fingerprint = self._fingerprint(texts)
+                self._documents[doc_id] = disease
+                if self._doc_fingerprints.get(doc_id) == fingerprint:
+                    continue
+                if doc_id in self._doc_terms:
+                    self._remove(doc_id, keep_document=True)
+                self._add(doc_id, texts, fingerprint)
+                changed = True
+
+            if changed:
+                self._vocabulary = sorted(self._postings)
+                self._fuzzy.rebuild(set().union(*self._doc_fuzzy_terms.values()))
+            self.version = version
+            self._metrics["syncs"] += 1
+            return changed
+
+    def _add(self, doc_id: str, texts: Dict[str, str], fingerprint: str):
+        frequencies: Dict[str, float] = {}
+        fuzzy_terms = set()
+        length = 0.0
+        for field, text in texts.items():
+            weight = self.FIELD_WEIGHTS[field]
+            tokens = tokenize(text)
+            if field in self.FUZZY_FIELDS:
+                fuzzy_terms.update(tokens)
+            length += weight * len(tokens)
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+
+        self._doc_terms[doc_id] = frequencies
+        self._doc_lengths[doc_id] = length
+        self._doc_fingerprints[doc_id] = fingerprint
+        self._doc_fuzzy_terms[doc_id] = fuzzy_terms
+        self._total_length += length
+        self._metrics["documents_indexed"] += 1
+
+    def _remove(self, doc_id: str, keep_document: bool = False):
+        for term in self._doc_terms.pop(doc_id, {}):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+        self._total_length -= self._doc_lengths.pop(doc_id, 0.0)
+        self._doc_fingerprints.pop(doc_id, None)
+        self._doc_fuzzy_terms.pop(doc_id, None)
+        if not keep_document:
+            self._documents.pop(doc_id, None)
+            self._metrics["documents_removed"] += 1
+
+    # ------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------
+
+    def _expand(self, token: str, allow_prefix: bool,
+                corrections: Dict[str, List[str]] = None) -> List[Tuple[str, float]]:
+        """Termes de l'index correspondant à un terme de la requête, avec leur poids"""
+        expansions = [(token, 1.0)] if token in self._postings else []
+        if allow_prefix and len(token) >= self.min_prefix_length:
+            start = bisect.bisect_left(self._vocabulary, token)
+            for term in self._vocabulary[start:]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    expansions.append((term, self.prefix_weight))
+
+        if not expansions:
+            # Terme inconnu: termes proches (faute de frappe)
+            for term, distance, complete in self._fuzzy.lookup(token, prefix=allow_prefix):
+                weight = self.fuzzy_weight ** distance
+                expansions.append((term, weight if complete else weight * self.prefix_weight))
+            if expansions:
+                self._metrics["fuzzy_corrections"] += 1
+                if corrections is not None:
+                    corrections[token] = [term for term, _ in expansions]
+        return expansions
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        n = len(self._doc_terms)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, category: str = None, limit: int = 20,
+               prefix: bool = True, corrections: Dict[str, List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Rechercher les maladies correspondant à une requête
+
+        Args:
+            query: Texte libre (nom, symptômes, pathogène...)
+            category: Filtrer sur la catégorie (disease, healthy_state, pest)
+            limit: Nombre maximal de résultats
+            prefix: Chercher le dernier terme comme préfixe (autocomplétion)
+            corrections: Dictionnaire complété avec les termes corrigés {terme: [termes proches]}
+
+        Returns:
+            Liste triée de {disease_class, score, matched_terms, disease}
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            # Requête composée uniquement de mots vides
+            tokens = tokenize(query, keep_stopwords=True)
+
+        with self._lock:
+            self._metrics["queries"] += 1
+            if not self._doc_terms:
+                return []
+
+            avg_length = self._total_length / len(self._doc_terms) or 1.0
+            scores: Dict[str, float] = {}
+            matched: Dict[str, set] = {}
+
+            for position, token in enumerate(tokens):
+                is_last = position == len(tokens) - 1
+                token_scores: Dict[str, float] = {}
+
+                for term, weight in self._expand(token, prefix and is_last, corrections):
+                    idf = self._idf(term)
+                    for doc_id, frequency in self._postings[term].items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                        score = weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                        # Plusieurs complétions d'un même terme ne s'additionnent pas
+                        if score > token_scores.get(doc_id, 0.0):
+                            token_scores[doc_id] = score
+                        matched.setdefault(doc_id, set()).add(term)
+
+                for doc_id, score in token_scores.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+            results = []
+            for doc_id, score in scores.items():
+                disease = self._documents[doc_id]
+                if category and disease.get("category") != category:
+                    continue
+                results.append({
+                    "disease_class": doc_id,
+                    "score": round(score, 4),
+                    "matched_terms": sorted(matched[doc_id]),
+                    "disease": disease
+                })
+
+        results.sort(key=lambda r: (-r["score"], r["disease_class"]))
+        return results[:limit] if limit else results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                "version": self.version,
+                "documents": len(self._doc_terms),
+                "terms": len(self._postings),
+                "fuzzy_terms": self._fuzzy.size
+            })
+        return stats
@@ -0,0 +1,450 @@
+# models/image_blob_store.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from utils.cache import TTLCache
+
+# ioctl Linux de clonage de fichier (reflink: Btrfs, XFS)
+FICLONE = 0x40049409
+
+LEGACY_FOLDER_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ImageBlobStore:
+    """
+    Stockage permanent des images adressé par contenu
+
+    Chaque image est écrite une seule fois sous blobs/ab/cd/<sha256><ext>. Le nombre
+    d'enregistrements de prédiction qui référencent un blob est tenu à jour depuis le
+    journal des prédictions (sauvegardé avec sa position dans le journal). Le journal
+    est append-only: un blob référencé une fois le reste, le ramasse-miettes ne
+    supprime que les blobs jamais journalisés (écriture sans enregistrement).
+    Les anciens fichiers YYYY-MM-DD/<nom> restent servis tels quels et sont
+    dédupliqués par lien physique (ou reflink) vers le blob correspondant.
+    """
+
+    BLOBS_DIR = "blobs"
+    GC_LOCK_FILENAME = ".gc.lock"
+
+    def __init__(self, root: str, gc_grace_seconds: float = 3600.0,
+                 snapshot_path: str = None, snapshot_interval: int = 100):
+        """
+        Initialiser le stockage
+
+        Args:
+            root: Dossier racine du stockage permanent (storage/images)
+            gc_grace_seconds: Âge minimal d'un blob sans référence avant suppression
+                              (laisse le temps à l'enregistrement d'être journalisé)
+            snapshot_path: Fichier de sauvegarde des références (None: journal rejoué
+                           entièrement à chaque démarrage)
+            snapshot_interval: Nombre de mises à jour entre deux sauvegardes
+        """
+        self.root = root
+        self.blobs_root = os.path.join(root, self.BLOBS_DIR)
+        self.gc_grace_seconds = gc_grace_seconds
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = max(1, snapshot_interval)
+
+        self._lock = threading.Lock()
+        self._refcounts: Dict[str, int] = {}
+        self._position: Optional[Tuple[str, int]] = None
+        self._pending_updates = 0
+        self._metrics = {
+            "writes": 0,
+            "deduplicated_writes": 0,
+            "legacy_files_linked": 0,
+            "legacy_bytes_reclaimed": 0,
+            "blobs_collected": 0,
+            "bytes_collected": 0,
+            "last_gc_at": None
+        }
+        self._store = None
+        self._gc_thread = None
+        self._gc_stop = threading.Event()
+        # Empreintes des anciens fichiers, indexées par (chemin, mtime, taille)
+        self._legacy_hashes = TTLCache(max_entries=4096, ttl=24 * 3600)
+
+        os.makedirs(self.blobs_root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Adressage
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def blob_relative_path(self, sha256: str, ext: str = "") -> str:
+        """Chemin relatif (à la racine du stockage) du blob: blobs/ab/cd/<sha256><ext>"""
+        ext = (ext or "").lower()
+        return "/".join([self.BLOBS_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext}"])
+
+    def plan(self, sha256: str, original_filename: str) -> Dict[str, Any]:
+        """
+        Calculer l'emplacement du blob d'une image sans l'écrire
+
+        Args:
+            sha256: Empreinte du contenu de l'image
+            original_filename: Nom du fichier uploadé (pour l'extension)
+        """
+        ext = os.path.splitext(original_filename)[1].lower()
+        relative_path = self.blob_relative_path(sha256, ext)
+        return {
+            "sha256": sha256,
+            "permanent_filename": os.path.basename(relative_path),
+            "relative_path": relative_path,
+            "absolute_path": os.path.join(self.root, relative_path)
+        }
+
+    def _blob_sha(self, relative_path: str) -> Optional[str]:
+        """Retrouver l'empreinte à partir d'un chemin de blob, None pour un ancien chemin"""
+        if not relative_path or not relative_path.replace("\\", "/").startswith(self.BLOBS_DIR + "/"):
+            return None
+        name = os.path.basename(relative_path)
+        return os.path.splitext(name)[0]
+
+    def content_hash(self, relative_path: str) -> Optional[str]:
+        """
+        Empreinte sha256 du contenu d'une image stockée
+
+        Lue dans le nom pour un blob; calculée une fois puis mise en cache pour
+        un ancien fichier YYYY-MM-DD.
+
+        Returns:
+            Empreinte hexadécimale, ou None si le fichier est illisible
+        """
+        sha256 = self._blob_sha(relative_path)
+        if sha256 is not None:
+            return sha256
+
+        absolute_path = os.path.join(self.root, relative_path)
+        try:
+            stat = os.stat(absolute_path)
+            key = (relative_path, stat.st_mtime_ns, stat.st_size)
+            sha256 = self._legacy_hashes.get(key)
+            if sha256 is None:
+                with open(absolute_path, 'rb') as f:
+                    sha256 = self.digest(f.read())
+                self._legacy_hashes.set(key, sha256)
+            return sha256
+        except OSError:
+            return None
+
+    def is_content_addressed(self, relative_path: str) -> bool:
+        """Le chemin désigne un blob, dont le contenu ne change jamais"""
+        return self._blob_sha(relative_path) is not None
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def write(self, absolute_path: str, data: bytes) -> bool:
+        """
+        Écrire un blob s'il n'existe pas encore (écriture atomique)
+
+        Returns:
+            True si le contenu a été écrit, False s'il était déjà présent
+        """
+        with self._lock:
+            if os.path.exists(absolute_path):
+                # Rafraîchir la date: protège le blob du ramasse-miettes
+                os.utime(absolute_path)
+                self._metrics["deduplicated_writes"] += 1
+                return False
+
+            os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+            tmp_path = f"{absolute_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, absolute_path)
+            self._metrics["writes"] += 1
+            return True
+
+    @staticmethod
+    def _clone_or_link(source: str, target: str) -> bool:
+        """
+        Créer target sans dupliquer les données de source: lien physique, sinon reflink
+
+        Returns:
+            False si le système de fichiers ne permet ni l'un ni l'autre
+        """
+        try:
+            os.link(source, target)
+            return True
+        except OSError:
+            pass
+
+        if fcntl is not None:
+            try:
+                with open(source, 'rb') as src, open(target, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return True
+            except OSError:
+                pass
+
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+
+    # ------------------------------------------------------------------
+    # Références
+    # ------------------------------------------------------------------
+
+    def attach(self, store):
+        """
+        Charger la dernière sauvegarde des références et s'abonner au journal des
+        prédictions. Seuls les enregistrements postérieurs à la sauvegarde sont rejoués.
+
+        Args:
+            store: Journal des prédictions (PredictionLogStore)
+        """
+        position = self._load_snapshot()
+        if position is not None and not store.contains_position(*position):
+            print("⚠️  Sauvegarde des références d'images incohérente avec le journal, recalcul complet")
+            with self._lock:
+                self._refcounts = {}
+                self._position = None
+            position = None
+
+        store.subscribe(self._on_record, since=position)
+        self._store = store
+        self.save_snapshot()
+
+    def _on_record(self, record: Dict[str, Any], location: Dict[str, Any] = None):
+        sha256 = self._blob_sha(record.get("image_path"))
+        with self._lock:
+            if sha256 is not None:
+                self._refcounts[sha256] = self._refcounts.get(sha256, 0) + 1
+            if location is not None:
+                self._position = (location["segment"], location["offset"] + location["length"])
+            should_save = self._count_update()
+
+        if should_save:
+            self.save_snapshot()
+
+    def _count_update(self) -> bool:
+        """Compter une mise à jour (verrou détenu); True si une sauvegarde est due"""
+        self._pending_updates += 1
+        return self.snapshot_path is not None and self._pending_updates >= self.snapshot_interval
+
+    def refcount(self, relative_path: str) -> int:
+        sha256 = self._blob_sha(relative_path)
+        with self._lock:
+            return self._refcounts.get(sha256, 0) if sha256 else 0
+
+    def _load_snapshot(self) -> Optional[Tuple[str, int]]:
+        """Charger les références sauvegardées et retourner la position couverte"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+
+            position = snapshot.get("position")
+            if not position:
+                return None
+
+            with self._lock:
+                self._refcounts = {sha: int(n) for sha, n in snapshot["refcounts"].items() if n > 0}
+                self._position = (position["segment"], position["offset"])
+                return self._position
+
+        except (ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+            print(f"⚠️  Sauvegarde des références d'images illisible, recalcul complet: {e}")
+            with self._lock:
+                self._refcounts = {}
+                self._position = None
+            return None
+
+    def save_snapshot(self):
+        """Sauvegarder les références et leur position dans le journal (atomique)"""
+        if not self.snapshot_path:
+            return
+
+        with self._lock:
+            snapshot = {
+                "refcounts": dict(self._refcounts),
+                "position": ({"segment": self._position[0], "offset": self._position[1]}
+                             if self._position else None)
+            }
+            self._pending_updates = 0
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"⚠️  Impossible de sauvegarder les références d'images: {e}")
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def _iter_blobs(self):
+        for dirpath, _, filenames in os.walk(self.blobs_root):
+            for name in filenames:
+                if not name.endswith('.tmp') and name != self.GC_LOCK_FILENAME:
+                    yield os.path.join(dirpath, name)
+
+    def _iter_legacy_files(self):
+        for folder in sorted(os.listdir(self.root)):
+            folder_path = os.path.join(self.root, folder)
+            if not (LEGACY_FOLDER_PATTERN.match(folder) and os.path.isdir(folder_path)):
+                continue
+            for name in sorted(os.listdir(folder_path)):
+                path = os.path.join(folder_path, name)
+                if os.path.isfile(path):
+                    yield path
+
+    def deduplicate_legacy(self) -> Dict[str, int]:
+        """
+        Dédupliquer les anciens fichiers YYYY-MM-DD: chaque fichier devient un lien
+        vers le blob de son contenu. Les anciens chemins restent valides.
+        """
+        linked = reclaimed = 0
+
+        for path in self._iter_legacy_files():
+            try:
+                stat = os.stat(path)
+                if stat.st_nlink > 1:
+                    continue  # Déjà lié à un blob
+
+                with open(path, 'rb') as f:
+                    sha256 = self.digest(f.read())
+                blob_path = os.path.join(self.root, self.blob_relative_path(
+                    sha256, os.path.splitext(path)[1]))
+
+                with self._lock:
+                    if not os.path.exists(blob_path):
+                        # Premier exemplaire: le blob partage l'inode du fichier existant
+                        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                        os.link(path, blob_path)
+                    else:
+                        # Doublon: remplacer le fichier par un lien vers le blob
+                        tmp_path = f"{path}.dedup.tmp"
+                        if not self._clone_or_link(blob_path, tmp_path):
+                            continue
+                        os.replace(tmp_path, path)
+                        reclaimed += stat.st_size
+                    linked += 1
+
+            except OSError as e:
+                print(f"⚠️  Déduplication impossible pour {path}: {e}")
+
+        with self._lock:
+            self._metrics["legacy_files_linked"] += linked
+            self._metrics["legacy_bytes_reclaimed"] += reclaimed
+        return {"linked": linked, "bytes_reclaimed": reclaimed}
+
+    def _disk_references(self) -> Set[str]:
+        """
+        Blobs référencés par le journal sur disque. Les références en mémoire ne
+        suivent que les ajouts de ce processus: un autre processus (rechargeur
+        Werkzeug, serveur WSGI multi-workers) peut écrire dans le même journal.
+        """
+        if self._store is None:
+            return set()
+
+        referenced = set()
+        for record in self._store.iter_disk_records():
+            sha256 = self._blob_sha(record.get("image_path"))
+            if sha256 is not None:
+                referenced.add(sha256)
+        return referenced
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """
+        Supprimer les blobs qui ne sont référencés ni par un enregistrement
+        ni par un ancien fichier lié, et plus anciens que le délai de grâce
+
+        Un seul processus à la fois (verrou fcntl sur blobs/.gc.lock); un
+        ramasse-miettes déjà en cours dans un autre processus est laissé terminer.
+        """
+        lock_file = open(os.path.join(self.blobs_root, self.GC_LOCK_FILENAME), 'a')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return {"collected": 0, "bytes_freed": 0}
+
+            # Relu après la prise du verrou: les blobs plus récents sont protégés
+            # par le délai de grâce
+            disk_referenced = self._disk_references()
+            now = time.time()
+            collected = freed = 0
+
+            for path in self._iter_blobs():
+                sha256 = os.path.splitext(os.path.basename(path))[0]
+                if sha256 in disk_referenced:
+                    continue
+                with self._lock:
+                    if self._refcounts.get(sha256, 0) > 0:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                        if stat.st_nlink > 1 or now - stat.st_mtime < self.gc_grace_seconds:
+                            continue
+                        os.remove(path)
+                        collected += 1
+                        freed += stat.st_size
+                    except OSError:
+                        continue
+        finally:
+            lock_file.close()
+
+        with self._lock:
+            self._metrics["blobs_collected"] += collected
+            self._metrics["bytes_collected"] += freed
+            self._metrics["last_gc_at"] = datetime.now().isoformat()
+        return {"collected": collected, "bytes_freed": freed}
+
+    def run_maintenance(self) -> Dict[str, Any]:
+        """Déduplication des anciens fichiers puis ramasse-miettes"""
+        return {
+            "legacy": self.deduplicate_legacy(),
+            "gc": self.collect_garbage()
+        }
+
+    def start_maintenance(self, interval_seconds: float):
+        """Lancer la maintenance périodique dans un thread d'arrière-plan"""
+        if interval_seconds <= 0 or self._gc_thread is not None:
+            return
+
+        def loop():
+            while not self._gc_stop.wait(interval_seconds):
+                try:
+                    self.run_maintenance()
+                except Exception as e:
+                    print(f"⚠️  Erreur de maintenance du stockage d'images: {e}")
+
+        self._gc_thread = threading.Thread(target=loop, name="image-store-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_maintenance(self):
+        self._gc_stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du stockage"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                "referenced_blobs": len(self._refcounts),
+                "references": sum(self._refcounts.values())
+            })
+        return stats
@@ -0,0 +1,223 @@
+# models/inference_backends.py
+import ast
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class InferenceBackend:
+    """
+    Moteur d'inférence du classificateur
+
+    Tous les moteurs reçoivent un batch prétraité (N, 3, H, W) float32 dans [0, 1]
+    et retournent la matrice (N, C) des scores du modèle.
+    """
+
+    name = "base"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.class_names: List[str] = []
+        self.input_size: Optional[int] = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _parse_names(names) -> List[str]:
+        """Convertir les noms de classes exportés ({id: nom} ou sa représentation texte)"""
+        if isinstance(names, str):
+            names = ast.literal_eval(names)
+        if isinstance(names, dict):
+            return [names[i] for i in sorted(names, key=int)]
+        return list(names or [])
+
+    @staticmethod
+    def _parse_imgsz(imgsz) -> Optional[int]:
+        """Extraire la taille d'entrée carrée exportée par ultralytics"""
+        if isinstance(imgsz, str):
+            imgsz = ast.literal_eval(imgsz)
+        if isinstance(imgsz, (list, tuple)):
+            imgsz = imgsz[0]
+        try:
+            return int(imgsz)
+        except (TypeError, ValueError):
+            return None
+
+
+class TorchBackend(InferenceBackend):
+    """Inférence PyTorch via ultralytics (poids .pt)"""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        super().__init__(model_path)
+
+        # Imports lourds chargés uniquement pour ce moteur
+        import torch
+        from ultralytics import YOLO
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self._torch = torch
+        self.model = YOLO(model_path)
+        self.class_names = self._parse_names(getattr(self.model, 'names', None))
+
+        train_args = getattr(self.model.model, 'args', None) or {}
+        if not isinstance(train_args, dict):
+            train_args = vars(train_args)
+        self.input_size = self._parse_imgsz(train_args.get('imgsz'))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Un tenseur (N, 3, H, W) est utilisé tel quel par ultralytics, sans transformations
+        results = self.model(self._torch.from_numpy(batch), verbose=False)
+
+        if not results or len(results) != len(batch):
+            raise RuntimeError("Aucune prédiction obtenue")
+        if any(getattr(result, 'probs', None) is None for result in results):
+            raise RuntimeError("Pas de probabilités dans les résultats")
+
+        # Matrice des probabilités (N, C) avec un seul transfert vers le CPU
+        return self._torch.stack([result.probs.data for result in results]).cpu().numpy()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """Inférence CPU avec ONNX Runtime (modèle exporté .onnx)"""
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        super().__init__(model_path)
+
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Métadonnées écrites par l'export ultralytics
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.class_names = self._parse_names(metadata.get('names'))
+        self.input_size = self._parse_imgsz(metadata.get('imgsz'))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        outputs = self.session.run(None, {self.input_name: batch})
+        return np.asarray(outputs[0])
+
+
+class OpenVINOBackend(InferenceBackend):
+    """Inférence CPU avec OpenVINO (dossier *_openvino_model exporté)"""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        super().__init__(model_path)
+
+        import openvino as ov
+
+        xml_path = model_path
+        if os.path.isdir(model_path):
+            xml_files = sorted(f for f in os.listdir(model_path) if f.endswith('.xml'))
+            if not xml_files:
+                raise FileNotFoundError(f"Aucun fichier .xml dans {model_path}")
+            xml_path = os.path.join(model_path, xml_files[0])
+
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if num_threads:
+            config["INFERENCE_NUM_THREADS"] = num_threads
+
+        core = ov.Core()
+        self.compiled_model = core.compile_model(core.read_model(xml_path), "CPU", config)
+        self.output = self.compiled_model.output(0)
+
+        metadata = self._read_metadata(os.path.dirname(xml_path))
+        self.class_names = self._parse_names(metadata.get('names'))
+        self.input_size = self._parse_imgsz(metadata.get('imgsz'))
+
+    @staticmethod
+    def _read_metadata(export_dir: str) -> Dict:
+        """Lire metadata.yaml écrit par l'export ultralytics"""
+        metadata_path = os.path.join(export_dir, 'metadata.yaml')
+        if not os.path.exists(metadata_path):
+            return {}
+
+        import yaml
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Requête synchrone créée par appel: sûre avec plusieurs threads
+        return np.asarray(self.compiled_model(batch)[self.output])
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVINOBackend.name: OpenVINOBackend,
+}
+
+
+PRECISIONS = ("fp32", "int8")
+
+
+def resolve_model_path(model_path: str, backend: str, precision: str = "fp32") -> str:
+    """
+    Déduire le chemin du modèle exporté à partir des poids .pt
+
+    weights/best.pt -> weights/best.onnx (onnxruntime)
+                    -> weights/best.int8.onnx (onnxruntime, INT8 quantifié)
+                    -> weights/best_openvino_model/ (openvino)
+    """
+    stem, ext = os.path.splitext(model_path)
+    if ext != '.pt':
+        return model_path
+    if backend == OnnxRuntimeBackend.name:
+        return f"{stem}.int8.onnx" if precision == "int8" else f"{stem}.onnx"
+    if backend == OpenVINOBackend.name:
+        return f"{stem}_openvino_model"
+    return model_path
+
+
+def create_backend(backend: str, model_path: str, num_threads: int = 0,
+                   precision: str = "fp32") -> InferenceBackend:
+    """
+    Instancier le moteur d'inférence demandé
+
+    Args:
+        backend: torch, onnxruntime ou openvino
+        model_path: Chemin des poids .pt (le modèle exporté est déduit) ou du modèle exporté
+        num_threads: Nombre de threads CPU (0 = valeur par défaut du moteur)
+        precision: fp32 ou int8 (modèle quantifié par quantize_model.py, ONNX Runtime)
+
+    Returns:
+        Moteur d'inférence initialisé
+    """
+    backend = (backend or TorchBackend.name).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+
+    precision = (precision or "fp32").lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Précision inconnue: {precision} (attendu: {', '.join(PRECISIONS)})")
+    if precision == "int8" and backend != OnnxRuntimeBackend.name:
+        raise ValueError("Le mode INT8 n'est disponible qu'avec le moteur onnxruntime")
+
+    path = resolve_model_path(model_path, backend, precision)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Modèle non trouvé: {path}")
+
+    try:
+        return BACKENDS[backend](path, num_threads=num_threads)
+    except ImportError as e:
+        if backend == TorchBackend.name:
+            raise
+        raise ImportError(f"Moteur {backend} non installé ({e}): "
+                          f"pip install -r requirements-inference.txt") from e
@@ -0,0 +1,187 @@
+# models/near_duplicate_index.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.image_processing import hamming_distance
+
+
+class BKTree:
+    """Arbre BK sur la distance de Hamming entre empreintes perceptuelles"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, image_hash: int, item: Any):
+        """Ajouter une empreinte et l'élément associé"""
+        node = [image_hash, item, {}]
+        self.size += 1
+
+        if self.root is None:
+            self.root = node
+            return
+
+        current = self.root
+        while True:
+            distance = hamming_distance(image_hash, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, image_hash: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Retourner les (distance, élément) à au plus max_distance de l'empreinte"""
+        if self.root is None:
+            return []
+
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_hash, item, children = stack.pop()
+            distance = hamming_distance(image_hash, node_hash)
+            if distance <= max_distance:
+                matches.append((distance, item))
+
+            # Inégalité triangulaire: seuls ces sous-arbres peuvent contenir des résultats
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+
+        return matches
+
+
+class NearDuplicateIndex:
+    """
+    Index des images récemment classifiées par utilisateur pour détecter les quasi-doublons
+    (rafales de photos de la même feuille) et regrouper les doublons en clusters.
+    """
+
+    def __init__(self, max_distance: int = 8, window_seconds: float = 600.0,
+                 max_entries_per_user: int = 500, max_clusters: int = 10000):
+        """
+        Initialiser l'index
+
+        Args:
+            max_distance: Distance de Hamming maximale entre deux quasi-doublons (sur 64 bits)
+            window_seconds: Ancienneté maximale d'une classification réutilisable
+            max_entries_per_user: Nombre maximal d'empreintes conservées par utilisateur
+            max_clusters: Nombre maximal de clusters conservés pour les statistiques
+        """
+        self.max_distance = max_distance
+        self.window_seconds = window_seconds
+        self.max_entries_per_user = max(1, max_entries_per_user)
+        self.max_clusters = max(1, max_clusters)
+
+        self._lock = threading.Lock()
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._clusters: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lookups = 0
+        self._near_duplicates = 0
+
+    def find(self, user_id: str, image_hash: int) -> Optional[Dict[str, Any]]:
+        """
+        Chercher une classification récente d'une image quasi identique du même utilisateur
+
+        Returns:
+            Entrée la plus proche (la plus récente à distance égale) avec sa distance, ou None
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._lookups += 1
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+
+            candidates = [
+                (distance, entry) for distance, entry in user["tree"].search(image_hash, self.max_distance)
+                if now - entry["indexed_at"] <= self.window_seconds
+            ]
+            if not candidates:
+                return None
+
+            distance, entry = min(candidates, key=lambda c: (c[0], -c[1]["indexed_at"]))
+            self._near_duplicates += 1
+            return dict(entry, distance=distance)
+
+    def add(self, user_id: str, image_hash: int, prediction_id: str,
+            classification: Dict[str, Any], cluster_id: str = None):
+        """
+        Indexer une image classifiée
+
+        Args:
+            user_id: Utilisateur ayant envoyé l'image
+            image_hash: Empreinte perceptuelle de l'image
+            prediction_id: Identifiant de la prédiction
+            classification: Résultat de classification réutilisable
+            cluster_id: Cluster du quasi-doublon trouvé (nouveau cluster si None)
+        """
+        now = time.monotonic()
+        entry = {
+            "prediction_id": prediction_id,
+            "cluster_id": cluster_id or prediction_id,
+            "classification": classification,
+            "indexed_at": now
+        }
+
+        with self._lock:
+            user = self._users.setdefault(user_id, {"tree": BKTree(), "entries": []})
+            user["entries"].append((image_hash, entry))
+            user["tree"].add(image_hash, entry)
+
+            if len(user["entries"]) > self.max_entries_per_user:
+                self._rebuild(user, now)
+
+            self._record_cluster(entry["cluster_id"], user_id, classification)
+
+    def _rebuild(self, user: Dict[str, Any], now: float):
+        """Reconstruire l'arbre d'un utilisateur sans les entrées expirées ni les plus anciennes"""
+        entries = [(h, e) for h, e in user["entries"] if now - e["indexed_at"] <= self.window_seconds]
+        entries = entries[-(self.max_entries_per_user // 2 or 1):]
+
+        tree = BKTree()
+        for image_hash, entry in entries:
+            tree.add(image_hash, entry)
+        user["tree"], user["entries"] = tree, entries
+
+    def _record_cluster(self, cluster_id: str, user_id: str, classification: Dict[str, Any]):
+        """Mettre à jour les statistiques du cluster"""
+        now = datetime.now().isoformat()
+        cluster = self._clusters.get(cluster_id)
+        if cluster is None:
+            cluster = {
+                "cluster_id": cluster_id,
+                "user_id": user_id,
+                "predicted_class": classification.get("predicted_class"),
+                "size": 0,
+                "first_seen": now
+            }
+            self._clusters[cluster_id] = cluster
+
+        cluster["size"] += 1
+        cluster["last_seen"] = now
+        self._clusters.move_to_end(cluster_id)
+
+        while len(self._clusters) > self.max_clusters:
+            self._clusters.popitem(last=False)
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """Statistiques des quasi-doublons et plus grands clusters"""
+        with self._lock:
+            duplicate_clusters = [c for c in self._clusters.values() if c["size"] > 1]
+            largest = sorted(duplicate_clusters, key=lambda c: c["size"], reverse=True)[:top]
+
+            return {
+                "users": len(self._users),
+                "indexed_images": sum(len(u["entries"]) for u in self._users.values()),
+                "lookups": self._lookups,
+                "near_duplicates": self._near_duplicates,
+                "near_duplicate_rate": round(self._near_duplicates / self._lookups, 4) if self._lookups else 0.0,
+                "clusters": len(self._clusters),
+                "duplicate_clusters": len(duplicate_clusters),
+                "largest_clusters": [dict(c) for c in largest],
+                "max_distance": self.max_distance,
+                "window_seconds": self.window_seconds
+            }
@@ -0,0 +1,232 @@
+# models/persistence_queue.py
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+class PersistenceQueue:
+    """
+    File d'attente de persistance asynchrone (write-behind) des résultats de classification.
+
+    Les enregistrements sont regroupés par lots: écriture des images dans le stockage
+    permanent, ajout groupé dans le journal des prédictions puis insert_many MongoDB.
+    Les éléments encore en mémoire sont écrits lors de l'arrêt (shutdown).
+    """
+
+    _STOP = object()
+
+    def __init__(self, prediction_store, db_manager, max_queue_size: int = 1000,
+                 max_batch_size: int = 50, flush_interval: float = 0.5,
+                 enqueue_timeout: float = 0.05, image_store=None):
+        """
+        Initialiser la file de persistance
+
+        Args:
+            prediction_store: Journal des prédictions (PredictionLogStore)
+            db_manager: Gestionnaire de base de données (DatabaseManager)
+            max_queue_size: Nombre maximal d'enregistrements en attente
+            max_batch_size: Nombre maximal d'enregistrements écrits par lot
+            flush_interval: Attente maximale (s) avant d'écrire un lot incomplet
+            enqueue_timeout: Attente maximale (s) quand la file est pleine avant
+                             d'écrire l'enregistrement de manière synchrone
+            image_store: Stockage des images (ImageBlobStore); sans stockage,
+                         les images sont écrites directement à leur chemin
+        """
+        self.prediction_store = prediction_store
+        self.db_manager = db_manager
+        self.image_store = image_store
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "enqueued": 0,
+            "persisted": 0,
+            "synchronous_fallbacks": 0,
+            "batches": 0,
+            "image_failures": 0,
+            "log_failures": 0,
+            "mongodb_failures": 0,
+            "last_flush_at": None,
+            "last_flush_duration_ms": 0.0
+        }
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="persistence-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any], image_data: bytes = None,
+               image_target: str = None) -> bool:
+        """
+        Planifier la persistance d'un enregistrement
+
+        Args:
+            record: Enregistrement de prédiction
+            image_data: Contenu du fichier image uploadé
+            image_target: Chemin permanent de l'image
+
+        Returns:
+            True si l'enregistrement est mis en file, False s'il a été écrit de manière synchrone
+        """
+        job = {
+            "record": record,
+            "image_data": image_data,
+            "image_target": image_target
+        }
+
+        if self._running:
+            try:
+                self._queue.put(job, timeout=self.enqueue_timeout)
+                self._increment("enqueued")
+                return True
+            except queue.Full:
+                pass
+
+        # File pleine ou arrêtée: contre-pression, écriture dans le thread appelant
+        self._increment("synchronous_fallbacks")
+        self._process_batch([job])
+        return False
+
+    def _increment(self, key: str, value: int = 1):
+        with self._metrics_lock:
+            self._metrics[key] += value
+
+    def _run(self):
+        """Boucle du thread d'écriture"""
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                self._queue.task_done()
+                break
+
+            batch = [job]
+            deadline = time.monotonic() + self.flush_interval
+            stop_requested = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop_requested = True
+                    break
+                batch.append(item)
+
+            try:
+                self._process_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop_requested:
+                self._queue.task_done()
+                break
+
+    def _process_batch(self, jobs: List[Dict[str, Any]]):
+        """Écrire un lot: images, journal des prédictions puis MongoDB"""
+        started = time.monotonic()
+
+        self._persist_images(jobs)
+        records = [job["record"] for job in jobs]
+
+        try:
+            self.prediction_store.append_many(records)
+        except Exception as e:
+            print(f"❌ Erreur lors de l'écriture du journal des prédictions: {e}")
+            self._increment("log_failures", len(records))
+
+        self._persist_mongodb(records)
+
+        with self._metrics_lock:
+            self._metrics["persisted"] += len(jobs)
+            self._metrics["batches"] += 1
+            self._metrics["last_flush_at"] = datetime.now().isoformat()
+            self._metrics["last_flush_duration_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+    def _persist_images(self, jobs: List[Dict[str, Any]]):
+        """Écrire les images uploadées dans le stockage permanent (une seule écriture)"""
+        for job in jobs:
+            data, target = job["image_data"], job["image_target"]
+            if data is None or not target:
+                continue
+
+            saved = False
+            try:
+                if self.image_store is not None:
+                    # Écriture ignorée si le même contenu est déjà stocké
+                    self.image_store.write(target, data)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(target, 'wb') as f:
+                        f.write(data)
+                saved = True
+            except Exception as e:
+                print(f"❌ Erreur lors de la sauvegarde permanente de {target}: {e}")
+                self._increment("image_failures")
+
+            # Libérer le contenu de l'image dès qu'il est écrit
+            job["image_data"] = None
+            job["record"].setdefault("metadata", {})["image_saved"] = saved
+
+    def _persist_mongodb(self, records: List[Dict[str, Any]]):
+        """Insérer le lot dans la collection predictions si MongoDB est disponible"""
+        if not self.db_manager.use_mongodb or not records:
+            return
+
+        try:
+            # Copies: insert_many ajoute un _id aux documents
+            self.db_manager.db.predictions.insert_many([dict(r) for r in records], ordered=False)
+        except Exception as e:
+            print(f"❌ Erreur lors de l'insertion MongoDB: {e}")
+            self._increment("mongodb_failures", len(records))
+
+    def flush(self):
+        """Attendre l'écriture de tous les enregistrements en file"""
+        self._queue.join()
+
+    def shutdown(self, timeout: float = 30.0):
+        """Arrêter le thread après écriture des enregistrements en attente"""
+        if not self._running:
+            return
+        self._running = False
+
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=timeout)
+
+        # Écrire ce qui reste si le thread n'a pas tout traité
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                remaining.append(item)
+        if remaining:
+            self._process_batch(remaining)
+
+        if self._thread.is_alive():
+            # Marqueur d'arrêt retiré avec les éléments restants: le remettre pour que
+            # le thread s'arrête après son lot en cours
+            self._queue.put(self._STOP)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Obtenir les métriques de la file"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+
+        metrics.update({
+            "queue_depth": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "running": self._running and self._thread.is_alive()
+        })
+        return metrics
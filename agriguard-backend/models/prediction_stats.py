@@ -0,0 +1,152 @@
+# models/prediction_stats.py
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+
+class PredictionStatsAggregator:
+    """Statistiques des prédictions maintenues de manière incrémentale"""
+
+    def __init__(self, snapshot_path: str, bucket_fn: Callable[[float], str],
+                 buckets: Sequence[str] = (), snapshot_interval: int = 100):
+        """
+        Initialiser l'agrégateur
+
+        Args:
+            snapshot_path: Fichier de sauvegarde des compteurs
+            bucket_fn: Fonction qui associe une confiance à une tranche de distribution
+            buckets: Tranches retournées par bucket_fn, présentes même à zéro
+            snapshot_interval: Nombre de mises à jour entre deux sauvegardes
+        """
+        self.snapshot_path = snapshot_path
+        self.bucket_fn = bucket_fn
+        self.buckets = tuple(buckets)
+        self.snapshot_interval = max(1, snapshot_interval)
+
+        self._lock = threading.Lock()
+        self._position: Optional[Tuple[str, int]] = None
+        self._pending_updates = 0
+        self._reset()
+
+    def _reset(self):
+        """Remettre les compteurs à zéro"""
+        self.total_predictions = 0
+        self.confidence_sum = 0.0
+        self.predictions_by_class: Dict[str, int] = {}
+        self.predictions_by_date: Dict[str, int] = {}
+        self.confidence_distribution: Dict[str, int] = dict.fromkeys(self.buckets, 0)
+        self._position = None
+
+    def attach(self, store):
+        """
+        Charger la dernière sauvegarde et s'abonner au journal des prédictions.
+        Seuls les enregistrements postérieurs à la sauvegarde sont rejoués.
+
+        Args:
+            store: Journal des prédictions (PredictionLogStore)
+        """
+        position = self._load_snapshot()
+        if position is not None and not store.contains_position(*position):
+            print("⚠️  Sauvegarde des statistiques incohérente avec le journal, recalcul complet")
+            self._reset()
+            position = None
+
+        store.subscribe(self.update, since=position)
+        self.save_snapshot()
+
+    def update(self, record: Dict[str, Any], location: Dict[str, Any] = None):
+        """
+        Prendre en compte une nouvelle prédiction
+
+        Args:
+            record: Enregistrement de prédiction
+            location: Position de l'enregistrement dans le journal
+        """
+        classification = record.get("classification") or {}
+        predicted_class = classification.get("predicted_class", "unknown")
+        confidence = classification.get("confidence", 0) or 0
+        date = (record.get("timestamp") or "")[:10]
+        bucket = self.bucket_fn(confidence)
+
+        with self._lock:
+            self.total_predictions += 1
+            self.confidence_sum += confidence
+            self.predictions_by_class[predicted_class] = self.predictions_by_class.get(predicted_class, 0) + 1
+            self.predictions_by_date[date] = self.predictions_by_date.get(date, 0) + 1
+            self.confidence_distribution[bucket] = self.confidence_distribution.get(bucket, 0) + 1
+
+            if location is not None:
+                self._position = (location["segment"], location["offset"] + location["length"])
+
+            self._pending_updates += 1
+            should_save = self._pending_updates >= self.snapshot_interval
+
+        if should_save:
+            self.save_snapshot()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Obtenir les statistiques au format de l'API"""
+        with self._lock:
+            return {
+                "total_predictions": self.total_predictions,
+                "predictions_by_class": dict(self.predictions_by_class),
+                "predictions_by_date": dict(self.predictions_by_date),
+                "average_confidence": (self.confidence_sum / self.total_predictions
+                                       if self.total_predictions else 0),
+                "confidence_distribution": dict(self.confidence_distribution)
+            }
+
+    def _load_snapshot(self) -> Optional[Tuple[str, int]]:
+        """Charger les compteurs sauvegardés et retourner la position couverte"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+
+            position = snapshot.get("position")
+            if not position:
+                return None
+
+            self.total_predictions = snapshot["total_predictions"]
+            self.confidence_sum = snapshot["confidence_sum"]
+            self.predictions_by_class = snapshot["predictions_by_class"]
+            self.predictions_by_date = snapshot["predictions_by_date"]
+            # Tranches vides d'une ancienne sauvegarde (autres libellés) ignorées
+            self.confidence_distribution = dict.fromkeys(self.buckets, 0)
+            self.confidence_distribution.update(
+                (bucket, count) for bucket, count in snapshot["confidence_distribution"].items() if count
+            )
+            self._position = (position["segment"], position["offset"])
+            return self._position
+
+        except (ValueError, KeyError, OSError) as e:
+            print(f"⚠️  Sauvegarde des statistiques illisible, recalcul complet: {e}")
+            self._reset()
+            return None
+
+    def save_snapshot(self):
+        """Sauvegarder les compteurs de manière atomique"""
+        with self._lock:
+            snapshot = {
+                "total_predictions": self.total_predictions,
+                "confidence_sum": self.confidence_sum,
+                "predictions_by_class": dict(self.predictions_by_class),
+                "predictions_by_date": dict(self.predictions_by_date),
+                "confidence_distribution": dict(self.confidence_distribution),
+                "position": ({"segment": self._position[0], "offset": self._position[1]}
+                             if self._position else None)
+            }
+            self._pending_updates = 0
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"⚠️  Impossible de sauvegarder les statistiques: {e}")
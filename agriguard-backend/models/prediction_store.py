@@ -0,0 +1,630 @@
+# models/prediction_store.py
+import base64
+import glob
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils import serialization
+
+
+class PredictionLogStore:
+    """Journal append-only des prédictions (segments JSON Lines avec rotation)"""
+
+    SEGMENT_PREFIX = "segment_"
+    SEGMENT_SUFFIX = ".jsonl"
+    INDEX_FILENAME = "index.json"
+    IDS_FILENAME = "ids.idx"
+
+    def __init__(self, base_dir: str, max_segment_bytes: int = 8 * 1024 * 1024,
+                 max_segment_records: int = 10000, fsync: bool = True,
+                 index_flush_interval: int = 50):
+        """
+        Initialiser le journal des prédictions
+
+        Args:
+            base_dir: Dossier racine des logs de prédictions
+            max_segment_bytes: Taille maximale d'un segment avant rotation
+            max_segment_records: Nombre maximal d'enregistrements par segment
+            fsync: Forcer l'écriture sur disque après chaque ajout
+            index_flush_interval: Nombre d'ajouts entre deux sauvegardes de l'index
+        """
+        self.base_dir = base_dir
+        self.segments_dir = os.path.join(base_dir, "segments")
+        self.index_path = os.path.join(self.segments_dir, self.INDEX_FILENAME)
+        self.ids_path = os.path.join(self.segments_dir, self.IDS_FILENAME)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_records = max_segment_records
+        self.fsync = fsync
+        self.index_flush_interval = max(1, index_flush_interval)
+
+        self._lock = threading.RLock()
+        self._segments: List[Dict[str, Any]] = []
+        self._active_file = None
+        self._pending_index_writes = 0
+
+        # Index prediction_id -> (segment, offset, longueur)
+        self._ids: Dict[str, Tuple[str, int, int]] = {}
+        self._ids_file = None
+
+        # Callbacks appelés après chaque ajout (record, position)
+        self._listeners: List[Callable[[Dict[str, Any], Dict[str, Any]], None]] = []
+
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Ouverture et récupération après crash
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        """Charger l'index et le réconcilier avec les segments présents sur disque"""
+        indexed = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    indexed = {meta["name"]: meta for meta in json.load(f).get("segments", [])}
+            except (ValueError, KeyError, OSError) as e:
+                print(f"⚠️  Index du journal illisible, reconstruction: {e}")
+                indexed = {}
+
+        is_new_store = not indexed and not self._segment_files()
+
+        for path in self._segment_files():
+            name = os.path.basename(path)
+            meta = indexed.get(name) or self._new_segment_meta(name)
+            if "user_dates" not in meta:
+                # Index antérieur aux compteurs par utilisateur et date: segment recompté
+                ids_indexed = meta.get("ids_indexed", 0)
+                meta = self._new_segment_meta(name)
+                meta["ids_indexed"] = ids_indexed
+
+            # Rescanner uniquement la partie non couverte par l'index
+            if os.path.getsize(path) != meta["size"]:
+                if os.path.getsize(path) < meta["size"]:
+                    meta = self._new_segment_meta(name)
+                self._scan_segment(meta, meta["size"])
+
+            self._segments.append(meta)
+
+        if not self._segments:
+            self._segments.append(self._new_segment_meta(self._segment_name(1)))
+
+        self._open_active()
+        self._load_id_index()
+
+        if is_new_store:
+            self._import_legacy_logs()
+
+        self._save_index()
+
+    def _segment_files(self) -> List[str]:
+        """Lister les fichiers de segments dans l'ordre"""
+        pattern = os.path.join(self.segments_dir, f"{self.SEGMENT_PREFIX}*{self.SEGMENT_SUFFIX}")
+        return sorted(glob.glob(pattern))
+
+    def _segment_name(self, number: int) -> str:
+        return f"{self.SEGMENT_PREFIX}{number:06d}{self.SEGMENT_SUFFIX}"
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.segments_dir, name)
+
+    @staticmethod
+    def _new_segment_meta(name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "count": 0,
+            "size": 0,
+            "first_timestamp": None,
+            "last_timestamp": None,
+            "dates": {},
+            "users": {},
+            "user_dates": {},
+            "ids_indexed": 0
+        }
+
+    def _scan_segment(self, meta: Dict[str, Any], start_offset: int = 0):
+        """
+        Relire un segment à partir d'un offset et mettre à jour ses métadonnées.
+        Une dernière ligne incomplète (écriture interrompue) est tronquée.
+        """
+        path = self._segment_path(meta["name"])
+        with open(path, 'rb') as f:
+            f.seek(start_offset)
+            data = f.read()
+
+        valid_length = data.rfind(b"\n") + 1
+        if valid_length != len(data):
+            print(f"⚠️  Ligne incomplète tronquée dans {meta['name']}")
+            with open(path, 'r+b') as f:
+                f.truncate(start_offset + valid_length)
+            data = data[:valid_length]
+
+        for line in data.splitlines():
+            record = self._decode_line(line)
+            if record is not None:
+                self._account(meta, record)
+
+        meta["size"] = start_offset + valid_length
+
+    @staticmethod
+    def _decode_line(line: bytes) -> Optional[Dict[str, Any]]:
+        if not line.strip():
+            return None
+        try:
+            return serialization.loads(line)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _account(meta: Dict[str, Any], record: Dict[str, Any]):
+        """Comptabiliser un enregistrement dans les métadonnées d'un segment"""
+        timestamp = record.get("timestamp") or ""
+        date = timestamp[:10]
+
+        meta["count"] += 1
+        if meta["first_timestamp"] is None:
+            meta["first_timestamp"] = timestamp
+        meta["last_timestamp"] = timestamp
+        meta["dates"][date] = meta["dates"].get(date, 0) + 1
+        user_id = record.get("user_id")
+        if user_id:
+            meta["users"][user_id] = meta["users"].get(user_id, 0) + 1
+            user_dates = meta["user_dates"].setdefault(user_id, {})
+            user_dates[date] = user_dates.get(date, 0) + 1
+
+    def _load_id_index(self):
+        """Charger l'index des identifiants et indexer les enregistrements non couverts"""
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, 'rb') as f:
+                for line in f:
+                    try:
+                        prediction_id, segment, offset, length = serialization.loads(line)
+                    except ValueError:
+                        continue
+                    self._ids[prediction_id] = (segment, offset, length)
+        else:
+            for meta in self._segments:
+                meta["ids_indexed"] = 0
+
+        self._ids_file = open(self.ids_path, 'ab')
+
+        for meta in self._segments:
+            if meta.get("ids_indexed", 0) < meta["size"]:
+                self._index_segment_ids(meta, meta.get("ids_indexed", 0))
+        self._ids_file.flush()
+
+    def _iter_segment_lines(self, meta: Dict[str, Any],
+                            start_offset: int = 0) -> Iterator[Tuple[Dict[str, Any], int, bytes]]:
+        """Parcourir les enregistrements d'un segment avec leur offset et leur ligne brute"""
+        with open(self._segment_path(meta["name"]), 'rb') as f:
+            f.seek(start_offset)
+            data = f.read(meta["size"] - start_offset)
+
+        offset = start_offset
+        for line in data.splitlines(keepends=True):
+            record = self._decode_line(line)
+            if record is not None:
+                yield record, offset, line
+            offset += len(line)
+
+    def _index_segment_ids(self, meta: Dict[str, Any], start_offset: int):
+        """Indexer les identifiants d'un segment à partir d'un offset"""
+        for record, offset, line in self._iter_segment_lines(meta, start_offset):
+            self._index_id(record, meta["name"], offset, len(line))
+
+        meta["ids_indexed"] = meta["size"]
+
+    def _index_id(self, record: Dict[str, Any], segment: str, offset: int, length: int):
+        """Ajouter un identifiant à l'index en mémoire et au fichier d'index"""
+        prediction_id = record.get("prediction_id")
+        if not prediction_id:
+            return
+
+        self._ids[prediction_id] = (segment, offset, length)
+        self._ids_file.write(serialization.dumps([prediction_id, segment, offset, length]) + b"\n")
+
+    def _open_active(self):
+        """Ouvrir le segment actif en mode ajout"""
+        if self._active_file:
+            self._active_file.close()
+        self._active_file = open(self._segment_path(self._segments[-1]["name"]), 'ab')
+
+    def _rotate(self):
+        """Fermer le segment actif et en ouvrir un nouveau"""
+        self._sync_active()
+        last_name = self._segments[-1]["name"]
+        number = int(last_name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)]) + 1
+        self._segments.append(self._new_segment_meta(self._segment_name(number)))
+        self._open_active()
+        self._save_index()
+
+    def _save_index(self):
+        """Sauvegarder l'index de manière atomique"""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "segments": self._segments}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._pending_index_writes = 0
+
+    def _import_legacy_logs(self):
+        """Importer les anciens fichiers JSON quotidiens dans le journal"""
+        legacy_files = sorted(glob.glob(os.path.join(self.base_dir, "daily", "predictions_*.json")))
+        if not legacy_files:
+            global_log = os.path.join(self.base_dir, "all_predictions.json")
+            legacy_files = [global_log] if os.path.exists(global_log) else []
+
+        imported = 0
+        for path in legacy_files:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    predictions = json.load(f).get("predictions", [])
+            except (ValueError, OSError) as e:
+                print(f"⚠️  Impossible d'importer {path}: {e}")
+                continue
+
+            for record in predictions:
+                self._append_locked(record, sync=False)
+                imported += 1
+
+        if imported:
+            self._sync_active()
+            print(f"✅ {imported} prédictions importées depuis les anciens logs JSON")
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        return serialization.dumps(record) + b"\n"
+
+    def _sync_active(self):
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+
+    def _append_locked(self, record: Dict[str, Any], sync: bool = True) -> Dict[str, Any]:
+        line = self._encode(record)
+        meta = self._segments[-1]
+
+        if meta["count"] > 0 and (meta["count"] >= self.max_segment_records or
+                                  meta["size"] + len(line) > self.max_segment_bytes):
+            self._rotate()
+            meta = self._segments[-1]
+
+        offset = meta["size"]
+        self._active_file.write(line)
+        if sync:
+            self._sync_active()
+
+        meta["size"] += len(line)
+        self._account(meta, record)
+
+        # L'index des identifiants peut être reconstruit depuis le journal: pas de fsync
+        self._index_id(record, meta["name"], offset, len(line))
+        self._ids_file.flush()
+        meta["ids_indexed"] = meta["size"]
+
+        self._pending_index_writes += 1
+        if self._pending_index_writes >= self.index_flush_interval:
+            self._save_index()
+
+        location = {"segment": meta["name"], "offset": offset, "length": len(line)}
+        self._notify(record, location)
+        return location
+
+    def append_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ajouter plusieurs enregistrements avec une seule synchronisation disque
+
+        Args:
+            records: Enregistrements de prédiction
+
+        Returns:
+            Positions des enregistrements
+        """
+        with self._lock:
+            locations = [self._append_locked(record, sync=False) for record in records]
+            if locations:
+                self._sync_active()
+            return locations
+
+    def _notify(self, record: Dict[str, Any], location: Dict[str, Any]):
+        for callback in self._listeners:
+            try:
+                callback(record, location)
+            except Exception as e:
+                print(f"⚠️  Erreur dans un abonné du journal: {e}")
+
+    def contains_position(self, segment: str, offset: int) -> bool:
+        """Vérifier qu'une position (segment, offset) existe dans le journal"""
+        with self._lock:
+            return any(meta["name"] == segment and offset <= meta["size"] for meta in self._segments)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any], Dict[str, Any]], None],
+                  since: Optional[Tuple[str, int]] = None):
+        """
+        Abonner un callback aux ajouts, après rejeu des enregistrements existants
+
+        Args:
+            callback: Fonction appelée avec (record, position) pour chaque ajout
+            since: Position (segment, offset) à partir de laquelle rejouer le journal,
+                   None pour rejouer tout le journal
+        """
+        with self._lock:
+            replay = since is None
+            for meta in self._segments:
+                start = 0
+                if not replay:
+                    if meta["name"] != since[0]:
+                        continue
+                    replay = True
+                    start = since[1]
+
+                for record, offset, line in self._iter_segment_lines(meta, start):
+                    callback(record, {"segment": meta["name"], "offset": offset, "length": len(line)})
+
+            self._listeners.append(callback)
+
+    def append(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ajouter un enregistrement en fin de journal
+
+        Args:
+            record: Enregistrement de prédiction
+
+        Returns:
+            Position de l'enregistrement (segment, offset, longueur)
+        """
+        with self._lock:
+            return self._append_locked(record)
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        """Copie des métadonnées des segments pour une lecture cohérente"""
+        with self._lock:
+            return [dict(meta, dates=dict(meta["dates"]), users=dict(meta["users"]),
+                         user_dates={user: dict(dates) for user, dates in meta["user_dates"].items()})
+                    for meta in self._segments]
+
+    def _read_segment(self, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Lire les enregistrements validés d'un segment"""
+        return [record for record, _, _ in self._iter_segment_lines(meta)]
+
+    @property
+    def total_records(self) -> int:
+        with self._lock:
+            return sum(meta["count"] for meta in self._segments)
+
+    def iter_records(self, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """Parcourir tous les enregistrements du journal"""
+        segments = self._snapshot()
+        for meta in (reversed(segments) if newest_first else segments):
+            if meta["count"] == 0:
+                continue
+            records = self._read_segment(meta)
+            yield from (reversed(records) if newest_first else records)
+
+    def iter_disk_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourir les enregistrements présents sur disque, sans l'index en mémoire:
+        inclut ceux ajoutés par un autre processus sur le même dossier
+        """
+        for path in self._segment_files():
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            # Une dernière ligne incomplète est en cours d'écriture: ignorée
+            for line in data[:data.rfind(b"\n") + 1].splitlines():
+                record = self._decode_line(line)
+                if record is not None:
+                    yield record
+
+    @staticmethod
+    def _segment_count(meta: Dict[str, Any], date: str = None, user_id: str = None) -> int:
+        """Nombre d'enregistrements d'un segment (d'une date, d'un utilisateur) d'après ses métadonnées"""
+        if date and user_id is not None:
+            return meta["user_dates"].get(user_id, {}).get(date, 0)
+        if date:
+            return meta["dates"].get(date, 0)
+        if user_id is not None:
+            return meta["users"].get(user_id, 0)
+        return meta["count"]
+
+    @staticmethod
+    def _matches(record: Dict[str, Any], date: str = None, user_id: str = None) -> bool:
+        return ((not date or (record.get("timestamp") or "")[:10] == date) and
+                (user_id is None or record.get("user_id") == user_id))
+
+    def count(self, date: str = None, user_id: str = None) -> int:
+        """
+        Nombre d'enregistrements (d'une date, d'un utilisateur) d'après les métadonnées
+        des segments, sans relire le journal
+        """
+        return sum(self._segment_count(meta, date, user_id) for meta in self._snapshot())
+
+    @staticmethod
+    def encode_cursor(segment: str, offset: int) -> str:
+        """Curseur opaque désignant la position d'un enregistrement dans le journal"""
+        return base64.urlsafe_b64encode(f"{segment}:{offset}".encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """Position (segment, offset) d'un curseur; ValueError s'il est invalide"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+            segment, offset = raw.rsplit(":", 1)
+            return segment, int(offset)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Curseur invalide")
+
+    def iter_entries(self, newest_first: bool = True, cursor: str = None,
+                     date_from: str = None, date_to: str = None,
+                     user_id: str = None) -> Iterator[Tuple[str, int, bytes, Dict[str, Any]]]:
+        """
+        Parcourir le journal à partir d'une position, un segment en mémoire à la fois
+
+        L'ordre du journal est l'ordre d'écriture: les enregistrements ajoutés pendant
+        le parcours ne décalent pas les positions déjà lues.
+
+        Args:
+            newest_first: Ordre antichronologique
+            cursor: Reprendre après l'enregistrement désigné par ce curseur
+            date_from: Première date incluse (YYYY-MM-DD)
+            date_to: Dernière date incluse (YYYY-MM-DD)
+            user_id: Ne garder que les enregistrements de cet utilisateur
+
+        Returns:
+            Itérateur de (segment, offset, ligne JSON brute, enregistrement)
+        """
+        segments = self._snapshot()
+        ordered = list(reversed(segments)) if newest_first else segments
+
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is not None:
+            names = [meta["name"] for meta in ordered]
+            if position[0] not in names:
+                raise ValueError("Curseur invalide")
+            ordered = ordered[names.index(position[0]):]
+
+        def in_range(day):
+            return (not date_from or day >= date_from) and (not date_to or day <= date_to)
+
+        return self._iter_entries(ordered, newest_first, position, in_range,
+                                  bool(date_from or date_to), user_id)
+
+    def _iter_entries(self, segments, newest_first, position, in_range, filter_dates, user_id):
+        for meta in segments:
+            # Segments sans enregistrement dans l'intervalle ou de l'utilisateur: non relus
+            if (meta["count"] == 0 or (filter_dates and not any(in_range(d) for d in meta["dates"]))
+                    or (user_id is not None and not meta["users"].get(user_id))):
+                continue
+
+            entries = list(self._iter_segment_lines(meta))
+            if newest_first:
+                entries.reverse()
+
+            resume = position is not None and meta["name"] == position[0]
+            for record, offset, line in entries:
+                if resume and (offset >= position[1] if newest_first else offset <= position[1]):
+                    continue
+                if filter_dates and not in_range((record.get("timestamp") or "")[:10]):
+                    continue
+                if user_id is not None and record.get("user_id") != user_id:
+                    continue
+                yield meta["name"], offset, line, record
+
+    def page(self, cursor: str = None, limit: int = 50, newest_first: bool = True,
+             date: str = None, user_id: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Page d'enregistrements par curseur (pagination par clé)
+
+        Le coût d'une page ne dépend pas de sa profondeur: la lecture reprend au
+        segment du curseur.
+
+        Returns:
+            Tuple (page, curseur de la page suivante ou None si c'est la dernière)
+        """
+        page = []
+        last = None
+        for segment, offset, _, record in self.iter_entries(
+                newest_first=newest_first, cursor=cursor, date_from=date, date_to=date, user_id=user_id):
+            if len(page) >= limit:
+                return page, self.encode_cursor(*last)
+            page.append(record)
+            last = (segment, offset)
+        return page, None
+
+    def query(self, date: str = None, offset: int = 0, limit: int = 50,
+              newest_first: bool = True, user_id: str = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Récupérer une page d'enregistrements sans relire les segments ignorés
+
+        Args:
+            date: Filtrer sur une date (YYYY-MM-DD)
+            offset: Nombre d'enregistrements à sauter
+            limit: Nombre maximal d'enregistrements retournés
+            newest_first: Ordre antichronologique
+            user_id: Filtrer sur un utilisateur
+
+        Returns:
+            Tuple (nombre total d'enregistrements correspondants, page)
+        """
+        segments = self._snapshot()
+        total = self.count(date, user_id)
+        page = []
+        skip = max(0, offset)
+
+        for meta in (reversed(segments) if newest_first else segments):
+            if len(page) >= limit:
+                break
+
+            count = self._segment_count(meta, date, user_id)
+            if count == 0:
+                continue
+            if skip >= count:
+                skip -= count
+                continue
+
+            records = self._read_segment(meta)
+            if date or user_id is not None:
+                records = [r for r in records if self._matches(r, date, user_id)]
+            if newest_first:
+                records.reverse()
+            if skip >= len(records):
+                skip -= len(records)
+                continue
+
+            page.extend(records[skip:skip + limit - len(page)])
+            skip = 0
+
+        return total, page
+
+    def get(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer un enregistrement par identifiant via l'index (une seule lecture)
+
+        Args:
+            prediction_id: Identifiant de la prédiction
+
+        Returns:
+            Enregistrement ou None
+        """
+        with self._lock:
+            location = self._ids.get(prediction_id)
+        if location is None:
+            return None
+
+        segment, offset, length = location
+        try:
+            with open(self._segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                record = self._decode_line(f.read(length))
+        except OSError:
+            return None
+
+        # Vérifier que l'entrée d'index pointe bien sur l'enregistrement attendu
+        if record is None or record.get("prediction_id") != prediction_id:
+            return None
+        return record
+
+    def close(self):
+        """Sauvegarder l'index et fermer le segment actif"""
+        with self._lock:
+            if self._active_file:
+                self._sync_active()
+                self._save_index()
+                self._active_file.close()
+                self._active_file = None
+            if self._ids_file:
+                self._ids_file.close()
+                self._ids_file = None
@@ -0,0 +1,302 @@
+# models/worker_pool.py
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .inference_backends import InferenceBackend, create_backend
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Ouvrir un segment existant sans l'enregistrer auprès du resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: pas d'option track; l'enregistrement rejoint celui du
+        # parent dans le resource tracker partagé
+        return shared_memory.SharedMemory(name=name)
+
+
+def _pin_worker(worker_id: int, num_threads: int):
+    """
+    Attacher le worker à un sous-ensemble de cœurs
+
+    Le nombre de threads est fixé par le moteur (torch.set_num_threads, options de
+    session ONNX Runtime/OpenVINO): après le fork, les variables OMP_NUM_THREADS/
+    MKL_NUM_THREADS n'ont plus d'effet sur les bibliothèques déjà chargées.
+    """
+    if num_threads and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        start = worker_id * num_threads
+        if start + num_threads <= len(cores):
+            os.sched_setaffinity(0, cores[start:start + num_threads])
+
+
+def _worker_main(worker_id: int, backend: str, model_path: str, num_threads: int,
+                 precision: str, requests, responses):
+    """Boucle d'un processus worker: lit les batchs en mémoire partagée et renvoie les scores"""
+    _pin_worker(worker_id, num_threads)
+
+    try:
+        engine = create_backend(backend, model_path, num_threads=num_threads, precision=precision)
+    except Exception as e:
+        responses.put(("error", worker_id, None, str(e)))
+        return
+
+    responses.put(("ready", worker_id, None, {
+        "class_names": engine.class_names,
+        "input_size": engine.input_size
+    }))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+
+        job_id, shm_name, shape, dtype = job
+        shm = None
+        try:
+            shm = _attach_shared_memory(shm_name)
+            batch = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            scores = np.asarray(engine.predict(batch), dtype=np.float32)
+            del batch
+            responses.put(("result", worker_id, job_id, scores))
+        except Exception as e:
+            responses.put(("error", worker_id, job_id, str(e)))
+        finally:
+            if shm is not None:
+                shm.close()
+
+
+class ModelWorkerPool(InferenceBackend):
+    """
+    Pool de processus d'inférence, chacun avec son propre moteur et un nombre de threads fixé.
+
+    Les batchs prétraités sont copiés une fois dans un segment multiprocessing.shared_memory
+    (seul son nom transite par les files) et chaque batch est envoyé au worker le moins chargé.
+    """
+
+    def __init__(self, backend: str, model_path: str, num_workers: int = 2,
+                 threads_per_worker: int = 1, precision: str = "fp32",
+                 start_method: str = "fork", startup_timeout: float = 120.0,
+                 request_timeout: float = 60.0, health_check_interval: float = 1.0):
+        """
+        Démarrer les workers
+
+        Args:
+            backend: Moteur d'inférence des workers (torch, onnxruntime, openvino)
+            model_path: Chemin des poids .pt ou du modèle exporté
+            num_workers: Nombre de processus
+            threads_per_worker: Threads CPU par worker (et cœurs réservés)
+            precision: fp32 ou int8
+            start_method: Méthode de démarrage multiprocessing. fork évite de réimporter
+                          app.py dans les workers; le pool doit alors être créé avant
+                          tout autre thread.
+            startup_timeout: Attente maximale (s) du chargement des modèles
+            request_timeout: Attente maximale (s) d'un résultat
+            health_check_interval: Intervalle (s) de détection des workers arrêtés
+        """
+        super().__init__(model_path)
+        self.name = f"{backend} x{num_workers}"
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = threads_per_worker
+        self.request_timeout = request_timeout
+        self.health_check_interval = health_check_interval
+
+        context = mp.get_context(start_method)
+
+        # Resource tracker démarré avant les workers: ils le partagent avec le
+        # processus principal, seul responsable de la suppression des segments
+        resource_tracker.ensure_running()
+
+        self._responses = context.Queue()
+        self._requests = []
+        self._processes = []
+        self._in_flight = [0] * self.num_workers
+        self._completed = [0] * self.num_workers
+        self._pending: Dict[int, tuple] = {}
+        self._dead = set()
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._closed = False
+
+        for worker_id in range(self.num_workers):
+            requests = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, backend, model_path, threads_per_worker,
+                      precision, requests, self._responses),
+                name=f"model-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            self._requests.append(requests)
+            self._processes.append(process)
+
+        self._wait_until_ready(startup_timeout)
+
+        self._collector = threading.Thread(target=self._collect, name="model-pool-collector", daemon=True)
+        self._collector.start()
+
+    def _wait_until_ready(self, timeout: float):
+        """Attendre que chaque worker ait chargé son modèle"""
+        ready = set()
+        while len(ready) < self.num_workers:
+            try:
+                kind, worker_id, _, payload = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                raise RuntimeError("Délai dépassé lors du démarrage des workers d'inférence")
+
+            if kind == "error":
+                self.close()
+                raise RuntimeError(f"Worker {worker_id}: {payload}")
+
+            ready.add(worker_id)
+            self.class_names = payload["class_names"]
+            self.input_size = payload["input_size"]
+
+    def _collect(self):
+        """Thread qui résout les Futures à partir des réponses des workers"""
+        next_check = time.monotonic() + self.health_check_interval
+        while True:
+            # Vérification périodique même si les autres workers répondent en continu
+            if time.monotonic() >= next_check:
+                self._fail_dead_workers()
+                next_check = time.monotonic() + self.health_check_interval
+
+            try:
+                message = self._responses.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+
+            kind, worker_id, job_id, payload = message
+            with self._lock:
+                pending = self._pending.pop(job_id, None)
+                if pending is not None:
+                    self._in_flight[worker_id] -= 1
+                    self._completed[worker_id] += 1
+            if pending is None:
+                # Job déjà échoué (worker considéré comme arrêté)
+                continue
+
+            future, shm, _ = pending
+            shm.close()
+            shm.unlink()
+
+            if kind == "result":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Worker {worker_id}: {payload}"))
+
+    def _fail_dead_workers(self):
+        """Faire échouer les jobs des workers arrêtés en cours de traitement (crash, OOM)"""
+        if self._closed:
+            return
+
+        for worker_id, process in enumerate(self._processes):
+            if worker_id in self._dead or process.is_alive():
+                continue
+
+            with self._lock:
+                self._dead.add(worker_id)
+                self._in_flight[worker_id] = 0
+                lost = {job_id: p for job_id, p in self._pending.items() if p[2] == worker_id}
+                for job_id in lost:
+                    del self._pending[job_id]
+
+            print(f"❌ Worker d'inférence {worker_id} arrêté (code {process.exitcode}), "
+                  f"{len(lost)} batch(s) en échec")
+            for future, shm, _ in lost.values():
+                shm.close()
+                shm.unlink()
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Worker {worker_id} arrêté"))
+
+    def _least_loaded(self) -> int:
+        """Choisir le worker vivant avec le moins de batchs en cours"""
+        candidates = [i for i, p in enumerate(self._processes) if p.is_alive()]
+        if not candidates:
+            raise RuntimeError("Aucun worker d'inférence disponible")
+        return min(candidates, key=lambda i: self._in_flight[i])
+
+    def submit(self, batch: np.ndarray) -> Future:
+        """
+        Envoyer un batch (N, 3, H, W) au worker le moins chargé
+
+        Returns:
+            Future résolu avec la matrice (N, C) des scores
+        """
+        if self._closed:
+            raise RuntimeError("Pool d'inférence arrêté")
+
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, batch.nbytes))
+        np.ndarray(batch.shape, dtype=batch.dtype, buffer=shm.buf)[...] = batch
+
+        future = Future()
+        job_id = next(self._job_ids)
+
+        try:
+            with self._lock:
+                worker_id = self._least_loaded()
+                self._pending[job_id] = (future, shm, worker_id)
+                self._in_flight[worker_id] += 1
+            self._requests[worker_id].put((job_id, shm.name, batch.shape, batch.dtype.str))
+        except Exception:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            shm.close()
+            shm.unlink()
+            raise
+
+        return future
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.submit(batch).result(timeout=self.request_timeout)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Charge et état de chaque worker"""
+        with self._lock:
+            return [{
+                "worker": i,
+                "pid": process.pid,
+                "alive": process.is_alive(),
+                "in_flight": self._in_flight[i],
+                "completed": self._completed[i]
+            } for i, process in enumerate(self._processes)]
+
+    def close(self, timeout: float = 5.0):
+        """Arrêter les workers et libérer les segments en attente"""
+        if self._closed:
+            return
+        self._closed = True
+
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+
+        self._responses.put(None)
+        collector = getattr(self, '_collector', None)
+        if collector is not None:
+            collector.join(timeout=timeout)
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, shm, _ in pending.values():
+            shm.close()
+            shm.unlink()
+            if not future.done():
+                future.set_exception(RuntimeError("Pool d'inférence arrêté"))
@@ -1,21 +1,167 @@
 # models/yolo_model_cls.py (Version mise à jour)
-import torch
-from ultralytics import YOLO
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import hashlib
 import json
 import os
+import queue
+import threading
+import time
 
 # Import du gestionnaire de base de données
 from .database_manager import DatabaseManager
+from .inference_backends import create_backend
+from .worker_pool import ModelWorkerPool
+from utils.image_processing import preprocess_for_model
+
+class BatchInferenceServer:
+    """Regroupe les requêtes concurrentes en un seul passage du modèle (micro-batching)"""
+
+    def __init__(self, infer_fn, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_concurrency: int = 1, request_timeout: float = 60.0):
+        """
+        Initialiser le serveur de micro-batching
+
+        Args:
+            infer_fn: Fonction qui reçoit une liste d'images et retourne une liste de résultats
+            max_batch_size: Nombre maximal d'images par passage du modèle
+            max_wait_ms: Temps d'attente maximal (ms) pour compléter un batch
+            max_concurrency: Nombre de batchs exécutés en parallèle (ex: nombre de workers)
+            request_timeout: Attente maximale (s) du résultat d'une image
+        """
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.request_timeout = request_timeout
+
+        # Batchs en cours limités: les requêtes s'accumulent pendant que les workers sont occupés
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = (ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch-exec")
+                          if self.max_concurrency > 1 else None)
+
+        self._queue = queue.Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """
+        Soumettre une image au prochain batch
+
+        Args:
+            image: Image sous forme de array numpy
+
+        Returns:
+            Future résolu avec le dictionnaire de résultat de cette image
+        """
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("Serveur de batching arrêté"))
+            return future
+
+        self._queue.put((image, future))
+        return future
+
+    def _collect_batch(self, first_item) -> List[Tuple[np.ndarray, Future]]:
+        """Compléter un batch jusqu'à max_batch_size ou jusqu'à expiration du délai"""
+        batch = [first_item]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                # Signal d'arrêt: le remettre pour la boucle principale
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        """Boucle du thread d'inférence"""
+        while True:
+            self._slots.acquire()
+            item = self._queue.get()
+            if item is None:
+                self._slots.release()
+                break
+
+            batch = self._collect_batch(item)
+
+            if self._executor is not None:
+                self._executor.submit(self._execute, batch)
+            else:
+                self._execute(batch)
+
+    def _execute(self, batch: List[Tuple[np.ndarray, Future]]):
+        """Exécuter un batch et résoudre les Futures de ses requêtes"""
+        images = [image for image, _ in batch]
+
+        try:
+            results = self.infer_fn(images)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stop(self, timeout: float = 5.0):
+        """Arrêter le thread d'inférence après traitement des requêtes en attente"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+        if not self._thread.is_alive():
+            # Requêtes soumises pendant l'arrêt, restées derrière le signal d'arrêt
+            self._fail_pending(RuntimeError("Serveur de batching arrêté"))
+
+    def _fail_pending(self, error: Exception):
+        """Vider la file et faire échouer les Futures qui n'ont pas été traités"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                _, future = item
+                if not future.done():
+                    future.set_exception(error)
+
 
 class MaizeDiseaseClassifier:
     """Classificateur de maladies du maïs avec support MongoDB/JSON"""
 
+    # Taille d'entrée utilisée à l'entraînement (IMG_SIZE du pipeline ML)
+    DEFAULT_INPUT_SIZE = 224
+
     def __init__(self, model_path: str, json_fallback_path: str = None,
                  mongodb_url: str = "mongodb://localhost:27017/",
-                 database_name: str = "agriguard_db"):
+                 database_name: str = "agriguard_db",
+                 batch_max_size: int = 1,
+                 batch_max_wait_ms: float = 10.0,
+                 enhance_contrast: bool = True,
+                 backend: str = "torch",
+                 num_threads: int = 0,
+                 precision: str = "fp32",
+                 num_workers: int = 1):
         """
         Initialiser le classificateur
 
@@ -24,10 +170,29 @@ class MaizeDiseaseClassifier:
             json_fallback_path: Chemin vers le fichier JSON de fallback
             mongodb_url: URL MongoDB
             database_name: Nom de la base de données
+            batch_max_size: Taille maximale d'un micro-batch (1 = pas de batching)
+            batch_max_wait_ms: Attente maximale (ms) avant d'exécuter un batch incomplet
+            enhance_contrast: Appliquer le CLAHE lors du prétraitement
+            backend: Moteur d'inférence (torch, onnxruntime, openvino)
+            num_threads: Threads CPU du moteur ONNX Runtime/OpenVINO (0 = défaut)
+            precision: fp32 ou int8 (modèle quantifié, moteur onnxruntime)
+            num_workers: Nombre de processus d'inférence (1 = inférence dans le processus Flask)
         """
         self.model_path = model_path
+        self.backend_name = backend
+        self.num_threads = num_threads
+        self.precision = precision
+        self.num_workers = num_workers
         self.model = None
         self.class_names = []
+        self.batcher = None
+        self.input_size = self.DEFAULT_INPUT_SIZE
+        self.enhance_contrast = enhance_contrast
+        self.model_version = None
+
+        # Charger le modèle avant la base de données: les workers sont créés
+        # par fork et doivent l'être avant tout thread (client MongoDB, change stream)
+        self._load_model()
 
         # Initialiser le gestionnaire de base de données
         self.db_manager = DatabaseManager(
@@ -36,31 +201,96 @@ class MaizeDiseaseClassifier:
             json_fallback_path=json_fallback_path or "data/diseases_database.json"
         )
 
-        # Charger le modèle YOLO
-        self._load_model()
+        if self.model is not None and not self.class_names:
+            # Fallback: utiliser les classes de la base de données
+            self.class_names = self.db_manager.get_all_diseases()
+
+        # Activer le micro-batching si demandé
+        if self.model is not None and batch_max_size > 1:
+            self.batcher = BatchInferenceServer(
+                self._classify_many,
+                max_batch_size=batch_max_size,
+                max_wait_ms=batch_max_wait_ms,
+                max_concurrency=self.num_workers
+            )
+            print(f"✅ Micro-batching activé: {batch_max_size} images max, {batch_max_wait_ms} ms d'attente")
 
     def _load_model(self):
-        """Charger le modèle YOLO"""
+        """Charger le modèle avec le moteur d'inférence configuré"""
         try:
-            if not os.path.exists(self.model_path):
-                raise FileNotFoundError(f"Modèle non trouvé: {self.model_path}")
-
-            self.model = YOLO(self.model_path)
+            if self.num_workers > 1:
+                self.model = ModelWorkerPool(
+                    self.backend_name, self.model_path,
+                    num_workers=self.num_workers,
+                    threads_per_worker=self.num_threads or 1,
+                    precision=self.precision
+                )
+            else:
+                self.model = create_backend(self.backend_name, self.model_path,
+                                            num_threads=self.num_threads, precision=self.precision)
 
             # Récupérer les noms de classes depuis le modèle
-            if hasattr(self.model, 'names'):
-                self.class_names = list(self.model.names.values())
-            else:
-                # Fallback: utiliser les classes de la base de données
-                self.class_names = self.db_manager.get_all_diseases()
+            self.class_names = list(self.model.class_names or [])
+
+            self.input_size = self.model.input_size or self.DEFAULT_INPUT_SIZE
+            self.model_version = self._compute_model_version()
 
-            print(f"✅ Modèle chargé: {len(self.class_names)} classes")
+            print(f"✅ Modèle chargé ({self.model.name}, {self.precision}): {len(self.class_names)} classes, "
+                  f"entrée {self.input_size}x{self.input_size}")
 
         except Exception as e:
             print(f"❌ Erreur lors du chargement du modèle: {e}")
             self.model = None
             self.class_names = []
 
+    def _compute_model_version(self) -> str:
+        """
+        Identifiant de la version du modèle et de son prétraitement
+        (empreinte des poids, moteur, précision, taille d'entrée, CLAHE)
+        """
+        digest = hashlib.sha256()
+        if os.path.isfile(self.model_path):
+            with open(self.model_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+        preprocessing = "clahe" if self.enhance_contrast else "raw"
+        return (f"{digest.hexdigest()[:16]}-{self.backend_name}-{self.precision}"
+                f"-{self.input_size}-{preprocessing}")
+
+    def preprocess(self, image_source, with_hash: bool = False):
+        """
+        Préparer une image à la taille d'entrée du modèle en un seul passage
+
+        Args:
+            image_source: Chemin, contenu du fichier (bytes) ou image RGB
+            with_hash: Retourner aussi l'empreinte perceptuelle (dHash) de l'image
+
+        Returns:
+            Tenseur CHW float32 normalisé ou None si l'image est illisible,
+            ou tuple (tenseur, dhash) avec with_hash
+        """
+        return preprocess_for_model(image_source, self.input_size,
+                                    enhance=self.enhance_contrast, with_hash=with_hash)
+
+    def _to_model_input(self, images: List[np.ndarray]) -> np.ndarray:
+        """
+        Construire le batch (N, 3, H, W) float32 commun à tous les moteurs
+
+        Les images déjà prétraitées (CHW float32) sont utilisées telles quelles,
+        les autres (HWC RGB, chemins, bytes) passent par preprocess().
+        """
+        batch = []
+        for img in images:
+            prepared = (isinstance(img, np.ndarray) and img.dtype == np.float32
+                        and img.ndim == 3 and img.shape[0] == 3)
+            if not prepared:
+                img = self.preprocess(img)
+                if img is None:
+                    raise ValueError("Impossible de traiter l'image")
+            batch.append(img)
+        return np.stack(batch)
+
     def classify(self, image_array: np.ndarray) -> Dict[str, Any]:
         """
         Classifier une image
@@ -78,82 +308,167 @@ class MaizeDiseaseClassifier:
                 "timestamp": datetime.now().isoformat()
             }
 
+        if self.batcher is not None:
+            return self._wait_result(self.batcher.submit(image_array), self.batcher.request_timeout)
+
+        return self._classify_many([image_array])[0]
+
+    @staticmethod
+    def _wait_result(future: Future, timeout: float) -> Dict[str, Any]:
+        """Attendre le résultat d'une image soumise au serveur de batching"""
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeoutError:
+            return {
+                "success": False,
+                "error": "Délai d'inférence dépassé",
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Erreur lors de la classification: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            }
+
+    def _classify_many(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """
+        Classifier une liste d'images en un seul passage du modèle
+
+        Args:
+            images: Liste d'images sous forme de arrays numpy
+
+        Returns:
+            Liste des résultats de classification, dans l'ordre des images
+        """
         try:
-            # Prédiction avec YOLO
-            results = self.model(image_array, verbose=False)
+            # Un seul passage du moteur d'inférence pour tout le batch
+            probs = self.model.predict(self._to_model_input(images))
 
-            if not results or len(results) == 0:
-                return {
+            if probs is None or len(probs) != len(images):
+                return [{
                     "success": False,
                     "error": "Aucune prédiction obtenue",
                     "timestamp": datetime.now().isoformat()
-                }
-
-            result = results[0]
-
-            # Extraire les probabilités
-            if hasattr(result, 'probs') and result.probs is not None:
-                probs = result.probs.data.cpu().numpy()
-
-                # Classe prédite
-                predicted_class_id = int(np.argmax(probs))
-                confidence = float(probs[predicted_class_id])
-
-                # Vérifier que l'ID est valide
-                if predicted_class_id >= len(self.class_names):
-                    return {
-                        "success": False,
-                        "error": f"ID de classe invalide: {predicted_class_id}",
-                        "timestamp": datetime.now().isoformat()
-                    }
-
-                predicted_class = self.class_names[predicted_class_id]
-
-                # Top 5 prédictions
-                top5_indices = np.argsort(probs)[-5:][::-1]
-                top5_predictions = [
-                    {
-                        "class": self.class_names[i] if i < len(self.class_names) else f"unknown_{i}",
-                        "class_id": int(i),
-                        "confidence": float(f"{float(str(probs[i])):.2f}"),
-                        "confidence_percentage": float(f"{float(str(probs[i] * 100)):.2f}")
-                    }
-                    for i in top5_indices
-                ]
-
-                # Obtenir les informations détaillées sur la maladie
-                disease_info = self.db_manager.get_disease_info(predicted_class)
-
-                return {
-                    "success": True,
-                    "timestamp": datetime.now().isoformat(),
-                    "classification": {
-                        "predicted_class": predicted_class,
-                        "class_id": predicted_class_id,
-                        "confidence": float(f"{float(str(confidence)):.2f}"),
-                        "confidence_percentage": float(f"{float(str(confidence*100)):.2f}"),
-                        "top5_predictions": top5_predictions
-                    },
-                    "disease_info": disease_info
-                }
+                } for _ in images]
 
-            else:
-                return {
-                    "success": False,
-                    "error": "Pas de probabilités dans les résultats",
-                    "timestamp": datetime.now().isoformat()
-                }
+            return self._format_probs(probs)
 
         except Exception as e:
-            return {
+            return [{
                 "success": False,
                 "error": f"Erreur lors de la classification: {str(e)}",
                 "timestamp": datetime.now().isoformat()
-            }
+            } for _ in images]
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        """
+        Appliquer un softmax ligne par ligne si les scores ne sont pas déjà des probabilités
+
+        Args:
+            scores: Matrice (N, C) de scores ou de probabilités
+
+        Returns:
+            Matrice (N, C) de probabilités
+        """
+        scores = np.asarray(scores, dtype=np.float32)
+        if np.all(scores >= 0) and np.allclose(scores.sum(axis=1), 1.0, atol=1e-3):
+            return scores
+
+        shifted = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(shifted)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _format_probs(self, probs: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Construire les résultats de classification à partir de la matrice des probabilités
+
+        Args:
+            probs: Matrice (N, C) des probabilités
+            top_k: Nombre de prédictions à retourner par image
+
+        Returns:
+            Liste des résultats de classification
+        """
+        probs = self._softmax(probs)
+        n_images, n_classes = probs.shape
+        rows = np.arange(n_images)
+
+        # Classe prédite et confiance pour toutes les images
+        predicted_ids = probs.argmax(axis=1)
+        confidences = probs[rows, predicted_ids]
+
+        # Top K pour toutes les images: sélection partielle puis tri des K colonnes
+        k = min(top_k, n_classes)
+        top_ids = np.argpartition(probs, n_classes - k, axis=1)[:, -k:]
+        top_probs = np.take_along_axis(probs, top_ids, axis=1)
+        order = np.argsort(-top_probs, axis=1)
+        top_ids = np.take_along_axis(top_ids, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+
+        # Arrondi à 2 décimales en une seule passe vectorisée (en float64 pour que
+        # les valeurs converties en float Python restent exactement arrondies)
+        confidences = confidences.astype(np.float64)
+        top_probs = top_probs.astype(np.float64)
+        rounded_confidences = np.round(confidences, 2).tolist()
+        rounded_percentages = np.round(confidences * 100, 2).tolist()
+        top_confidences = np.round(top_probs, 2).tolist()
+        top_percentages = np.round(top_probs * 100, 2).tolist()
+        top_ids = top_ids.tolist()
+        predicted_ids = predicted_ids.tolist()
+
+        timestamp = datetime.now().isoformat()
+        disease_infos = {}
+        formatted = []
+
+        for row in range(n_images):
+            predicted_class_id = predicted_ids[row]
+
+            # Vérifier que l'ID est valide
+            if predicted_class_id >= len(self.class_names):
+                formatted.append({
+                    "success": False,
+                    "error": f"ID de classe invalide: {predicted_class_id}",
+                    "timestamp": timestamp
+                })
+                continue
+
+            predicted_class = self.class_names[predicted_class_id]
+
+            top5_predictions = [
+                {
+                    "class": self.class_names[i] if i < len(self.class_names) else f"unknown_{i}",
+                    "class_id": i,
+                    "confidence": p,
+                    "confidence_percentage": pct
+                }
+                for i, p, pct in zip(top_ids[row], top_confidences[row], top_percentages[row])
+            ]
+
+            # Informations sur la maladie, une seule requête par classe du batch
+            if predicted_class not in disease_infos:
+                disease_infos[predicted_class] = self.db_manager.get_disease_info(predicted_class)
+
+            formatted.append({
+                "success": True,
+                "timestamp": timestamp,
+                "classification": {
+                    "predicted_class": predicted_class,
+                    "class_id": predicted_class_id,
+                    "confidence": rounded_confidences[row],
+                    "confidence_percentage": rounded_percentages[row],
+                    "top5_predictions": top5_predictions
+                },
+                "disease_info": disease_infos[predicted_class]
+            })
+
+        return formatted
 
     def classify_batch(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
         """
-        Classifier plusieurs images
+        Classifier plusieurs images en un seul passage du modèle
+        (via le serveur de micro-batching lorsqu'il est activé)
 
         Args:
             images: Liste d'images sous forme de arrays numpy
@@ -161,20 +476,24 @@ class MaizeDiseaseClassifier:
         Returns:
             Liste des résultats de classification
         """
-        results = []
+        if not images:
+            return []
 
-        for i, image in enumerate(images):
-            try:
-                result = self.classify(image)
-                results.append(result)
-            except Exception as e:
-                results.append({
-                    "success": False,
-                    "error": f"Erreur image {i}: {str(e)}",
-                    "timestamp": datetime.now().isoformat()
-                })
+        if self.model is None:
+            return [{
+                "success": False,
+                "error": "Modèle non chargé",
+                "timestamp": datetime.now().isoformat()
+            } for _ in images]
+
+        if self.batcher is not None:
+            # Même file que les requêtes unitaires: un seul passage du modèle à la fois
+            # (moteurs non thread-safe), découpé selon max_batch_size
+            futures = [self.batcher.submit(image) for image in images]
+            deadline = time.monotonic() + self.batcher.request_timeout
+            return [self._wait_result(future, deadline - time.monotonic()) for future in futures]
 
-        return results
+        return self._classify_many(images)
 
     def get_disease_info(self, disease_class: str) -> Optional[Dict[str, Any]]:
         """
@@ -213,6 +532,23 @@ class MaizeDiseaseClassifier:
         """
         return self.db_manager.get_vector_info(disease_class)
 
+    def get_inference_info(self) -> Dict[str, Any]:
+        """
+        Obtenir la configuration et la charge du moteur d'inférence
+
+        Returns:
+            Moteur, précision, taille d'entrée et état des workers
+        """
+        workers = self.model.get_stats() if isinstance(self.model, ModelWorkerPool) else []
+        return {
+            "model_version": self.model_version,
+            "backend": self.backend_name,
+            "precision": self.precision,
+            "input_size": self.input_size,
+            "num_workers": len(workers) or (1 if self.model is not None else 0),
+            "workers": workers
+        }
+
     def get_model_info(self) -> Dict[str, Any]:
         """
         Obtenir les informations du modèle
@@ -233,5 +569,9 @@ class MaizeDiseaseClassifier:
 
     def __del__(self):
         """Destructor pour fermer la connexion à la base de données"""
+        if getattr(self, 'batcher', None) is not None:
+            self.batcher.stop()
+        if isinstance(getattr(self, 'model', None), ModelWorkerPool):
+            self.model.close()
         if hasattr(self, 'db_manager'):
             self.db_manager.close()
\ No newline at end of file
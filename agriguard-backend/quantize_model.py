@@ -0,0 +1,207 @@
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+from export_model import IMAGE_EXTENSIONS, export_model
+from models.inference_backends import create_backend, resolve_model_path
+from utils.image_processing import preprocess_for_model
+
+
+def load_split(split_dir: str, class_names, limit: int = None, seed: int = 42):
+    """
+    Lister les images d'un split au format ultralytics (split/<classe>/<image>)
+
+    Returns:
+        Liste de tuples (chemin, id de classe du modèle)
+    """
+    class_ids = {name: i for i, name in enumerate(class_names)}
+    samples = []
+
+    for class_name in sorted(os.listdir(split_dir)):
+        class_dir = os.path.join(split_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        if class_name not in class_ids:
+            print(f"⚠️  Classe ignorée (absente du modèle): {class_name}")
+            continue
+
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(class_dir, name), class_ids[class_name]))
+
+    if limit and len(samples) > limit:
+        samples = random.Random(seed).sample(samples, limit)
+    return samples
+
+
+class ImageCalibrationReader:
+    """Lecteur de calibration pour la quantification statique ONNX Runtime"""
+
+    def __init__(self, input_name: str, samples, input_size: int, enhance: bool = True,
+                 batch_size: int = 8):
+        self.input_name = input_name
+        self.samples = samples
+        self.input_size = input_size
+        self.enhance = enhance
+        self.batch_size = batch_size
+        self._position = 0
+
+    def get_next(self):
+        while self._position < len(self.samples):
+            chunk = self.samples[self._position:self._position + self.batch_size]
+            self._position += self.batch_size
+
+            tensors = [preprocess_for_model(path, self.input_size, enhance=self.enhance) for path, _ in chunk]
+            tensors = [t for t in tensors if t is not None]
+            if tensors:
+                return {self.input_name: np.stack(tensors)}
+        return None
+
+    def rewind(self):
+        self._position = 0
+
+
+def quantize(fp32_path: str, int8_path: str, mode: str, calibration_samples=None,
+             input_size: int = 224, enhance: bool = True):
+    """
+    Quantifier le modèle ONNX en INT8
+
+    Args:
+        fp32_path: Modèle ONNX FP32 exporté
+        int8_path: Fichier de sortie
+        mode: dynamic (poids seulement) ou static (poids et activations, calibrés)
+        calibration_samples: Images de calibration (mode static)
+        input_size: Taille d'entrée du modèle
+        enhance: Appliquer le CLAHE comme en production
+    """
+    import onnx
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    if mode == "dynamic":
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, per_channel=True)
+    else:
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(
+            fp32_path, providers=["CPUExecutionProvider"]
+        ).get_inputs()[0].name
+
+        reader = ImageCalibrationReader(input_name, calibration_samples, input_size, enhance=enhance)
+        quantize_static(
+            fp32_path, int8_path, reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax
+        )
+
+    # Conserver les métadonnées de l'export (noms de classes, imgsz)
+    source = onnx.load(fp32_path)
+    quantized = onnx.load(int8_path)
+    existing = {prop.key for prop in quantized.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(quantized, int8_path)
+
+
+def evaluate(backend, samples, input_size: int, enhance: bool = True, batch_size: int = 16):
+    """Calculer les précisions top-1 et top-5 d'un moteur sur un split"""
+    top1 = top5 = total = 0
+
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        tensors, labels = [], []
+        for path, label in chunk:
+            tensor = preprocess_for_model(path, input_size, enhance=enhance)
+            if tensor is not None:
+                tensors.append(tensor)
+                labels.append(label)
+        if not tensors:
+            continue
+
+        scores = backend.predict(np.stack(tensors))
+        ranked = np.argsort(-scores, axis=1)[:, :5]
+        labels = np.asarray(labels)
+
+        top1 += int((ranked[:, 0] == labels).sum())
+        top5 += int((ranked == labels[:, None]).any(axis=1).sum())
+        total += len(labels)
+
+    if total == 0:
+        return {"top1": 0.0, "top5": 0.0, "images": 0}
+    return {"top1": top1 / total, "top5": top5 / total, "images": total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantification INT8 du classificateur avec contrôle de précision")
+    parser.add_argument("--weights", type=str, default="weights/best.pt", help="Poids YOLO entraînés (.pt)")
+    parser.add_argument("--mode", type=str, choices=["dynamic", "static"], default="static",
+                        help="Quantification dynamique (poids) ou statique (poids + activations)")
+    parser.add_argument("--calib-dir", type=str, default="dataset_split/val", help="Split de calibration")
+    parser.add_argument("--calib-size", type=int, default=256, help="Nombre d'images de calibration")
+    parser.add_argument("--test-dir", type=str, default="dataset_split/test", help="Split d'évaluation")
+    parser.add_argument("--max-top1-drop", type=float, default=1.0,
+                        help="Baisse maximale tolérée du top-1 (points de pourcentage)")
+    parser.add_argument("--max-top5-drop", type=float, default=0.5,
+                        help="Baisse maximale tolérée du top-5 (points de pourcentage)")
+    parser.add_argument("--no-clahe", action="store_true", help="Désactiver le CLAHE du prétraitement")
+
+    args = parser.parse_args()
+    enhance = not args.no_clahe
+
+    fp32_path = resolve_model_path(args.weights, "onnxruntime", "fp32")
+    int8_path = resolve_model_path(args.weights, "onnxruntime", "int8")
+    candidate_path = f"{int8_path}.candidate"
+
+    if not os.path.exists(fp32_path):
+        export_model(args.weights, "onnxruntime")
+
+    reference = create_backend("onnxruntime", fp32_path)
+    input_size = reference.input_size or 224
+
+    calibration = None
+    if args.mode == "static":
+        calibration = load_split(args.calib_dir, reference.class_names, limit=args.calib_size)
+        if not calibration:
+            print(f"❌ Aucune image de calibration dans {args.calib_dir}")
+            sys.exit(1)
+        print(f"🔧 Calibration sur {len(calibration)} images de {args.calib_dir}")
+
+    quantize(fp32_path, candidate_path, args.mode, calibration, input_size, enhance=enhance)
+
+    # Contrôle de non-régression sur le split de test
+    test_samples = load_split(args.test_dir, reference.class_names)
+    if not test_samples:
+        os.remove(candidate_path)
+        print(f"❌ Aucune image de test dans {args.test_dir}")
+        sys.exit(1)
+
+    candidate = create_backend("onnxruntime", candidate_path)
+    fp32_metrics = evaluate(reference, test_samples, input_size, enhance=enhance)
+    int8_metrics = evaluate(candidate, test_samples, input_size, enhance=enhance)
+
+    top1_drop = (fp32_metrics["top1"] - int8_metrics["top1"]) * 100
+    top5_drop = (fp32_metrics["top5"] - int8_metrics["top5"]) * 100
+
+    print(f"📊 FP32: top-1 {fp32_metrics['top1']:.2%}, top-5 {fp32_metrics['top5']:.2%} "
+          f"({fp32_metrics['images']} images)")
+    print(f"📊 INT8: top-1 {int8_metrics['top1']:.2%}, top-5 {int8_metrics['top5']:.2%} "
+          f"(baisse {top1_drop:.2f} / {top5_drop:.2f} points)")
+
+    if top1_drop > args.max_top1_drop or top5_drop > args.max_top5_drop:
+        os.remove(candidate_path)
+        print(f"❌ Régression de précision au-delà du seuil "
+              f"(top-1 ≤ {args.max_top1_drop}, top-5 ≤ {args.max_top5_drop}): modèle INT8 rejeté")
+        sys.exit(1)
+
+    os.replace(candidate_path, int8_path)
+    print(f"✅ Modèle INT8 validé: {int8_path} (INFERENCE_BACKEND=onnxruntime INFERENCE_PRECISION=int8)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Les tests importent models/ et utils/ comme app.py, depuis agriguard-backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+# tests/test_batch_inference_server.py
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from models.yolo_model_cls_db import BatchInferenceServer, MaizeDiseaseClassifier
+
+
+class GatedInference:
+    """infer_fn de test: enregistre les batchs, le premier peut être bloqué"""
+
+    def __init__(self, block_first=False):
+        self.batches = []
+        self.threads = set()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not block_first:
+            self.release.set()
+
+    def __call__(self, images):
+        first = not self.entered.is_set()
+        self.entered.set()
+        if first:
+            self.release.wait(5)
+        self.batches.append(list(images))
+        self.threads.add(threading.current_thread().name)
+        return [{"success": True, "image": image} for image in images]
+
+
+def test_requests_are_grouped_up_to_max_batch_size():
+    infer = GatedInference(block_first=True)
+    server = BatchInferenceServer(infer, max_batch_size=3, max_wait_ms=200)
+    futures = [server.submit(n) for n in range(3)]
+    assert infer.entered.wait(5)
+
+    # Requêtes arrivées pendant le premier passage: regroupées au suivant
+    futures += [server.submit(n) for n in range(3, 7)]
+    infer.release.set()
+
+    # Chaque appelant reçoit le résultat de sa propre image
+    assert [f.result(5)["image"] for f in futures] == list(range(7))
+    assert infer.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    server.stop()
+
+
+def test_stop_fails_requests_left_behind_the_stop_signal():
+    infer = GatedInference(block_first=True)
+    server = BatchInferenceServer(infer, max_batch_size=1)
+    first = server.submit("first")
+    assert infer.entered.wait(5)
+    queued = server.submit("queued")
+
+    stopper = threading.Thread(target=server.stop)
+    stopper.start()
+    while server._running:
+        pass
+    # Requête qui a passé le contrôle de submit() juste avant l'arrêt
+    late = Future()
+    server._queue.put(("late", late))
+
+    infer.release.set()
+    stopper.join(5)
+
+    assert first.result(5)["image"] == "first"
+    assert queued.result(5)["image"] == "queued"
+    with pytest.raises(RuntimeError):
+        late.result(0)
+    with pytest.raises(RuntimeError):
+        server.submit("after").result(0)
+
+
+def test_classify_batch_goes_through_the_batcher():
+    infer = GatedInference()
+    classifier = MaizeDiseaseClassifier.__new__(MaizeDiseaseClassifier)
+    classifier.model = object()
+    classifier.batcher = BatchInferenceServer(infer, max_batch_size=2, max_wait_ms=50)
+
+    results = classifier.classify_batch(["a", "b", "c"])
+
+    assert [r["image"] for r in results] == ["a", "b", "c"]
+    assert all(len(batch) <= 2 for batch in infer.batches)
+    # Passages du modèle exécutés par le thread du serveur, pas par la requête
+    assert infer.threads == {"batch-inference"}
+    classifier.batcher.stop()
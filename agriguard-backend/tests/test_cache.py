@@ -0,0 +1,81 @@
+# tests/test_cache.py
+import itertools
+
+import pytest
+
+import utils.cache as cache_module
+from utils.cache import MaterializedJSON, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+
+    clock[0] += 10
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    clock[0] += 50
+    assert cache.get("a", "expiré") == "expiré"
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_discard_where_and_pop(clock):
+    cache = TTLCache()
+    for n in range(5):
+        cache.set(n, {"user": "alice" if n % 2 else "bob"})
+
+    assert cache.discard_where(lambda value: value["user"] == "alice") == 2
+    assert cache.pop(0) == {"user": "bob"}
+    assert cache.pop(1, "absent") == "absent"
+    assert len(cache) == 2
+
+
+def test_materialized_json_rebuilds_only_on_new_version():
+    calls = itertools.count(1)
+    view = MaterializedJSON(lambda: {"build": next(calls)})
+
+    body, etag = view.get("v1")
+    assert view.get("v1") == (body, etag)
+    assert view.builds == 1
+
+    new_body, new_etag = view.get("v2")
+    assert view.builds == 2
+    assert new_body != body and new_etag != etag
+
+
+def test_volatile_keys_do_not_change_etag():
+    timestamps = itertools.count()
+
+    def build():
+        return {"total": 3, "generated_at": f"2024-05-01T10:00:{next(timestamps):02d}"}
+
+    first = MaterializedJSON(build, volatile_keys=("generated_at",))
+    # Même contenu reconstruit plus tard (redémarrage, autre instance)
+    second = MaterializedJSON(build, volatile_keys=("generated_at",))
+
+    first_body, first_etag = first.get("v1")
+    second_body, second_etag = second.get("v1")
+    assert first_body != second_body
+    assert first_etag == second_etag
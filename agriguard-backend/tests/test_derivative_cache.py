@@ -0,0 +1,42 @@
+# tests/test_derivative_cache.py
+import os
+
+import cv2
+import numpy as np
+
+from models.derivative_cache import ImageDerivativeCache
+
+
+def open_cache(tmp_path):
+    return ImageDerivativeCache(str(tmp_path / "images"), str(tmp_path / "cache"))
+
+
+def write_source(tmp_path, relative_path, data):
+    path = tmp_path / "images" / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_derivative_is_generated_once_then_served_from_cache(tmp_path):
+    image = np.full((600, 900, 3), 120, dtype=np.uint8)
+    write_source(tmp_path, "blobs/ab/cd/leaf.jpg", cv2.imencode(".jpg", image)[1].tobytes())
+    cache = open_cache(tmp_path)
+
+    first = cache.get("blobs/ab/cd/leaf.jpg", "thumbnail")
+    second = cache.get("blobs/ab/cd/leaf.jpg", "thumbnail")
+
+    assert first == second and os.path.exists(first)
+    assert max(cv2.imread(first).shape[:2]) == 200
+    assert cache.get_stats() == {"generated": 1, "served_from_cache": 1, "failures": 0}
+    assert cache._locks == {}
+
+
+def test_unreadable_original_does_not_leak_locks(tmp_path):
+    write_source(tmp_path, "2024-05-01/corrupt.jpg", b"pas une image")
+    cache = open_cache(tmp_path)
+
+    for image_format in ("jpeg", "webp"):
+        assert cache.get("2024-05-01/corrupt.jpg", "medium", image_format) is None
+
+    assert cache.get_stats()["failures"] == 2
+    assert cache._locks == {}
@@ -0,0 +1,149 @@
+# tests/test_disease_search_index.py
+import itertools
+import random
+
+from models.disease_search_index import DiseaseSearchIndex, FuzzyTermIndex
+from utils.text_processing import edit_distance, edit_distances, fold_text, tokenize
+
+DISEASES = {
+    "northern_leaf_blight": {
+        "name": "Helminthosporiose du nord",
+        "scientific_name": "Exserohilum turcicum",
+        "category": "disease",
+        "symptoms": ["Longues lésions nécrotiques sur les feuilles", "Taches grises en forme de cigare"],
+        "pathogens": ["Exserohilum turcicum"],
+        "description": "Maladie fongique des feuilles du maïs"
+    },
+    "common_rust": {
+        "name": "Rouille commune",
+        "scientific_name": "Puccinia sorghi",
+        "category": "disease",
+        "symptoms": ["Pustules brun-rouge sur les deux faces de la feuille"],
+        "pathogens": ["Puccinia sorghi"],
+        "description": "Maladie fongique favorisée par l'humidité"
+    },
+    "fall_armyworm": {
+        "name": "Chenille légionnaire d'automne",
+        "scientific_name": "Spodoptera frugiperda",
+        "category": "pest",
+        "symptoms": ["Feuilles perforées", "Excréments dans le cornet"],
+        "description": "Ravageur des jeunes plants"
+    },
+    "healthy": {
+        "name": "Plante saine",
+        "category": "healthy_state",
+        "description": "Aucun symptôme visible"
+    }
+}
+
+
+def make_index(diseases=DISEASES, version="v1"):
+    index = DiseaseSearchIndex()
+    index.sync(version, diseases)
+    return index
+
+
+def classes(results):
+    return [r["disease_class"] for r in results]
+
+
+def test_text_normalisation():
+    assert fold_text("Légionnaire Œuf") == "legionnaire oeuf"
+    assert tokenize("Les taches grises sur la feuille") == ["taches", "grises", "feuille"]
+    assert tokenize("de la", keep_stopwords=True) == ["de", "la"]
+
+
+def test_exact_terms_rank_the_matching_disease_first():
+    index = make_index()
+    assert classes(index.search("rouille"))[0] == "common_rust"
+    assert classes(index.search("turcicum cigare"))[0] == "northern_leaf_blight"
+    # Sans accents dans la requête
+    assert classes(index.search("lesions necrotiques"))[0] == "northern_leaf_blight"
+
+
+def test_name_outweighs_description():
+    index = make_index()
+    # "fongique" n'apparaît que dans les descriptions, "rouille" dans le nom
+    results = index.search("rouille fongique")
+    assert classes(results)[0] == "common_rust"
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_last_term_is_completed_as_prefix():
+    index = make_index()
+    assert classes(index.search("spodop"))[0] == "fall_armyworm"
+    assert classes(index.search("spodop", prefix=False)) == []
+
+
+def test_category_filter_and_limit():
+    index = make_index()
+    assert classes(index.search("feuilles", category="pest")) == ["fall_armyworm"]
+    assert len(index.search("feuilles", limit=1)) == 1
+
+
+def test_typos_are_corrected():
+    index = make_index()
+    corrections = {}
+    assert classes(index.search("rouile", corrections=corrections))[0] == "common_rust"
+    assert corrections == {"rouile": ["rouille"]}
+
+    # Transposition et pluriel
+    assert classes(index.search("pucicnia"))[0] == "common_rust"
+    assert classes(index.search("perforres", prefix=False)) == ["fall_armyworm"]
+    # "feuile" (distance 1 tolérée) retrouve aussi le pluriel "feuilles" (distance 2)
+    corrections = {}
+    index.search("feuile", prefix=False, corrections=corrections)
+    assert set(corrections["feuile"]) == {"feuille", "feuilles"}
+
+
+def test_short_terms_are_not_corrected():
+    assert FuzzyTermIndex.max_distance("mai") == 0
+    assert make_index().search("mai", prefix=False) == []
+
+
+def test_sync_reindexes_only_changed_documents():
+    index = make_index()
+    assert index.sync("v1", DISEASES) is False
+
+    updated = dict(DISEASES)
+    updated["common_rust"] = dict(DISEASES["common_rust"], name="Rouille commune du maïs tropical")
+    del updated["healthy"]
+    indexed_before = index.get_stats()["documents_indexed"]
+
+    assert index.sync("v2", updated) is True
+    stats = index.get_stats()
+    assert stats["documents_indexed"] == indexed_before + 1
+    assert stats["documents_removed"] == 1
+    assert stats["documents"] == 3
+    assert classes(index.search("tropical")) == ["common_rust"]
+    assert index.search("saine") == []
+
+
+def brute_force_osa(a, b):
+    """Distance d'édition avec transpositions adjacentes (matrice complète)"""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i, j in itertools.product(range(1, len(a) + 1), range(1, len(b) + 1)):
+        cost = 0 if a[i - 1] == b[j - 1] else 1
+        d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+        if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+            d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d
+
+
+def test_bounded_edit_distances_match_full_matrix():
+    rng = random.Random(0)
+    for _ in range(2000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+        max_distance = rng.randint(1, 2)
+        d = brute_force_osa(a, b)
+        limit = max_distance + 1
+
+        distance, prefix_distance = edit_distances(a, b, max_distance)
+        assert distance == min(d[len(a)][len(b)], limit)
+        assert prefix_distance == min(min(d[len(a)]), limit)
+        assert edit_distance(a, b, max_distance) == min(d[len(a)][len(b)], limit)
@@ -0,0 +1,103 @@
+# tests/test_image_blob_store.py
+import os
+
+from models.image_blob_store import ImageBlobStore
+from models.prediction_store import PredictionLogStore
+
+
+def open_stores(tmp_path, **kwargs):
+    log = PredictionLogStore(str(tmp_path / "predictions"), fsync=False)
+    blobs = ImageBlobStore(str(tmp_path / "images"), gc_grace_seconds=0,
+                           snapshot_path=str(tmp_path / "predictions" / "blob_refcounts.json"), **kwargs)
+    blobs.attach(log)
+    return log, blobs
+
+
+def store_image(blobs, data, filename="leaf.jpg"):
+    plan = blobs.plan(blobs.digest(data), filename)
+    blobs.write(plan["absolute_path"], data)
+    return plan
+
+
+def record(n, plan):
+    return {"prediction_id": f"p{n}", "timestamp": "2024-05-01T10:00:00", "image_path": plan["relative_path"]}
+
+
+def test_identical_content_is_written_once(tmp_path):
+    _, blobs = open_stores(tmp_path)
+    first = store_image(blobs, b"image-a", "a.jpg")
+    second = store_image(blobs, b"image-a", "b.jpg")
+
+    assert first["relative_path"] == second["relative_path"]
+    assert blobs.get_stats()["writes"] == 1
+    assert blobs.get_stats()["deduplicated_writes"] == 1
+
+
+def test_gc_keeps_referenced_blobs_and_collects_orphans(tmp_path):
+    log, blobs = open_stores(tmp_path)
+    kept = store_image(blobs, b"image-a")
+    orphan = store_image(blobs, b"image-b")
+    log.append(record(1, kept))
+
+    assert blobs.collect_garbage()["collected"] == 1
+    assert os.path.exists(kept["absolute_path"])
+    assert not os.path.exists(orphan["absolute_path"])
+
+
+def test_gc_keeps_blobs_referenced_by_another_process(tmp_path):
+    # Deux processus (rechargeur Werkzeug, workers WSGI) sur le même stockage
+    log_a, blobs_a = open_stores(tmp_path)
+    log_b, blobs_b = open_stores(tmp_path)
+    plan = store_image(blobs_b, b"image-b")
+    log_b.append(record(1, plan))
+
+    # Les références en mémoire de A ignorent l'ajout de B
+    assert blobs_a.refcount(plan["relative_path"]) == 0
+    assert blobs_a.collect_garbage()["collected"] == 0
+    assert os.path.exists(plan["absolute_path"])
+    log_a.close()
+    log_b.close()
+
+
+def test_refcounts_resume_from_snapshot(tmp_path, monkeypatch):
+    log, blobs = open_stores(tmp_path)
+    plan = store_image(blobs, b"image-a")
+    log.append_many([record(n, plan) for n in range(3)])
+    blobs.save_snapshot()
+    log.append(record(3, plan))
+    log.close()
+
+    replayed = []
+    original_on_record = ImageBlobStore._on_record
+
+    def counting_on_record(self, rec, location=None):
+        replayed.append(rec["prediction_id"])
+        original_on_record(self, rec, location)
+
+    monkeypatch.setattr(ImageBlobStore, "_on_record", counting_on_record)
+    log, blobs = open_stores(tmp_path)
+
+    # Seul l'enregistrement postérieur à la sauvegarde est rejoué
+    assert replayed == ["p3"]
+    assert blobs.refcount(plan["relative_path"]) == 4
+    log.close()
+
+
+def test_snapshot_ahead_of_log_triggers_full_recount(tmp_path):
+    log, blobs = open_stores(tmp_path)
+    plan = store_image(blobs, b"image-a")
+    log.append_many([record(n, plan) for n in range(2)])
+    blobs.save_snapshot()
+    segment_path = log._segment_path(log._segments[-1]["name"])
+    log.close()
+
+    # Journal remplacé par un journal plus court (restauration d'une sauvegarde)
+    with open(segment_path, "rb") as f:
+        first_line = f.readline()
+    with open(segment_path, "wb") as f:
+        f.write(first_line)
+    os.remove(os.path.join(os.path.dirname(segment_path), PredictionLogStore.INDEX_FILENAME))
+
+    log, blobs = open_stores(tmp_path)
+    assert blobs.refcount(plan["relative_path"]) == 1
+    log.close()
@@ -0,0 +1,111 @@
+# tests/test_inference_backends.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from models.inference_backends import OnnxRuntimeBackend, OpenVINOBackend, TorchBackend
+from models.yolo_model_cls_db import MaizeDiseaseClassifier
+
+CLASS_NAMES = ["healthy", "blight", "rust"]
+
+# Scores fixes (N, C) que chaque moteur doit restituer à l'identique
+SCORES = np.array([
+    [0.10, 0.70, 0.20],
+    [0.05, 0.15, 0.80],
+], dtype=np.float32)
+
+INPUT_SIZE = 8
+
+
+def score_batch(scores=SCORES):
+    """Batch (N, 3, H, W) dont la moyenne de chaque canal vaut le score de la classe"""
+    return np.repeat(scores[:, :, None, None], INPUT_SIZE, axis=2).repeat(INPUT_SIZE, axis=3)
+
+
+def make_classifier():
+    """Classificateur sans modèle ni base de données: seul _format_probs est utilisé"""
+    classifier = MaizeDiseaseClassifier.__new__(MaizeDiseaseClassifier)
+    classifier.class_names = CLASS_NAMES
+    classifier.db_manager = SimpleNamespace(get_disease_info=lambda disease_class: None, close=lambda: None)
+    return classifier
+
+
+def formatted(scores):
+    """Résultats de _format_probs sans l'horodatage"""
+    results = make_classifier()._format_probs(scores)
+    for result in results:
+        result.pop("timestamp")
+    return results
+
+
+def write_mean_model(path):
+    """Modèle ONNX (N, 3, H, W) -> (N, 3): moyenne de chaque canal"""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("GlobalAveragePool", ["images"], ["pooled"]),
+         helper.make_node("Flatten", ["pooled"], ["output0"], axis=1)],
+        "mean_scores",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["N", 3, INPUT_SIZE, INPUT_SIZE])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["N", 3])]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    # Métadonnées au format de l'export ultralytics
+    helper.set_model_props(model, {
+        "names": repr(dict(enumerate(CLASS_NAMES))),
+        "imgsz": repr([INPUT_SIZE, INPUT_SIZE])
+    })
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def assert_same_output(backend):
+    output = backend.predict(score_batch())
+    assert output.shape == SCORES.shape
+    np.testing.assert_allclose(output, SCORES, rtol=0, atol=1e-6)
+    assert formatted(output) == formatted(SCORES)
+
+
+def test_format_probs_reference():
+    results = formatted(SCORES)
+    assert [r["classification"]["predicted_class"] for r in results] == ["blight", "rust"]
+    assert results[0]["classification"]["confidence"] == 0.7
+    assert [p["class"] for p in results[1]["classification"]["top5_predictions"]] == ["rust", "blight", "healthy"]
+
+
+def test_torch_backend_output():
+    torch = pytest.importorskip("torch")
+
+    backend = TorchBackend.__new__(TorchBackend)
+    backend._torch = torch
+    # Résultats ultralytics simulés: une probabilité par image (results[i].probs.data)
+    backend.model = lambda batch, verbose=False: [
+        SimpleNamespace(probs=SimpleNamespace(data=image.mean(dim=(1, 2)))) for image in batch
+    ]
+    assert_same_output(backend)
+
+
+def test_onnxruntime_backend_output(tmp_path):
+    pytest.importorskip("onnxruntime")
+    backend = OnnxRuntimeBackend(write_mean_model(tmp_path / "best.onnx"))
+
+    assert backend.class_names == CLASS_NAMES
+    assert backend.input_size == INPUT_SIZE
+    assert_same_output(backend)
+
+
+def test_openvino_backend_output(tmp_path):
+    pytest.importorskip("openvino")
+    yaml = pytest.importorskip("yaml")
+
+    model_path = write_mean_model(tmp_path / "best.onnx")
+    with open(tmp_path / "metadata.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump({"names": dict(enumerate(CLASS_NAMES)), "imgsz": [INPUT_SIZE, INPUT_SIZE]}, f)
+
+    backend = OpenVINOBackend(model_path)
+    assert backend.class_names == CLASS_NAMES
+    assert backend.input_size == INPUT_SIZE
+    assert_same_output(backend)
@@ -0,0 +1,124 @@
+# tests/test_near_duplicate_index.py
+import cv2
+import numpy as np
+import pytest
+
+import models.near_duplicate_index as near_duplicate_module
+from models.near_duplicate_index import BKTree, NearDuplicateIndex
+from utils.image_processing import hamming_distance, preprocess_for_model
+
+# Valeur par défaut de NEAR_DUPLICATE_MAX_DISTANCE (app.py)
+MAX_DISTANCE = 8
+
+
+def leaf_photo(seed, size=(480, 640)):
+    """Image RGB texturée reproductible (taches sur un dégradé), comme une photo de feuille"""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    gradient = np.linspace(60, 200, w, dtype=np.float32)[None, :, None]
+    image = np.broadcast_to(gradient, (h, w, 3)).copy()
+    for _ in range(25):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.circle(image, center, int(rng.integers(15, 80)), color, -1)
+    return cv2.GaussianBlur(image, (9, 9), 0).clip(0, 255).astype(np.uint8)
+
+
+def encode_jpeg(image, quality=95, scale=1.0):
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                            [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return data.tobytes()
+
+
+def dhash_of(image_bytes):
+    _, image_hash = preprocess_for_model(image_bytes, 224, enhance=False, with_hash=True)
+    assert image_hash is not None
+    return image_hash
+
+
+@pytest.mark.parametrize("quality,scale", [(70, 1.0), (85, 0.5), (60, 0.35)])
+def test_dhash_survives_reencode_and_resize(quality, scale):
+    photo = leaf_photo(1)
+    original = dhash_of(encode_jpeg(photo))
+    assert hamming_distance(original, dhash_of(encode_jpeg(photo, quality, scale))) <= MAX_DISTANCE
+
+
+def test_dhash_separates_different_images():
+    assert hamming_distance(dhash_of(encode_jpeg(leaf_photo(1))),
+                            dhash_of(encode_jpeg(leaf_photo(2)))) > MAX_DISTANCE
+
+
+def test_bktree_search_matches_linear_scan():
+    rng = np.random.default_rng(0)
+    hashes = [int(h) for h in rng.integers(0, 2 ** 63, 300, dtype=np.int64)]
+    tree = BKTree()
+    for i, image_hash in enumerate(hashes):
+        tree.add(image_hash, i)
+
+    for query in hashes[:20] + [hashes[5] ^ 0b1011, hashes[9] ^ (0xFF << 20)]:
+        expected = sorted((hamming_distance(query, h), i) for i, h in enumerate(hashes)
+                          if hamming_distance(query, h) <= MAX_DISTANCE)
+        assert sorted(tree.search(query, MAX_DISTANCE)) == expected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(near_duplicate_module.time, "monotonic", fake)
+    return fake
+
+
+def test_find_is_per_user_and_returns_closest(clock):
+    index = NearDuplicateIndex(max_distance=MAX_DISTANCE)
+    index.add("alice", 0b1111, "p1", {"predicted_class": "rust"})
+    index.add("alice", 0b1, "p2", {"predicted_class": "blight"})
+
+    match = index.find("alice", 0b11)
+    assert match["prediction_id"] == "p2" and match["distance"] == 1
+    assert index.find("bob", 0b11) is None
+    assert index.find("alice", (1 << 40) - 1) is None
+
+
+def test_entries_expire_after_window(clock):
+    index = NearDuplicateIndex(max_distance=MAX_DISTANCE, window_seconds=60)
+    index.add("alice", 0xABCD, "p1", {"predicted_class": "rust"})
+
+    clock.now += 59
+    assert index.find("alice", 0xABCD)["prediction_id"] == "p1"
+    clock.now += 2
+    assert index.find("alice", 0xABCD) is None
+
+
+def test_per_user_bound_evicts_oldest_entries(clock):
+    index = NearDuplicateIndex(max_distance=0, max_entries_per_user=4)
+    for n in range(5):
+        index.add("alice", 1 << n, f"p{n}", {"predicted_class": "rust"})
+        clock.now += 1
+
+    # Au-delà de 4 entrées, seule la moitié la plus récente est conservée
+    assert index.get_stats()["indexed_images"] == 2
+    assert index.find("alice", 1 << 0) is None
+    assert index.find("alice", 1 << 4)["prediction_id"] == "p4"
+
+
+def test_clusters_group_reused_results(clock):
+    index = NearDuplicateIndex(max_distance=MAX_DISTANCE)
+    index.add("alice", 0xF0, "p1", {"predicted_class": "rust"})
+    match = index.find("alice", 0xF1)
+    index.add("alice", 0xF1, "p2", match["classification"], match["cluster_id"])
+
+    stats = index.get_stats()
+    assert stats["duplicate_clusters"] == 1
+    assert stats["largest_clusters"][0]["cluster_id"] == "p1"
+    assert stats["largest_clusters"][0]["size"] == 2
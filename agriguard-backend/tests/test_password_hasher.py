@@ -0,0 +1,84 @@
+# tests/test_password_hasher.py
+import threading
+
+import bcrypt
+import pytest
+
+from utils.password_hasher import PasswordHasher, PasswordHasherBusy
+
+# Facteur de coût minimal de bcrypt: tests rapides
+ROUNDS = 4
+
+
+def hash_with(rounds, password="secret"):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def occupy_worker(hasher):
+    """Bloquer un worker du pool jusqu'à ce que l'événement retourné soit levé"""
+    release = threading.Event()
+    hasher._submit("hashes", release.wait, 5)
+    return release
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=ROUNDS)
+    hashed = hasher.hash("secret")
+
+    assert hasher.verify("secret", hashed)
+    assert not hasher.verify("autre", hashed)
+    hasher.shutdown()
+
+
+def test_needs_rehash_compares_cost_factor():
+    hasher = PasswordHasher(rounds=ROUNDS)
+
+    assert not hasher.needs_rehash(hash_with(ROUNDS))
+    assert hasher.needs_rehash(hash_with(ROUNDS + 1))
+    # Hachage illisible: pas de recalcul
+    assert not hasher.needs_rehash("pas-un-hachage")
+    hasher.shutdown()
+
+
+def test_requests_are_rejected_when_all_slots_are_taken():
+    hasher = PasswordHasher(rounds=ROUNDS, max_workers=1, max_queue=0, queue_timeout=0.05)
+    release = occupy_worker(hasher)
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("secret")
+    # Recalcul facultatif: abandonné sans attendre
+    assert hasher.rehash_if_needed("secret", hash_with(ROUNDS + 1), lambda new_hash: None) is False
+    assert hasher.get_stats()["rejected"] == 2
+
+    release.set()
+    hasher.shutdown()
+
+
+def test_result_wait_is_bounded_and_frees_the_queued_slot():
+    hasher = PasswordHasher(rounds=ROUNDS, max_workers=1, max_queue=1, result_timeout=0.05)
+    release = occupy_worker(hasher)
+
+    # Admis dans la file, mais le worker reste occupé
+    with pytest.raises(PasswordHasherBusy):
+        hasher.verify("secret", hash_with(ROUNDS))
+
+    stats = hasher.get_stats()
+    assert stats["timeouts"] == 1
+    assert stats["queued"] == 0
+    release.set()
+    assert hasher.verify("secret", hash_with(ROUNDS))
+    hasher.shutdown()
+
+
+def test_rehash_callback_receives_new_hash_before_shutdown_returns():
+    hasher = PasswordHasher(rounds=ROUNDS)
+    stored = []
+
+    assert hasher.rehash_if_needed("secret", hash_with(ROUNDS + 1), stored.append) is True
+    assert hasher.rehash_if_needed("secret", hash_with(ROUNDS), stored.append) is False
+    hasher.shutdown()
+
+    assert len(stored) == 1
+    assert not hasher.needs_rehash(stored[0])
+    assert bcrypt.checkpw(b"secret", stored[0].encode("utf-8"))
+    assert hasher.get_stats()["rehashes"] == 1
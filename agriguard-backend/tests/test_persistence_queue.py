@@ -0,0 +1,132 @@
+# tests/test_persistence_queue.py
+import threading
+from types import SimpleNamespace
+
+from models.persistence_queue import PersistenceQueue
+
+
+class FakeLogStore:
+    """Journal en mémoire; le premier lot peut être bloqué pour remplir la file"""
+
+    def __init__(self, block_first=False):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not block_first:
+            self.release.set()
+
+    def append_many(self, records):
+        first = not self.entered.is_set()
+        self.entered.set()
+        if first:
+            self.release.wait(5)
+        self.batches.append([r["prediction_id"] for r in records])
+
+    @property
+    def records(self):
+        return [prediction_id for batch in self.batches for prediction_id in batch]
+
+
+class FakePredictions:
+    def __init__(self):
+        self.calls = []
+
+    def insert_many(self, documents, ordered=True):
+        self.calls.append([d["prediction_id"] for d in documents])
+
+
+def fake_db_manager():
+    return SimpleNamespace(use_mongodb=True, db=SimpleNamespace(predictions=FakePredictions()))
+
+
+class FakeImageStore:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.written = []
+
+    def write(self, target, data):
+        if target in self.failing:
+            raise OSError("disque plein")
+        self.written.append(target)
+        return True
+
+
+def record(n):
+    return {"prediction_id": f"p{n}", "metadata": {"image_saved": False}}
+
+
+def test_batches_are_bounded_and_inserted_once():
+    store, db_manager = FakeLogStore(), fake_db_manager()
+    # Attente longue: les lots ne sont fermés que par leur taille ou par l'arrêt
+    persistence = PersistenceQueue(store, db_manager, max_batch_size=2, flush_interval=5)
+    for n in range(5):
+        assert persistence.submit(record(n)) is True
+    persistence.shutdown()
+
+    assert store.batches == [["p0", "p1"], ["p2", "p3"], ["p4"]]
+    # Un seul insert_many par lot, avec les mêmes enregistrements
+    assert db_manager.db.predictions.calls == store.batches
+    assert persistence.get_metrics()["batches"] == 3
+    assert persistence.get_metrics()["persisted"] == 5
+
+
+def test_shutdown_writes_everything_still_queued():
+    store = FakeLogStore(block_first=True)
+    persistence = PersistenceQueue(store, fake_db_manager(), max_batch_size=1)
+    persistence.submit(record(0))
+    assert store.entered.wait(5)
+    for n in range(1, 4):
+        persistence.submit(record(n))
+
+    # Le thread d'écriture est bloqué: l'arrêt écrit lui-même les éléments restants
+    persistence.shutdown(timeout=0.1)
+    assert store.records == ["p1", "p2", "p3"]
+
+    store.release.set()
+    persistence._thread.join(5)
+    assert not persistence._thread.is_alive()
+    assert sorted(store.records) == ["p0", "p1", "p2", "p3"]
+    assert persistence.get_metrics()["persisted"] == 4
+
+
+def test_full_queue_falls_back_to_synchronous_write():
+    store = FakeLogStore(block_first=True)
+    persistence = PersistenceQueue(store, fake_db_manager(), max_queue_size=1,
+                                   max_batch_size=1, enqueue_timeout=0.01)
+    assert persistence.submit(record(0)) is True
+    assert store.entered.wait(5)
+    assert persistence.submit(record(1)) is True
+
+    # File pleine: écriture dans le thread appelant
+    assert persistence.submit(record(2)) is False
+    assert store.records == ["p2"]
+    assert persistence.get_metrics()["synchronous_fallbacks"] == 1
+
+    store.release.set()
+    persistence.shutdown()
+    assert sorted(store.records) == ["p0", "p1", "p2"]
+
+
+def test_image_failures_mark_record_unsaved():
+    image_store = FakeImageStore(failing={"/blobs/bad.jpg"})
+    persistence = PersistenceQueue(FakeLogStore(), fake_db_manager(), image_store=image_store)
+    good, bad = record(0), record(1)
+    persistence.submit(good, image_data=b"ok", image_target="/blobs/good.jpg")
+    persistence.submit(bad, image_data=b"ko", image_target="/blobs/bad.jpg")
+    persistence.shutdown()
+
+    assert good["metadata"]["image_saved"] is True
+    assert bad["metadata"]["image_saved"] is False
+    assert image_store.written == ["/blobs/good.jpg"]
+    assert persistence.get_metrics()["image_failures"] == 1
+
+
+def test_images_written_directly_without_image_store(tmp_path):
+    target = tmp_path / "2024-05-01" / "leaf.jpg"
+    rec = record(0)
+    persistence = PersistenceQueue(FakeLogStore(), fake_db_manager())
+    persistence.submit(rec, image_data=b"image", image_target=str(target))
+    persistence.shutdown()
+
+    assert target.read_bytes() == b"image"
+    assert rec["metadata"]["image_saved"] is True
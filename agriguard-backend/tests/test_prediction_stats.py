@@ -0,0 +1,84 @@
+# tests/test_prediction_stats.py
+import json
+
+import pytest
+
+from models.prediction_stats import PredictionStatsAggregator
+from models.prediction_store import PredictionLogStore
+
+BUCKETS = ("high", "low")
+
+
+def bucket(confidence):
+    return "high" if confidence >= 0.5 else "low"
+
+
+def record(n, predicted_class="rust", confidence=0.9, date="2024-05-01"):
+    return {
+        "prediction_id": f"p{n}",
+        "timestamp": f"{date}T10:00:00",
+        "classification": {"predicted_class": predicted_class, "confidence": confidence}
+    }
+
+
+def open_stats(tmp_path, **kwargs):
+    log = PredictionLogStore(str(tmp_path / "predictions"), fsync=False)
+    stats = PredictionStatsAggregator(str(tmp_path / "predictions" / "stats_snapshot.json"),
+                                      bucket_fn=bucket, buckets=BUCKETS, **kwargs)
+    stats.attach(log)
+    return log, stats
+
+
+def test_distribution_uses_bucket_fn_keys(tmp_path):
+    log, stats = open_stats(tmp_path)
+    assert stats.as_dict()["confidence_distribution"] == {"high": 0, "low": 0}
+
+    log.append(record(1, confidence=0.2))
+    assert stats.as_dict()["confidence_distribution"] == {"high": 0, "low": 1}
+    log.close()
+
+
+def test_totals_resume_from_snapshot(tmp_path, monkeypatch):
+    log, stats = open_stats(tmp_path)
+    log.append_many([record(1), record(2, "blight", 0.3)])
+    stats.save_snapshot()
+    log.append(record(3, date="2024-05-02"))
+    log.close()
+
+    replayed = []
+    original_update = PredictionStatsAggregator.update
+
+    def counting_update(self, rec, location=None):
+        replayed.append(rec["prediction_id"])
+        original_update(self, rec, location)
+
+    monkeypatch.setattr(PredictionStatsAggregator, "update", counting_update)
+    log, stats = open_stats(tmp_path)
+
+    # Seul l'enregistrement postérieur à la sauvegarde est rejoué
+    assert replayed == ["p3"]
+    result = stats.as_dict()
+    assert result["total_predictions"] == 3
+    assert result["predictions_by_class"] == {"rust": 2, "blight": 1}
+    assert result["predictions_by_date"] == {"2024-05-01": 2, "2024-05-02": 1}
+    assert result["confidence_distribution"] == {"high": 2, "low": 1}
+    assert result["average_confidence"] == pytest.approx(0.7)
+    log.close()
+
+
+def test_legacy_empty_buckets_are_dropped(tmp_path):
+    log, stats = open_stats(tmp_path)
+    log.append(record(1))
+    stats.save_snapshot()
+    log.close()
+
+    # Sauvegarde écrite avec les anciens libellés de tranches, tous à zéro
+    with open(stats.snapshot_path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    snapshot["confidence_distribution"].update({"très_élevé": 0, "faible": 0})
+    with open(stats.snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+    log, stats = open_stats(tmp_path)
+    assert stats.as_dict()["confidence_distribution"] == {"high": 1, "low": 0}
+    log.close()
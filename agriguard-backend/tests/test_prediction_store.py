@@ -0,0 +1,202 @@
+# tests/test_prediction_store.py
+import json
+import os
+
+from models.prediction_store import PredictionLogStore
+
+
+def make_record(n, day="2024-05-01", user_id="u1"):
+    return {
+        "prediction_id": f"p{n}",
+        "timestamp": f"{day}T10:00:{n % 60:02d}",
+        "user_id": user_id,
+        "classification": {"disease_class": "healthy", "confidence": 0.9}
+    }
+
+
+def open_store(tmp_path, **kwargs):
+    kwargs.setdefault("fsync", False)
+    return PredictionLogStore(str(tmp_path), **kwargs)
+
+
+def test_append_and_reopen_keeps_records_in_order(tmp_path):
+    store = open_store(tmp_path, max_segment_records=3)
+    store.append_many([make_record(i) for i in range(7)])
+    store.close()
+
+    store = open_store(tmp_path, max_segment_records=3)
+    assert store.total_records == 7
+    assert [r["prediction_id"] for r in store.iter_records()] == [f"p{i}" for i in range(7)]
+    assert len(store._segments) == 3
+    store.close()
+
+
+def test_incomplete_last_line_is_truncated_on_open(tmp_path):
+    store = open_store(tmp_path)
+    store.append(make_record(1))
+    store.append(make_record(2))
+    segment_path = store._segment_path(store._segments[-1]["name"])
+    store.close()
+
+    # Écriture interrompue au milieu d'une ligne
+    with open(segment_path, "ab") as f:
+        f.write(b'{"prediction_id": "p3", "timest')
+
+    store = open_store(tmp_path)
+    assert store.total_records == 2
+    assert [r["prediction_id"] for r in store.iter_records()] == ["p1", "p2"]
+    with open(segment_path, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+    # Le journal reste utilisable après la troncature
+    store.append(make_record(3))
+    assert store.get("p3")["prediction_id"] == "p3"
+    store.close()
+
+
+def test_get_uses_id_index_and_rebuilds_it_when_missing(tmp_path):
+    store = open_store(tmp_path, max_segment_records=2)
+    store.append_many([make_record(i) for i in range(5)])
+    ids_path = store.ids_path
+    store.close()
+
+    os.remove(ids_path)
+
+    store = open_store(tmp_path, max_segment_records=2)
+    assert os.path.exists(ids_path)
+    for i in range(5):
+        assert store.get(f"p{i}")["prediction_id"] == f"p{i}"
+    assert store.get("inconnu") is None
+    store.close()
+
+
+def test_id_index_catches_up_with_records_written_after_it(tmp_path):
+    store = open_store(tmp_path)
+    store.append(make_record(1))
+    segment_path = store._segment_path(store._segments[-1]["name"])
+    store.close()
+
+    # Enregistrement présent dans le segment mais absent de ids.idx et de index.json
+    with open(segment_path, "ab") as f:
+        f.write(PredictionLogStore._encode(make_record(2)))
+
+    store = open_store(tmp_path)
+    assert store.total_records == 2
+    assert store.get("p2")["prediction_id"] == "p2"
+    store.close()
+
+
+def test_query_counts_and_pages_by_date(tmp_path):
+    store = open_store(tmp_path, max_segment_records=2)
+    store.append_many([make_record(i, day="2024-05-01") for i in range(3)])
+    store.append_many([make_record(i, day="2024-05-02") for i in range(3, 5)])
+
+    total, page = store.query(date="2024-05-01", offset=1, limit=5)
+    assert total == 3
+    assert [r["prediction_id"] for r in page] == ["p1", "p0"]
+    assert store.count(date="2024-05-02") == 2
+    store.close()
+
+
+def collect_pages(store, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page, cursor = store.page(cursor=cursor, limit=3, **kwargs)
+        pages.append([r["prediction_id"] for r in page])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_the_log_once(tmp_path):
+    store = open_store(tmp_path, max_segment_records=4)
+    store.append_many([make_record(i) for i in range(10)])
+
+    pages = collect_pages(store)
+    assert [p for page in pages for p in page] == [f"p{i}" for i in reversed(range(10))]
+    assert collect_pages(store, newest_first=False)[0] == ["p0", "p1", "p2"]
+    store.close()
+
+
+def test_cursor_is_stable_under_concurrent_appends(tmp_path):
+    store = open_store(tmp_path, max_segment_records=4)
+    store.append_many([make_record(i) for i in range(6)])
+
+    first, cursor = store.page(limit=3)
+    # Nouvelles prédictions entre deux pages: la page suivante n'est pas décalée
+    store.append_many([make_record(i) for i in range(6, 9)])
+    second, _ = store.page(cursor=cursor, limit=3)
+
+    assert [r["prediction_id"] for r in first] == ["p5", "p4", "p3"]
+    assert [r["prediction_id"] for r in second] == ["p2", "p1", "p0"]
+    store.close()
+
+
+def test_invalid_cursor_is_rejected(tmp_path):
+    store = open_store(tmp_path)
+    store.append(make_record(1))
+    for cursor in ("pas-un-curseur", PredictionLogStore.encode_cursor("segment_999999.jsonl", 0)):
+        try:
+            store.page(cursor=cursor)
+        except ValueError:
+            continue
+        raise AssertionError(f"Curseur accepté: {cursor}")
+    store.close()
+
+
+def test_user_filter_counts_and_pages(tmp_path):
+    store = open_store(tmp_path, max_segment_records=3)
+    store.append_many([make_record(i, day="2024-05-01", user_id="alice" if i % 2 else "bob")
+                       for i in range(6)])
+    store.append_many([make_record(i, day="2024-05-02", user_id="alice") for i in range(6, 8)])
+
+    assert store.count(user_id="alice") == 5
+    assert store.count(date="2024-05-01", user_id="alice") == 3
+    assert store.count(user_id="carol") == 0
+
+    assert [p for page in collect_pages(store, user_id="alice") for p in page] == ["p7", "p6", "p5", "p3", "p1"]
+
+    total, page = store.query(date="2024-05-01", user_id="alice", offset=1, limit=5, newest_first=False)
+    assert total == 3
+    assert [r["prediction_id"] for r in page] == ["p3", "p5"]
+
+    total, page = store.query(user_id="alice", offset=2, limit=2)
+    assert total == 5
+    assert [r["prediction_id"] for r in page] == ["p5", "p3"]
+    store.close()
+
+
+def test_date_and_user_count_does_not_read_segments(tmp_path, monkeypatch):
+    store = open_store(tmp_path, max_segment_records=2)
+    store.append_many([make_record(i, day=f"2024-05-0{1 + i % 2}", user_id="alice" if i < 4 else "bob")
+                       for i in range(6)])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("segment relu")
+
+    # Compté à chaque page de l'historique: métadonnées seules
+    monkeypatch.setattr(store, "_iter_segment_lines", fail)
+    assert store.count(date="2024-05-01", user_id="alice") == 2
+    assert store.count(date="2024-05-02", user_id="bob") == 1
+    assert store.count(date="2024-05-03", user_id="alice") == 0
+    store.close()
+
+
+def test_user_counts_are_rebuilt_from_older_index(tmp_path):
+    store = open_store(tmp_path)
+    store.append_many([make_record(i, user_id="alice") for i in range(3)])
+    index_path = store.index_path
+    store.close()
+
+    # Index écrit avant l'ajout des compteurs par utilisateur
+    with open(index_path, encoding="utf-8") as f:
+        index = json.load(f)
+    for meta in index["segments"]:
+        del meta["users"]
+        del meta["user_dates"]
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    store = open_store(tmp_path)
+    assert store.total_records == 3
+    assert store.count(user_id="alice") == 3
+    store.close()
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from utils import serialization
+
+
+class TTLCache:
+    """
+    Cache LRU borné avec expiration (TTL), utilisable depuis plusieurs threads
+
+    Les entrées les moins récemment utilisées sont évincées au-delà de max_entries,
+    et une entrée plus ancienne que ttl secondes n'est plus retournée.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0):
+        """
+        Args:
+            max_entries (int): Nombre maximal d'entrées conservées
+            ttl (float): Durée de vie d'une entrée en secondes
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Retourner la valeur associée à key si elle existe et n'a pas expiré"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Ajouter ou remplacer une entrée"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Retirer une entrée"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def discard_where(self, predicate):
+        """Retirer toutes les entrées dont la valeur vérifie predicate(value)"""
+        with self._lock:
+            keys = [key for key, (_, value) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Statistiques d'utilisation du cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class MaterializedJSON:
+    """
+    Réponse JSON calculée une fois puis conservée sérialisée (octets + ETag)
+    tant que la version de ses données sources ne change pas
+    """
+
+    def __init__(self, build_fn, serialize_fn=None, volatile_keys=()):
+        """
+        Args:
+            build_fn (callable): Construit le contenu (dict/list) de la réponse
+            serialize_fn (callable): Sérialise le contenu en octets (serialization.dumps par défaut)
+            volatile_keys (tuple): Clés du contenu exclues de l'ETag (ex: date de génération),
+                pour qu'un même contenu ait le même ETag après un redémarrage ou sur une autre instance
+        """
+        self.build_fn = build_fn
+        self.serialize_fn = serialize_fn or serialization.dumps
+        self.volatile_keys = tuple(volatile_keys)
+        self._lock = threading.Lock()
+        self._version = None
+        self._body = None
+        self._etag = None
+        self.builds = 0
+
+    def get(self, version):
+        """
+        Retourner (octets, etag) pour la version donnée, reconstruits si elle a changé
+        """
+        with self._lock:
+            if self._body is None or version != self._version:
+                content = self.build_fn()
+                body = self.serialize_fn(content)
+                stable = body
+                if self.volatile_keys and isinstance(content, dict):
+                    stable = self.serialize_fn({k: v for k, v in content.items()
+                                                if k not in self.volatile_keys})
+                self._etag = hashlib.sha256(stable).hexdigest()[:32]
+                self._body, self._version = body, version
+                self.builds += 1
+            return self._body, self._etag
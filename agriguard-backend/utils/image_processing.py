@@ -1,28 +1,70 @@
 import cv2
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
 import os
 
-def process_image(image_path, target_size=(640, 640)):
+def decode_image(image_bytes):
+    """
+    Décode une image encodée (JPEG, PNG...) directement depuis la mémoire
+
+    Args:
+        image_bytes (bytes): Contenu du fichier image
+
+    Returns:
+        numpy.ndarray: Image RGB ou None si le décodage échoue
+    """
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    if image is None:
+        return None
+
+    # Convertir BGR vers RGB (OpenCV décode en BGR par défaut)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def load_image(image_source):
+    """
+    Charge une image RGB depuis un chemin, un contenu encodé ou un array
+
+    Args:
+        image_source (str | bytes | numpy.ndarray): Chemin vers l'image, contenu
+            du fichier (bytes) ou image RGB déjà décodée
+
+    Returns:
+        numpy.ndarray: Image RGB ou None si le chargement échoue
+    """
+    if isinstance(image_source, np.ndarray):
+        return image_source
+
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        return decode_image(image_source)
+
+    # Charger l'image avec OpenCV
+    image = cv2.imread(image_source)
+    if image is None:
+        return None
+
+    # Convertir BGR vers RGB (OpenCV charge en BGR par défaut)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def process_image(image_source, target_size=(640, 640)):
     """
     Traite l'image pour la détection YOLO
 
     Args:
-        image_path (str): Chemin vers l'image
+        image_source (str | bytes | numpy.ndarray): Chemin vers l'image, contenu
+            du fichier uploadé ou image RGB déjà décodée
         target_size (tuple): Taille cible (largeur, hauteur)
 
     Returns:
         numpy.ndarray: Image traitée
     """
     try:
-        # Charger l'image avec OpenCV
-        image = cv2.imread(image_path)
+        image = load_image(image_source)
 
         if image is None:
-            raise ValueError(f"Impossible de charger l'image: {image_path}")
-
-        # Convertir BGR vers RGB (OpenCV charge en BGR par défaut)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            source = image_source if isinstance(image_source, str) else "données en mémoire"
+            raise ValueError(f"Impossible de charger l'image: {source}")
 
         # Redimensionner tout en gardant le ratio d'aspect
         image = resize_with_padding(image, target_size)
@@ -36,6 +78,83 @@ def process_image(image_path, target_size=(640, 640)):
         print(f"Erreur traitement image: {e}")
         return None
 
+def preprocess_for_model(image_source, input_size=224, enhance=True, with_hash=False):
+    """
+    Prépare une image pour le modèle de classification en un seul passage:
+    recadrage central carré, redimensionnement direct à la taille du modèle,
+    CLAHE optionnel puis conversion HWC -> CHW float32 normalisée dans [0, 1]
+
+    Le résultat correspond à ce que produisent les transformations de
+    classification d'ultralytics et peut être passé directement au modèle.
+
+    Args:
+        image_source (str | bytes | numpy.ndarray): Chemin vers l'image, contenu
+            du fichier uploadé ou image RGB déjà décodée
+        input_size (int): Taille d'entrée du modèle (imgsz)
+        enhance (bool): Appliquer l'amélioration de contraste (CLAHE)
+        with_hash (bool): Retourner aussi le dHash de l'image (avant CLAHE)
+
+    Returns:
+        numpy.ndarray: Tenseur (3, input_size, input_size) ou None en cas d'erreur.
+            Avec with_hash, tuple (tenseur, dhash) ou (None, None).
+    """
+    try:
+        image = load_image(image_source)
+
+        if image is None:
+            source = image_source if isinstance(image_source, str) else "données en mémoire"
+            raise ValueError(f"Impossible de charger l'image: {source}")
+
+        # Recadrage central sur le plus petit côté (équivalent à resize + center crop)
+        h, w = image.shape[:2]
+        side = min(h, w)
+        y_offset = (h - side) // 2
+        x_offset = (w - side) // 2
+        image = image[y_offset:y_offset + side, x_offset:x_offset + side]
+
+        # Un seul redimensionnement, directement à la taille du modèle
+        interpolation = cv2.INTER_AREA if side > input_size else cv2.INTER_LINEAR
+        image = cv2.resize(image, (input_size, input_size), interpolation=interpolation)
+
+        # Empreinte perceptuelle calculée sur l'image déjà réduite
+        image_hash = compute_dhash(image) if with_hash else None
+
+        # Amélioration sur l'image réduite (moins de pixels à traiter)
+        if enhance:
+            image = enhance_image(image)
+
+        # HWC uint8 -> CHW float32 dans [0, 1]
+        tensor = np.ascontiguousarray(image.transpose(2, 0, 1), dtype=np.float32)
+        tensor *= 1.0 / 255.0
+
+        return (tensor, image_hash) if with_hash else tensor
+
+    except Exception as e:
+        print(f"Erreur traitement image: {e}")
+        return (None, None) if with_hash else None
+
+def compute_dhash(image, hash_size=8):
+    """
+    Calcule le hash de différence (dHash) d'une image
+
+    Args:
+        image (numpy.ndarray): Image RGB
+        hash_size (int): Côté de la grille de comparaison (64 bits pour 8)
+
+    Returns:
+        int: Empreinte sur hash_size * hash_size bits
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+
+    # Bit à 1 si le pixel est plus clair que son voisin de droite
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(hash_a, hash_b):
+    """Nombre de bits différents entre deux empreintes"""
+    return bin(hash_a ^ hash_b).count('1')
+
 def resize_with_padding(image, target_size):
     """
     Redimensionne l'image en gardant le ratio d'aspect et ajoute du padding
@@ -162,6 +281,9 @@ def create_thumbnail(image_path, thumb_size=(200, 200)):
     """
     try:
         with Image.open(image_path) as img:
+            # Appliquer l'orientation EXIF (photos prises au téléphone)
+            img = ImageOps.exif_transpose(img)
+
             # Convertir en RGB si nécessaire
             if img.mode != 'RGB':
                 img = img.convert('RGB')
@@ -175,6 +297,35 @@ def create_thumbnail(image_path, thumb_size=(200, 200)):
         print(f"Erreur création miniature: {e}")
         return None
 
+def create_derivative(image_path, output_path, max_size, image_format="JPEG", quality=85):
+    """
+    Crée une version réduite de l'image (miniature, taille moyenne) et l'enregistre
+
+    Args:
+        image_path (str): Chemin vers l'image source
+        output_path (str): Chemin du fichier à créer
+        max_size (tuple): Taille maximale (largeur, hauteur), ratio conservé
+        image_format (str): Format de sortie (JPEG ou WEBP)
+        quality (int): Qualité de compression
+
+    Returns:
+        bool: True si le fichier a été créé
+    """
+    derivative = create_thumbnail(image_path, max_size)
+    if derivative is None:
+        return False
+
+    try:
+        if image_format == "WEBP":
+            derivative.save(output_path, format="WEBP", quality=quality, method=4)
+        else:
+            derivative.save(output_path, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return True
+
+    except Exception as e:
+        print(f"Erreur création dérivé: {e}")
+        return False
+
 def extract_image_features(image):
     """
     Extrait des caractéristiques de l'image pour l'analyse
@@ -0,0 +1,181 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Trop de hachages en attente: la requête doit être refusée (503)"""
+
+
+class PasswordHasher:
+    """
+    Hachage bcrypt dans un pool de threads dédié
+
+    bcrypt libère le GIL: au plus max_workers hachages s'exécutent en parallèle,
+    au plus max_queue attendent derrière eux, et une requête qui ne trouve pas
+    de place avant queue_timeout secondes, ou dont le résultat n'est pas prêt
+    avant result_timeout secondes, reçoit PasswordHasherBusy au lieu d'occuper
+    indéfiniment un thread du serveur.
+    """
+
+    def __init__(self, rounds=12, max_workers=2, max_queue=64, queue_timeout=5.0,
+                 result_timeout=30.0):
+        """
+        Args:
+            rounds (int): Facteur de coût bcrypt des nouveaux hachages
+            max_workers (int): Nombre de hachages simultanés
+            max_queue (int): Nombre de hachages en attente au-delà des workers
+            queue_timeout (float): Attente maximale d'une place (secondes)
+            result_timeout (float): Attente maximale du résultat une fois la place
+                                    obtenue, file d'attente comprise (secondes)
+        """
+        self.rounds = int(rounds)
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.result_timeout = float(result_timeout)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._metrics = {
+            "hashes": 0,
+            "verifications": 0,
+            "rehashes": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_run_ms": 0.0
+        }
+
+    def _submit(self, kind, fn, *args, blocking=True):
+        """Réserver une place puis confier fn au pool; retourne un Future"""
+        if not self._slots.acquire(blocking, self.queue_timeout if blocking else None):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise PasswordHasherBusy("Trop de demandes d'authentification en cours")
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+
+        def run():
+            started_at = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished_at = time.perf_counter()
+                wait_ms = (started_at - submitted_at) * 1000
+                with self._lock:
+                    self._pending -= 1
+                    self._metrics[kind] += 1
+                    self._metrics["total_wait_ms"] += wait_ms
+                    self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], wait_ms)
+                    self._metrics["total_run_ms"] += (finished_at - started_at) * 1000
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    def _result(self, future):
+        """Attendre le résultat d'un hachage au plus result_timeout secondes"""
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                # Jamais démarré: run() ne libérera pas sa place
+                with self._lock:
+                    self._pending -= 1
+                self._slots.release()
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise PasswordHasherBusy("Délai d'authentification dépassé")
+
+    def _hashpw(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _checkpw(password, hashed):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def hash(self, password):
+        """Hacher un mot de passe avec le facteur de coût courant"""
+        return self._result(self._submit("hashes", self._hashpw, password))
+
+    def verify(self, password, hashed):
+        """Vérifier un mot de passe contre son hachage"""
+        return self._result(self._submit("verifications", self._checkpw, password, hashed))
+
+    def needs_rehash(self, hashed):
+        """Le hachage a été produit avec un autre facteur de coût ($2b$<coût>$...)"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def rehash_if_needed(self, password, hashed, on_rehash):
+        """
+        Recalculer en arrière-plan le hachage d'un mot de passe vérifié si son
+        facteur de coût est obsolète
+
+        Args:
+            password (str): Mot de passe en clair, déjà vérifié
+            hashed (str): Hachage actuellement stocké
+            on_rehash (callable): Appelé avec le nouveau hachage
+
+        Returns:
+            bool: True si un nouveau hachage a été programmé
+        """
+        if not self.needs_rehash(hashed):
+            return False
+
+        try:
+            # Pas d'attente: le recalcul est facultatif et ne doit pas ralentir la connexion
+            future = self._submit("rehashes", self._hashpw, password, blocking=False)
+        except PasswordHasherBusy:
+            return False
+
+        def done(f):
+            try:
+                on_rehash(f.result())
+            except Exception as e:
+                print(f"⚠️  Erreur lors du recalcul du hachage: {e}")
+
+        future.add_done_callback(done)
+        return True
+
+    def get_stats(self):
+        """Charge du pool et temps d'attente/d'exécution des hachages"""
+        with self._lock:
+            stats = dict(self._metrics)
+            pending = self._pending
+        completed = stats["hashes"] + stats["verifications"] + stats["rehashes"]
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(pending, self.max_workers),
+            "queued": max(0, pending - self.max_workers),
+            "completed": completed,
+            "hashes": stats["hashes"],
+            "verifications": stats["verifications"],
+            "rehashes": stats["rehashes"],
+            "rejected": stats["rejected"],
+            "timeouts": stats["timeouts"],
+            "avg_wait_ms": round(stats["total_wait_ms"] / completed, 2) if completed else 0.0,
+            "max_wait_ms": round(stats["max_wait_ms"], 2),
+            "avg_hash_ms": round(stats["total_run_ms"] / completed, 2) if completed else 0.0
+        }
+
+    def shutdown(self):
+        """Arrêter le pool après les hachages en cours (dont les recalculs programmés)"""
+        self._executor.shutdown(wait=True)
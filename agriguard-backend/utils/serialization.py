@@ -0,0 +1,85 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # Sérialiseur de la bibliothèque standard
+    orjson = None
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj):
+    """Types non gérés nativement: ObjectId, numpy, ensembles, Decimal..."""
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+
+def dumps(obj, sort_keys=False):
+    """
+    Sérialiser en JSON UTF-8 compact (octets)
+
+    datetime/date au format ISO 8601, ObjectId en chaîne, tableaux et scalaires numpy.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"),
+                      sort_keys=sort_keys, default=_default).encode("utf-8")
+
+
+def loads(data):
+    """Désérialiser du JSON (octets ou chaîne)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Fournisseur JSON de Flask (jsonify, request.get_json) basé sur dumps/loads"""
+
+    sort_keys = False
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys)).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # Corps produit directement en octets, sans passer par une chaîne intermédiaire
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, sort_keys=self.sort_keys) + b"\n",
+                                        mimetype=self.mimetype)
@@ -0,0 +1,99 @@
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Mots vides français et anglais les plus fréquents
+STOPWORDS = frozenset("""
+a au aux avec ce ces dans de des du en et il la le les leur lors ou par pas pour
+qui que sa se ses son sont sur un une est
+an and are as at be by for from in is it of on or the to with
+""".split())
+
+
+def fold_text(text):
+    """Minuscules sans accents ni ligatures: 'Rayures Chlorotiques (maïs)' -> 'rayures chlorotiques (mais)'"""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = text.replace("œ", "oe").replace("æ", "ae")
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text, keep_stopwords=False):
+    """Découper un texte en termes normalisés (sans accents, sans mots vides)"""
+    tokens = TOKEN_PATTERN.findall(fold_text(text))
+    if keep_stopwords:
+        return tokens
+    return [t for t in tokens if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def flatten_text(value):
+    """Concaténer les chaînes contenues dans une valeur (chaîne, liste, dictionnaire imbriqués)"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return " ".join(flatten_text(v) for v in value)
+    return str(value)
+
+
+def _osa_last_row(a, b, max_distance):
+    """
+    Dernière ligne de la matrice de distance d'édition (Damerau restreinte) entre a et b[:j]
+
+    Seule la bande |i - j| <= max_distance est calculée; les cellules hors bande
+    valent max_distance + 1. Retourne None dès qu'une ligne dépasse max_distance.
+    """
+    limit = max_distance + 1
+    len_b = len(b)
+    previous = None
+    row = [j if j <= max_distance else limit for j in range(len_b + 1)]
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [limit] * (len_b + 1)
+        if i <= max_distance:
+            current[0] = i
+        low, high = max(1, i - max_distance), min(len_b, i + max_distance)
+        best = current[0]
+        for j in range(low, high + 1):
+            value = row[j - 1] if char == b[j - 1] else row[j - 1] + 1
+            if row[j] + 1 < value:
+                value = row[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous is not None and j > 1 and char == b[j - 2]
+                    and a[i - 2] == b[j - 1] and previous[j - 2] + 1 < value):
+                value = previous[j - 2] + 1
+            current[j] = value if value < limit else limit
+            if value < best:
+                best = value
+        if best > max_distance:
+            return None
+        previous, row = row, current
+    return row
+
+
+def edit_distances(a, b, max_distance=2):
+    """
+    Distances d'édition bornées (insertion, suppression, substitution, transposition)
+    entre a et b, et entre a et le préfixe de b le plus proche (autocomplétion)
+
+    Returns:
+        tuple: (distance, distance au préfixe), max_distance + 1 au-delà de la borne
+    """
+    limit = max_distance + 1
+    row = _osa_last_row(a, b, max_distance)
+    if row is None:
+        return limit, limit
+    low = max(0, len(a) - max_distance)
+    prefix = min(row[low:len(a) + max_distance + 1] or [limit])
+    return min(row[-1], limit), min(prefix, limit)
+
+
+def edit_distance(a, b, max_distance=2):
+    """Distance d'édition bornée entre a et b (max_distance + 1 au-delà de la borne)"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    return edit_distances(a, b, max_distance)[0]